@@ -1,12 +1,21 @@
 from .catalogs import get_catalogs
-from .data_processor import get_wide_data
+from .data_processor import get_wide_data, iter_wide_data, write_wide_data
 from .dataset_search import search_datasets
 from .datasets import get_datasets
 from .date_handler import add_date_column
 from .downloader import download_dataset
+from .httpx_client import (
+    AsyncCbsClient,
+    CbsClient,
+    close_client,
+    configure_client,
+    set_cache,
+)
 from .labeler import add_label_columns
+from .lazy import LazyObservations, open_observations
 from .metadata import get_metadata
 from .observations import get_observations
+from .response_cache import LRUResponseCache, SQLiteResponseCache
 from .unit_handler import add_unit_column
 
 __version__ = "0.1.1"
@@ -17,9 +26,20 @@ __all__ = [
     "get_metadata",
     "download_dataset",
     "get_observations",
+    "open_observations",
+    "LazyObservations",
     "get_wide_data",
+    "iter_wide_data",
+    "write_wide_data",
     "add_label_columns",
     "add_unit_column",
     "add_date_column",
     "search_datasets",
+    "CbsClient",
+    "AsyncCbsClient",
+    "configure_client",
+    "close_client",
+    "set_cache",
+    "LRUResponseCache",
+    "SQLiteResponseCache",
 ]
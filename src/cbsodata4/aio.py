@@ -0,0 +1,405 @@
+"""
+Asyncio versions of the cbsodata4 API.
+
+Many tables can be fetched concurrently from one event loop, sharing the response
+cache of the synchronous API. Disk I/O runs in worker threads to keep the event loop
+responsive.
+
+Each call pools its requests in a client that is closed when the call returns. Wrap
+the calls in ``async with AsyncCbsClient():`` to share one pool between them.
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+
+from . import datasets, downloader, metadata, observations, refresh
+from .config import (
+    BASE_URL,
+    DEFAULT_CATALOG,
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_QUEUE_SIZE,
+)
+from .data_processor import pivot_observations, pivot_observations_arrow
+from .datasets import process_datasets
+from .downloader import (
+    get_count_url,
+    open_stream,
+    parse_observations_page,
+    split_observation_ranges,
+)
+from .httpx_client import async_fetch_bytes, async_fetch_json, use_async_client
+from .manifest import DownloadManifest
+from .metadata import CbsMetadata, get_metadata_parts, get_table_metadata
+from .observations import OutputFormat, check_output, read_observations, to_polars
+from .partition_writer import WriteMode
+from .steps import Steps, run_steps_async
+
+logger = logging.getLogger(__name__)
+
+
+async def get_catalogs(base_url: str = BASE_URL) -> dict[str, Any]:
+    """Retrieve all (alternative) catalogs of Statistics Netherlands."""
+    return await async_fetch_json(f"{base_url}/Catalogs")
+
+
+async def get_datasets(
+    convert_dates: bool = True,
+    catalog: str = DEFAULT_CATALOG,
+    base_url: str = BASE_URL,
+) -> pd.DataFrame:
+    """Get DataFrame with available datasets and publication metadata from CBS."""
+    logger.info("Fetching datasets from API.")
+    data = await async_fetch_json(f"{base_url}/Datasets")
+    return process_datasets(data, convert_dates=convert_dates, catalog=catalog)
+
+
+async def get_metadata(
+    id: pd.DataFrame | pa.Table | str,
+    catalog: str = DEFAULT_CATALOG,
+    base_url: str = BASE_URL,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> CbsMetadata:
+    """
+    Retrieve the metadata of a publication for the given dataset identifier.
+
+    At most max_workers sub-resources are requested at the same time.
+    """
+    if isinstance(id, pd.DataFrame):
+        if "meta" in id.attrs:
+            return id.attrs["meta"]
+        raise ValueError("DataFrame does not have metadata attached")
+
+    if isinstance(id, pa.Table):
+        meta = get_table_metadata(id)
+        if meta is not None:
+            return meta
+        raise ValueError("Table does not have metadata attached")
+
+    path = f"{base_url}/{catalog}/{id}"
+    logger.info(f"Fetching metadata for dataset {id}.")
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def fetch_part(name: str) -> Any:
+        async with semaphore:
+            if name == "Properties":
+                return await async_fetch_json(f"{path}/Properties")
+            return (await async_fetch_json(f"{path}/{name}"))["value"]
+
+    async with use_async_client():
+        meta_data = (await async_fetch_json(path))["value"]
+        names = get_metadata_parts(meta_data)
+        parts = await asyncio.gather(*(fetch_part(name) for name in names))
+    return CbsMetadata(dict(zip(names, parts)))
+
+
+async def download_data_stream(
+    url: str,
+    output_path: str | Path,
+    empty_selection: pd.DataFrame,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    prefix: str = "partition",
+    manifest: DownloadManifest | None = None,
+    **write_options: Any,
+) -> None:
+    """
+    Download data from an url to output_path folder.
+
+    Pages are fetched and parsed into Arrow tables while the previous ones are written
+    in a worker thread, with at most queue_size pages waiting to be written. Progress
+    is recorded in manifest, and the writer is aborted instead of closed when the stream
+    did not end, as in the synchronous download_data_stream.
+    """
+    stream = await asyncio.to_thread(
+        open_stream, url, output_path, prefix, manifest, **write_options
+    )
+    if stream is None:
+        return
+    writer, url = stream
+    pages: asyncio.Queue[tuple[pa.Table, str | None] | None] = asyncio.Queue(
+        maxsize=max(1, queue_size)
+    )
+
+    ended = False
+
+    async def write_pages() -> None:
+        try:
+            while (page := await pages.get()) is not None:
+                await asyncio.to_thread(writer.write, *page)
+        except BaseException:
+            await asyncio.to_thread(writer.abort)
+            raise
+        await asyncio.to_thread(writer.close if ended else writer.abort)
+
+    task = asyncio.create_task(write_pages())
+    try:
+        async with use_async_client():
+            next_link = url
+            while next_link and not task.done():
+                logger.info(f"Retrieving {next_link}")
+                body = await async_fetch_bytes(next_link)
+                table, next_link = await asyncio.to_thread(
+                    parse_observations_page,
+                    body,
+                    empty_selection,
+                    write_options.get("schema"),
+                )
+                await _put_unless_done(pages, (table, next_link), task)
+        ended = not next_link
+    finally:
+        if not task.done():
+            await _put_unless_done(pages, None, task)
+        await task
+
+
+async def _put_unless_done(
+    pages: asyncio.Queue, item: Any, writer: asyncio.Task
+) -> None:
+    """Put item on the queue, giving up if the writer task stopped (e.g. on an error)."""
+    put = asyncio.ensure_future(pages.put(item))
+    await asyncio.wait([put, writer], return_when=asyncio.FIRST_COMPLETED)
+    if not put.done():
+        put.cancel()
+    if writer.done():
+        writer.result()
+
+
+async def get_observation_ranges(url: str, workers: int) -> list[str]:
+    """Split the observations selected by url into at most workers $skip/$top ranges."""
+    count = (await async_fetch_json(get_count_url(url)))["@odata.count"]
+    return split_observation_ranges(url, count, workers)
+
+
+async def download_data_streams(
+    streams: list[dict[str, str]],
+    output_path: str | Path,
+    empty_selection: pd.DataFrame,
+    workers: int,
+    manifest: DownloadManifest | None = None,
+    **write_options: Any,
+) -> None:
+    """Download streams (url and prefix of each) concurrently with download_data_stream."""
+    await asyncio.gather(
+        *(
+            download_data_stream(
+                **stream,
+                output_path=output_path,
+                empty_selection=empty_selection,
+                manifest=manifest,
+                **write_options,
+            )
+            for stream in streams
+        )
+    )
+
+
+async def download_observation_ranges(
+    url: str,
+    output_path: str | Path,
+    empty_selection: pd.DataFrame,
+    workers: int,
+    manifest: DownloadManifest | None = None,
+    **write_options: Any,
+) -> None:
+    """Download the observations of url as concurrent $skip/$top ranges into output_path."""
+    await run_async(
+        downloader.download_observation_ranges_steps(
+            url, output_path, empty_selection, workers, manifest, **write_options
+        )
+    )
+
+
+async def update_observations(
+    manifest: DownloadManifest,
+    output_path: str | Path,
+    empty_selection: pd.DataFrame,
+    **write_options: Any,
+) -> None:
+    """Apply the pending update of manifest to the observations in output_path."""
+    await run_async(
+        downloader.update_observations_steps(
+            manifest, output_path, empty_selection, **write_options
+        )
+    )
+
+
+async def download_dataset(
+    id: str,
+    download_dir: str | Path | None = None,
+    catalog: str = DEFAULT_CATALOG,
+    query: str | None = None,
+    select: list[str] | None = None,
+    base_url: str = BASE_URL,
+    workers: int | None = None,
+    write_mode: WriteMode = "pages",
+    row_group_size: int | None = None,
+    compression: str = "snappy",
+    max_file_rows: int | None = None,
+    resume: bool = True,
+    snapshot: dict[str, str | None] | None = None,
+    **filters: Any,
+) -> CbsMetadata:
+    """
+    Download observations and metadata for a specified dataset, saving them as Parquet files in the given directory.
+
+    With workers > 1 the observations are downloaded as that many concurrent ranges.
+    The write and resume options are those of the synchronous download_dataset.
+    """
+    return await run_async(
+        downloader.download_dataset_steps(
+            id=id,
+            download_dir=download_dir,
+            catalog=catalog,
+            query=query,
+            select=select,
+            base_url=base_url,
+            workers=workers,
+            write_mode=write_mode,
+            row_group_size=row_group_size,
+            compression=compression,
+            max_file_rows=max_file_rows,
+            resume=resume,
+            snapshot=snapshot,
+            **filters,
+        )
+    )
+
+
+async def refresh_dataset(
+    id: str,
+    dataset: pd.Series | dict[str, Any],
+    download_dir: str | Path | None = None,
+    catalog: str = DEFAULT_CATALOG,
+    query: str | None = None,
+    select: list[str] | None = None,
+    base_url: str = BASE_URL,
+    workers: int | None = None,
+    **filters: Any,
+) -> CbsMetadata:
+    """
+    Bring a complete download of a dataset up to date with the catalogue.
+
+    Follows the synchronous refresh_dataset, downloading over the async client.
+    """
+    return await run_async(
+        refresh.refresh_dataset_steps(
+            id=id,
+            dataset=dataset,
+            download_dir=download_dir,
+            catalog=catalog,
+            query=query,
+            select=select,
+            base_url=base_url,
+            workers=workers,
+            **filters,
+        )
+    )
+
+
+async def get_observations(
+    id: str,
+    catalog: str = DEFAULT_CATALOG,
+    download_dir: str | Path | None = None,
+    query: str | None = None,
+    select: list[str] | None = None,
+    include_id: bool = True,
+    base_url: str = BASE_URL,
+    overwrite: bool = False,
+    workers: int | None = None,
+    categorical: bool = True,
+    refresh: bool = False,
+    output: OutputFormat = "pandas",
+    memory_map: bool = False,
+    **filters: Any,
+) -> Any:
+    """
+    Retrieve observations from a dataset in long format.
+
+    A refresh of data on disk downloads the changes over the async client.
+    """
+    check_output(output)
+    meta, download_path, observations_dir = await run_async(
+        observations.ensure_observations_steps(
+            id=id,
+            catalog=catalog,
+            download_dir=download_dir,
+            query=query,
+            select=select,
+            base_url=base_url,
+            overwrite=overwrite,
+            workers=workers,
+            refresh=refresh,
+            **filters,
+        )
+    )
+    return await asyncio.to_thread(
+        read_observations,
+        download_path,
+        meta,
+        include_id=include_id,
+        categorical=categorical,
+        select=select,
+        filters=filters,
+        observations_dir=observations_dir,
+        output=output,
+        memory_map=memory_map,
+    )
+
+
+async def get_wide_data(
+    id: str,
+    catalog: str = DEFAULT_CATALOG,
+    download_dir: str | Path | None = None,
+    query: str | None = None,
+    select: list[str] | None = None,
+    name_measure_columns: bool = True,
+    base_url: str = BASE_URL,
+    output: OutputFormat = "pandas",
+    **filters: Any,
+) -> Any:
+    """Get data from CBS in wide format by pivoting observations, with each Measure as a separate column."""
+    check_output(output)
+    obs = await get_observations(
+        id=id,
+        catalog=catalog,
+        download_dir=download_dir,
+        query=query,
+        select=select,
+        include_id=False,
+        base_url=base_url,
+        output="pandas" if output == "pandas" else "arrow",
+        **filters,
+    )
+    if output == "pandas":
+        return await asyncio.to_thread(
+            pivot_observations, obs, name_measure_columns=name_measure_columns
+        )
+    wide = await asyncio.to_thread(
+        pivot_observations_arrow, obs, name_measure_columns=name_measure_columns
+    )
+    return wide if output == "arrow" else to_polars(wide)
+
+
+async def run_async[T](steps: Steps[T]) -> T:
+    """
+    Run steps shared with the synchronous API, with the requests of this module.
+
+    All requests use the same async client, see use_async_client.
+    """
+    async_calls = {
+        datasets.get_datasets: get_datasets,
+        metadata.get_metadata: get_metadata,
+        downloader.download_dataset: download_dataset,
+        downloader.update_observations: update_observations,
+        downloader.download_observation_ranges: download_observation_ranges,
+        downloader.get_observation_ranges: get_observation_ranges,
+        downloader.download_data_streams: download_data_streams,
+        downloader.download_data_stream: download_data_stream,
+        refresh.refresh_dataset: refresh_dataset,
+    }
+    async with use_async_client():
+        return await run_steps_async(steps, async_calls)
@@ -2,3 +2,13 @@ BASE_URL = "https://datasets.cbs.nl/odata/v1"
 DEFAULT_CATALOG = "CBS"
 SEARCH_URL = "https://cerberus.cbs.nl/api/search"
 DEFAULT_LANGUAGE = "nl-nl"
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_CACHE_TTL = 24 * 60 * 60.0
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 4
+DEFAULT_BATCH_SIZE = 128 * 1024
+PERIOD_CACHE_SIZE = 256
+PERIOD_CODE_CACHE_SIZE = 4096
@@ -1,15 +1,34 @@
 import logging
+import math
+import tempfile
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
 from .config import BASE_URL, DEFAULT_CATALOG
-from .metadata import CbsMetadata
-from .observations import get_observations
+from .lazy import LazyObservations, open_observations
+from .metadata import CbsMetadata, attach_metadata, get_table_metadata
+from .observations import (
+    OutputFormat,
+    check_output,
+    encode_code_columns,
+    get_observations,
+    to_polars,
+)
+from .schema import CODE_TYPE, conform_table
 
 logger = logging.getLogger(__name__)
 
+# Column with the chunk number of every observation while splitting them in chunks.
+CHUNK_COLUMN = "__chunk"
+
 
 def get_wide_data(
     id: str,
@@ -19,10 +38,58 @@ def get_wide_data(
     select: list[str] | None = None,
     name_measure_columns: bool = True,
     base_url: str = BASE_URL,
+    output: OutputFormat = "pandas",
     **filters: Any,
-) -> pd.DataFrame:
-    """Get data from CBS in wide format by pivoting observations, with each Measure as a separate column."""
+) -> Any:
+    """
+    Get data from CBS in wide format by pivoting observations, with each Measure as a separate column.
+
+    With output 'arrow' or 'polars' the observations are pivoted in Arrow, without
+    converting them to pandas (see get_observations).
+    """
+    check_output(output)
     obs = get_observations(
+        id=id,
+        catalog=catalog,
+        download_dir=download_dir,
+        query=query,
+        select=select,
+        include_id=False,
+        base_url=base_url,
+        output="pandas" if output == "pandas" else "arrow",
+        **filters,
+    )
+
+    if output == "pandas":
+        return pivot_observations(obs, name_measure_columns=name_measure_columns)
+    wide = pivot_observations_arrow(obs, name_measure_columns=name_measure_columns)
+    return wide if output == "arrow" else to_polars(wide)
+
+
+def iter_wide_data(
+    id: str,
+    catalog: str = DEFAULT_CATALOG,
+    download_dir: str | Path | None = None,
+    query: str | None = None,
+    select: list[str] | None = None,
+    name_measure_columns: bool = True,
+    base_url: str = BASE_URL,
+    output: OutputFormat = "pandas",
+    chunk_size: int = 1,
+    **filters: Any,
+) -> Iterator[Any]:
+    """
+    Iterate over the data of get_wide_data in chunks of chunk_size codes of one dimension.
+
+    The chunks are split on the time dimension, or the first dimension if there is
+    none (see get_chunk_dimension), so every wide row is in exactly one chunk. The
+    observations are read once and split into a temporary directory with a file per
+    chunk (see split_chunks), from which one chunk at a time is read into memory and
+    pivoted. This takes as much temporary disk space as the selected observations.
+    Every chunk has the measure columns of its own observations.
+    """
+    check_output(output)
+    obs = open_observations(
         id=id,
         catalog=catalog,
         download_dir=download_dir,
@@ -32,7 +99,173 @@ def get_wide_data(
         base_url=base_url,
         **filters,
     )
+    dimension = get_chunk_dimension(obs.meta)
+    codes = get_chunk_codes(obs, dimension)
+    chunk_count = math.ceil(len(codes) / chunk_size)
+    if chunk_count == 0:
+        return
+    if chunk_count == 1:
+        chunk = obs.where(**{dimension: codes})
+        yield from pivot_chunks([chunk], output, name_measure_columns)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="cbsodata4_") as tmp_dir:
+        logger.debug(f"Splitting observations in {chunk_count} chunks of {dimension}.")
+        split_chunks(obs, dimension, codes, chunk_size, tmp_dir)
+        chunks = (
+            LazyObservations(Path(tmp_dir) / str(k), obs.meta)
+            for k in range(chunk_count)
+        )
+        yield from pivot_chunks(chunks, output, name_measure_columns)
+
+
+def split_chunks(
+    obs: LazyObservations,
+    dimension: str,
+    codes: list[str],
+    chunk_size: int,
+    path: str | Path,
+) -> None:
+    """
+    Write the observations of obs to a directory per chunk in path, in one pass.
+
+    Directory k holds the observations of codes[k * chunk_size:(k + 1) * chunk_size]
+    of dimension; observations with other codes are left out.
+    """
+    value_set = pa.array(codes, pa.string())
+    scanner = obs.dataset.scanner(columns=obs.columns, filter=obs.filter)
+    schema = scanner.projected_schema.append(pa.field(CHUNK_COLUMN, pa.int32()))
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        for batch in scanner.to_batches():
+            index = pc.index_in(batch.column(dimension).cast(pa.string()), value_set)
+            chunk = pc.divide(index, pa.scalar(chunk_size, pa.int32()))
+            batch = batch.append_column(CHUNK_COLUMN, chunk)
+            yield batch.filter(pc.is_valid(chunk))
+
+    ds.write_dataset(
+        pa.RecordBatchReader.from_batches(schema, batches()),
+        str(path),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([schema.field(CHUNK_COLUMN)])),
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def pivot_chunks(
+    chunks: Iterator[LazyObservations] | list[LazyObservations],
+    output: OutputFormat = "pandas",
+    name_measure_columns: bool = True,
+) -> Iterator[Any]:
+    """Read and pivot the observations of every chunk, converted to output."""
+    for chunk in chunks:
+        if output == "pandas":
+            yield pivot_observations(
+                chunk.to_pandas(), name_measure_columns=name_measure_columns
+            )
+            continue
+        wide = pivot_observations_arrow(
+            chunk.to_arrow(), name_measure_columns=name_measure_columns
+        )
+        yield wide if output == "arrow" else to_polars(wide)
+
+
+def write_wide_data(
+    id: str,
+    path: str | Path,
+    catalog: str = DEFAULT_CATALOG,
+    download_dir: str | Path | None = None,
+    query: str | None = None,
+    select: list[str] | None = None,
+    name_measure_columns: bool = True,
+    base_url: str = BASE_URL,
+    chunk_size: int = 1,
+    compression: str = "snappy",
+    **filters: Any,
+) -> Path:
+    """
+    Write the data of get_wide_data to the Parquet file path, one chunk at a time.
 
+    The chunks of iter_wide_data are appended as row groups, so the wide data never
+    has to fit in memory. The file has a column for every measure in the metadata
+    (or in the Measure filter), which is empty for measures without observations.
+    """
+    path = Path(path)
+    writer = None
+    schema = None
+    try:
+        for wide in iter_wide_data(
+            id=id,
+            catalog=catalog,
+            download_dir=download_dir,
+            query=query,
+            select=select,
+            name_measure_columns=name_measure_columns,
+            base_url=base_url,
+            output="arrow",
+            chunk_size=chunk_size,
+            **filters,
+        ):
+            if writer is None:
+                schema = get_wide_schema(
+                    wide, name_measure_columns, filters.get("Measure")
+                )
+                path.parent.mkdir(parents=True, exist_ok=True)
+                writer = pq.ParquetWriter(str(path), schema, compression=compression)
+            writer.write_table(conform_table(wide, schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        logger.warning(f"No observations found for {id}, not writing {path}.")
+    else:
+        logger.info(f"The wide data is in '{path}'")
+    return path
+
+
+def get_chunk_dimension(meta: CbsMetadata) -> str:
+    """Return the dimension to split wide data in chunks on: the time dimension, or else the first."""
+    dimensions = meta.time_dimension_identifiers or meta.dimension_identifiers
+    if not dimensions:
+        logger.error("No dimensions found in metadata.")
+        raise ValueError("No dimensions found in metadata.")
+    return dimensions[0]
+
+
+def get_chunk_codes(obs: LazyObservations, dimension: str) -> list[str]:
+    """Return the codes of dimension in obs, in metadata order followed by other codes sorted."""
+    present = set()
+    for table in obs.select([dimension]).iter_batches(output="arrow"):
+        codes = pc.unique(table.column(dimension).cast(pa.string()))
+        present.update(codes.to_pylist())
+    present.discard(None)
+    known = obs.meta.get_code_identifiers(dimension)
+    return [code for code in known if code in present] + sorted(present - set(known))
+
+
+def get_wide_schema(
+    wide: pa.Table,
+    name_measure_columns: bool = True,
+    measures: str | list[str] | None = None,
+) -> pa.Schema:
+    """Return the schema of all chunks of wide data, with the dimensions of wide and all measures."""
+    meta = get_table_metadata(wide)
+    names = meta.measurecode_mapping if name_measure_columns else {}
+    if measures is None:
+        measures = meta.get_code_identifiers("Measure")
+    elif isinstance(measures, str):
+        measures = [measures]
+    dimensions = [d for d in meta.dimension_identifiers if d in wide.column_names]
+    fields = [pa.field(d, CODE_TYPE) for d in dimensions]
+    fields += [pa.field(names.get(code, code), pa.float64()) for code in measures]
+    return pa.schema(fields, metadata=wide.schema.metadata)
+
+
+def pivot_observations(
+    obs: pd.DataFrame, name_measure_columns: bool = True
+) -> pd.DataFrame:
+    """Pivot long format observations to wide format, with each Measure as a separate column."""
     is_empty = obs.empty
     meta: CbsMetadata = obs.attrs.get("meta")
 
@@ -52,15 +285,175 @@ def get_wide_data(
     if is_empty:
         d = pd.DataFrame(columns=meta.measurecode_mapping.values())
     else:
-        d = obs.pivot_table(
-            index=pivot_index,
-            columns=pivot_columns,
-            values=pivot_values,
-            aggfunc="first",
-        ).reset_index()
+        d = scatter_pivot(obs, pivot_index, pivot_columns, pivot_values)
+        if d is None:
+            logger.debug("Observations are not unique, pivoting with pivot_table.")
+            d = obs.pivot_table(
+                index=pivot_index,
+                columns=pivot_columns,
+                values=pivot_values,
+                aggfunc="first",
+                observed=True,
+            ).reset_index()
 
         if name_measure_columns:
             d.rename(columns=meta.measurecode_mapping, inplace=True)
 
     d.attrs["meta"] = meta
     return d
+
+
+def scatter_pivot(
+    obs: pd.DataFrame, index: list[str], columns: str, values: str
+) -> pd.DataFrame | None:
+    """
+    Pivot obs like pivot_table(aggfunc="first", observed=True).reset_index().
+
+    The keys are factorized and the values scattered into a preallocated matrix, without
+    the group by of pivot_table. Returns None if values is not a float column or a
+    key occurs more than once, pivot_table must be used then.
+    """
+    value = obs[values]
+    if not (isinstance(value.dtype, np.dtype) and value.dtype.kind == "f"):
+        return None
+
+    valid = np.ones(len(obs), dtype=bool)
+    codes, levels = [], []
+    for name in index + [columns]:
+        name_codes, name_levels = factorize(obs[name])
+        valid &= name_codes >= 0
+        codes.append(name_codes)
+        levels.append(name_levels)
+    keep = valid & value.notna().to_numpy()
+    kept_codes = [name_codes[keep] for name_codes in codes]
+    sizes = [len(name_levels) for name_levels in levels]
+
+    # pivot_table leaves out missing values, and rows and columns with only missing
+    # values. When that leaves out all rows of a code of a dimension, the rows are
+    # ordered on the first appearance of its codes in the sorted keys, like pandas'
+    # MultiIndex.remove_unused_levels does.
+    order = None
+    row_codes, ranked = [], []
+    for name_codes, kept, size in zip(codes[:-1], kept_codes, sizes):
+        used = np.bincount(kept, minlength=size) > 0
+        if used.sum() < (np.bincount(name_codes[valid], minlength=size) > 0).sum():
+            if order is None:
+                order = np.lexsort(kept_codes[::-1])
+            appearance = pd.unique(kept[order])
+            rank = np.zeros(size, dtype=np.intp)
+            rank[appearance] = np.arange(len(appearance))
+            kept = rank[kept]
+            ranked.append(appearance)
+        else:
+            ranked.append(None)
+        row_codes.append(kept)
+
+    try:
+        row_keys = np.ravel_multi_index(row_codes, sizes[:-1])
+    except ValueError:
+        return None
+    row_index, rows = pd.factorize(row_keys, sort=True)
+    present = np.flatnonzero(np.bincount(kept_codes[-1], minlength=sizes[-1]))
+    column_index = np.searchsorted(present, kept_codes[-1])
+    cells = row_index * len(present) + column_index
+    if len(cells) and np.bincount(cells).max() > 1:
+        return None
+
+    matrix = np.full((len(rows), len(present)), np.nan, dtype=value.dtype)
+    matrix[row_index, column_index] = value.to_numpy()[keep]
+
+    data = {}
+    for name, name_levels, name_codes, appearance in zip(
+        index, levels, np.unravel_index(rows, sizes[:-1]), ranked
+    ):
+        if appearance is not None:
+            name_codes = appearance[name_codes]
+        data[name] = take_levels(obs[name], name_levels, name_codes)
+    labels = list(levels[-1].take(present))
+    data.update(zip(labels, matrix.T))
+    d = pd.DataFrame(data)
+    d.columns = pd.Index(index + labels, name=columns)
+    return d
+
+
+def factorize(column: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    """Return the codes and levels of column, in category order for Categoricals and sorted otherwise."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column, sort=True)
+
+
+def take_levels(column: pd.Series, levels: pd.Index, codes: np.ndarray) -> Any:
+    """Return the values of codes in levels with the dtype of column."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(codes, dtype=column.dtype)
+    return levels.take(codes)
+
+
+def pivot_observations_arrow(
+    table: pa.Table, name_measure_columns: bool = True
+) -> pa.Table:
+    """
+    Pivot an Arrow table of observations to wide format, like pivot_observations.
+
+    Rows are sorted on the dimensions in metadata order, measure columns follow the
+    order of the measure codes. Missing values are dropped first, like pivot_table
+    does, so rows and measures without any value are left out and of duplicate
+    observations the first value is used.
+    """
+    meta = get_table_metadata(table)
+    if meta is None:
+        logger.error("Metadata is missing in observations.")
+        raise ValueError("Metadata is missing in observations.")
+
+    dimensions = [d for d in meta.dimension_identifiers if d in table.column_names]
+    if not meta.dimension_identifiers:
+        logger.error("No dimensions found in metadata.")
+        raise ValueError("No dimensions found in metadata.")
+
+    names = meta.measurecode_mapping if name_measure_columns else {}
+    table = encode_code_columns(table, meta)
+    table = table.filter(pc.is_valid(table.column("Value")))
+    measure = table.column("Measure").combine_chunks()
+    present = pc.unique(measure.indices).sort()
+    codes = measure.dictionary.take(present).to_pylist()
+
+    if table.num_rows == 0:
+        fields = [table.schema.field(d) for d in dimensions] + [
+            pa.field(names.get(code, code), pa.float64())
+            for code in meta.get_code_identifiers("Measure")
+        ]
+        return attach_metadata(pa.schema(fields).empty_table(), meta)
+
+    # The pivot kernel doesn't accept dictionary keys, and only allows one value
+    # per key, so duplicates are reduced to their first value beforehand.
+    keys = [pc.cast(table.column(d), pa.string()) for d in dimensions]
+    plain = pa.table(
+        keys + [measure.cast(pa.string()), table.column("Value")],
+        names=dimensions + ["Measure", "Value"],
+    )
+    options = pc.PivotWiderOptions(key_names=codes)
+    aggregate = [(["Measure", "Value"], "pivot_wider", options)]
+    try:
+        grouped = plain.group_by(dimensions, use_threads=False).aggregate(aggregate)
+    except pa.ArrowInvalid:
+        plain = plain.group_by(dimensions + ["Measure"], use_threads=False).aggregate(
+            [("Value", "first")]
+        )
+        plain = plain.rename_columns(dimensions + ["Measure", "Value"])
+        grouped = plain.group_by(dimensions, use_threads=False).aggregate(aggregate)
+
+    values = grouped.column(grouped.num_columns - 1).combine_chunks()
+    wide = pa.table(
+        [grouped.column(d) for d in dimensions] + values.flatten(),
+        names=dimensions + [names.get(code, code) for code in codes],
+    )
+    wide = encode_code_columns(wide, meta)
+    sort_keys = pa.table(
+        {
+            d: pc.cast(wide.column(d).combine_chunks().indices, pa.int64())
+            for d in dimensions
+        }
+    )
+    order = pc.sort_indices(sort_keys, [(d, "ascending") for d in dimensions])
+    return attach_metadata(wide.take(order), meta)
@@ -1,5 +1,4 @@
 import logging
-from functools import cache
 
 import pandas as pd
 
@@ -9,16 +8,24 @@ from .httpx_client import fetch_json
 logger = logging.getLogger(__name__)
 
 
-@cache
 def get_datasets(convert_dates: bool = True, catalog: str = DEFAULT_CATALOG, base_url: str = BASE_URL) -> pd.DataFrame:
     """
     Get DataFrame with available datasets and publication metadata from CBS.
     Retrieves datasets from the specified catalog, optionally converting date columns to datetime.
+    The response is cached by the response cache for at most its /Datasets ttl, so
+    changes in the catalogue are picked up by later calls.
     """
     logger.info("Fetching datasets from API.")
 
     path = f"{base_url}/Datasets"
     data = fetch_json(path)
+    return process_datasets(data, convert_dates=convert_dates, catalog=catalog)
+
+
+def process_datasets(
+    data: dict, convert_dates: bool = True, catalog: str | None = DEFAULT_CATALOG
+) -> pd.DataFrame:
+    """Convert a /Datasets response to a DataFrame, filtering on catalog and converting dates."""
     ds = pd.DataFrame(data["value"])
 
     if catalog is not None:
@@ -1,54 +1,166 @@
-import calendar
 import logging
+from collections.abc import Sequence
 from datetime import datetime
-from functools import cache
-from typing import Literal
+from functools import lru_cache
+from typing import Any, Literal
 
+import numpy as np
 import pandas as pd
+from pandas.api.extensions import take
 
+from .config import PERIOD_CACHE_SIZE, PERIOD_CODE_CACHE_SIZE
 from .metadata import CbsMetadata
 
 logger = logging.getLogger(__name__)
 
+PERIOD_TYPES = {"JJ": "Y", "KW": "Q", "MM": "M", "W1": "W", "X0": "X"}
+FREQ_CATEGORIES = ["Y", "Q", "M", "D", "W", "X"]
+
 
-@cache
 def period_to_date(period: str) -> datetime:
     """Convert a CBS period string to a datetime object."""
-    year, type_, number = int(period[:4]), period[4:6], int(period[6:])
-    base_date = datetime(year, 1, 1)
-
-    if type_ == "JJ":
-        return base_date
-    elif type_ == "KW":
-        return base_date.replace(month=1 + 3 * (number - 1))
-    elif type_ == "MM":
-        return base_date.replace(month=number)
-    elif type_ == "W1":
-        return base_date + pd.Timedelta(weeks=number - 1)
-    elif type_ == "X0":
-        return base_date
-    else:
-        return base_date.replace(month=int(type_), day=number)
-
-
-@cache
+    return parse_period(period)[0]
+
+
 def period_to_numeric(period: str) -> float:
     """Convert a CBS period string to a numeric representation."""
-    date = period_to_date(period)
-    days_in_year = 366 if calendar.isleap(date.year) else 365
-    return date.year + (date.timetuple().tm_yday - 1) / days_in_year
+    return parse_period(period)[1]
 
 
-@cache
 def period_to_freq(period: str) -> str:
     """Convert a CBS period string to a frequency indicator."""
-    return {"JJ": "Y", "KW": "Q", "MM": "M", "W1": "W", "X0": "X"}.get(period[4:6], "D")
+    return PERIOD_TYPES.get(period[4:6], "D")
+
+
+@lru_cache(maxsize=PERIOD_CACHE_SIZE)
+def get_period_table(periods: tuple[str, ...]) -> pd.DataFrame:
+    """
+    Return the parse_periods lookup table of periods, shared between calls.
+
+    The time dimension of a table has the same codes on every call (the categories
+    of its column are the codes in the metadata), so its table is parsed once. At
+    most PERIOD_CACHE_SIZE tables are kept, the least recently used is dropped
+    first. The returned DataFrame is shared and must not be modified.
+    """
+    return parse_periods(periods)
+
+
+@lru_cache(maxsize=PERIOD_CODE_CACHE_SIZE)
+def parse_period(period: str) -> tuple[datetime, float]:
+    """
+    Return the date and numeric representation of a single period.
+
+    Single periods are cached separately from get_period_table, so converting many
+    codes one by one doesn't evict the lookup tables of whole time dimensions.
+    """
+    parsed = parse_periods([period])
+    return parsed["date"].iloc[0].to_pydatetime(), float(parsed["numeric"].iloc[0])
+
+
+def parse_periods(periods: Sequence[str]) -> pd.DataFrame:
+    """
+    Parse CBS period strings to their date, numeric and frequency representations.
+
+    All representations are computed at once for all periods, with NumPy operations
+    on the characters of the codes. Returns a DataFrame
+    indexed by period with the columns date (datetime64[ns]), numeric (float64) and
+    freq (Categorical). Raises a ValueError for periods that can't be parsed.
+    """
+    codes = np.asarray(periods, dtype=str)
+    chars = codes.astype("U8").view("U1").reshape(-1, 8)
+    digits = codes.astype("U8").view(np.uint32).reshape(-1, 8).astype(np.int64) - 48
+    is_digit = (digits >= 0) & (digits <= 9)
+    type_ = np.char.add(chars[:, 4], chars[:, 5])
+    is_day = is_digit[:, 4] & is_digit[:, 5]
+
+    year = digits[:, :4] @ np.array([1000, 100, 10, 1])
+    number = digits[:, 6] * 10 + digits[:, 7]
+    month = np.select(
+        [is_day, type_ == "KW", type_ == "MM"],
+        [digits[:, 4] * 10 + digits[:, 5], 1 + 3 * (number - 1), number],
+        1,
+    )
+    day = np.where(is_day, number, 1)
+    weeks = np.where(type_ == "W1", number - 1, 0)
+
+    valid = (
+        (np.char.str_len(codes) == 8)
+        & is_digit[:, :4].all(axis=1)
+        & is_digit[:, 6:].all(axis=1)
+        & (is_day | np.isin(type_, list(PERIOD_TYPES)))
+        & (month >= 1)
+        & (month <= 12)
+    )
+    years = np.where(valid, year, 1970) - 1970
+    month_start = years.astype("datetime64[Y]").astype("datetime64[M]")
+    month_start += np.where(valid, month - 1, 0).astype("timedelta64[M]")
+    next_month = month_start + np.timedelta64(1, "M")
+    days_in_month = next_month.astype("datetime64[D]") - month_start
+    valid &= (day >= 1) & (day <= days_in_month.astype(np.int64))
+    if not valid.all():
+        raise ValueError(f"Invalid periods: {codes[~valid].tolist()}")
+
+    offset = (day - 1 + 7 * weeks).astype("timedelta64[D]")
+    date = month_start.astype("datetime64[D]") + offset
+    date_year = date.astype("datetime64[Y]")
+    day_of_year = date - date_year
+    next_year = date_year + np.timedelta64(1, "Y")
+    days_in_year = next_year.astype("datetime64[D]") - date_year
+    numeric = date_year.astype(np.int64) + 1970.0
+    numeric += day_of_year.astype(np.int64) / days_in_year.astype(np.int64)
+
+    freq = np.full(len(codes), "D", dtype=object)
+    for period_type, freq_code in PERIOD_TYPES.items():
+        freq[type_ == period_type] = freq_code
+    return pd.DataFrame(
+        {
+            "date": date.astype("datetime64[ns]"),
+            "numeric": numeric,
+            "freq": pd.Categorical(freq, categories=FREQ_CATEGORIES),
+        },
+        index=pd.Index(codes, name="period"),
+    )
+
+
+def to_periods(parsed: pd.DataFrame, used: np.ndarray) -> Any:
+    """
+    Return the parsed periods as pandas Periods of their frequency.
+
+    When the periods at the positions in used share one frequency a PeriodArray of
+    that frequency is returned, with the other periods NaT. Otherwise an object array
+    of Periods is returned, as a pandas PeriodDtype has a single frequency.
+    Multi-year periods (X) have no pandas frequency and are NaT.
+    """
+    freqs = parsed["freq"].to_numpy(dtype=object)
+    used_freqs = sorted(set(freqs[used]) - {"X"}, key=FREQ_CATEGORIES.index)
+    dates = parsed["date"].reset_index(drop=True)
+
+    if len(used_freqs) <= 1:
+        freq = used_freqs[0] if used_freqs else "Y"
+        return dates.where(freqs == freq).dt.to_period(freq).array
+
+    logger.info(
+        f"Periods of frequencies {used_freqs} can't share a PeriodDtype, returning "
+        "Period objects. Select one frequency with the _freq column for a PeriodDtype."
+    )
+    periods = np.full(len(parsed), pd.NaT, dtype=object)
+    for freq in used_freqs:
+        mask = freqs == freq
+        periods[mask] = dates[mask].dt.to_period(freq).astype(object)
+    return periods
 
 
 def add_date_column(
-    data: pd.DataFrame, date_type: Literal["date", "numeric"] = "date"
+    data: pd.DataFrame, date_type: Literal["date", "numeric", "period"] = "date"
 ) -> pd.DataFrame:
-    """Add date columns for time dimensions in the data using the specified date type."""
+    """
+    Add date columns for time dimensions in the data using the specified date type.
+
+    date_type 'date' adds the start of the periods as datetimes, 'numeric' as
+    fractional years and 'period' as pandas Periods of their frequency (see
+    to_periods). Only the unique periods are parsed, once per set of codes (see
+    get_period_table), and the rows take their results by code.
+    """
     meta: CbsMetadata = data.attrs.get("meta")
     if meta is None:
         raise ValueError("add_date_column requires metadata.")
@@ -61,13 +173,21 @@ def add_date_column(
     new_columns = {}
     for period_name in time_dimensions:
         periods = data[period_name]
-
-        converter = period_to_date if date_type == "date" else period_to_numeric
-        new_columns[f"{period_name}_{date_type}"] = periods.map(converter)
-
-        freq_column = periods.map(period_to_freq)
-        new_columns[f"{period_name}_freq"] = pd.Categorical(
-            freq_column, categories=["Y", "Q", "M", "D", "W", "X"]
+        if isinstance(periods.dtype, pd.CategoricalDtype):
+            codes, uniques = periods.cat.codes.to_numpy(), periods.cat.categories
+        else:
+            codes, uniques = pd.factorize(periods)
+        parsed = get_period_table(tuple(uniques))
+
+        if date_type == "period":
+            values = to_periods(parsed, np.unique(codes[codes >= 0]))
+        else:
+            values = parsed[date_type].to_numpy()
+        new_columns[f"{period_name}_{date_type}"] = take(values, codes, allow_fill=True)
+        freq_codes = parsed["freq"].cat.codes.to_numpy()
+        new_columns[f"{period_name}_freq"] = pd.Categorical.from_codes(
+            take(freq_codes, codes, allow_fill=True, fill_value=-1),
+            categories=FREQ_CATEGORIES,
         )
 
     result = data.assign(**new_columns)
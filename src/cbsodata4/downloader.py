@@ -1,14 +1,39 @@
 import json
 import logging
+import math
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Any
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+import pyarrow.parquet as pq
 
-from .config import BASE_URL, DEFAULT_CATALOG
-from .httpx_client import fetch_json
+from .config import BASE_URL, DEFAULT_CATALOG, DEFAULT_QUEUE_SIZE
+from .httpx_client import fetch_bytes, fetch_json
+from .local_store import ARROW_FILE, get_observations_dir, get_request_spec
+from .manifest import (
+    DownloadManifest,
+    get_period_status,
+    open_manifest,
+    prepare_stream,
+)
 from .metadata import CbsMetadata, get_metadata
-from .query_builder import build_odata_query, construct_filter
+from .partition_writer import PageWriter, RowGroupWriter, WriteMode, create_writer
+from .query_builder import (
+    add_query_options,
+    build_odata_query,
+    construct_filter,
+    get_select_fields,
+)
+from .schema import get_observations_schema, get_parse_schema
+from .steps import Steps, call, run_steps
 
 logger = logging.getLogger(__name__)
 
@@ -20,80 +45,515 @@ def download_dataset(
     query: str | None = None,
     select: list[str] | None = None,
     base_url: str = BASE_URL,
+    workers: int | None = None,
+    write_mode: WriteMode = "pages",
+    row_group_size: int | None = None,
+    compression: str = "snappy",
+    max_file_rows: int | None = None,
+    resume: bool = True,
+    snapshot: dict[str, str | None] | None = None,
     **filters: Any,
 ) -> CbsMetadata:
     """
     Download observations and metadata for a specified dataset, saving them as Parquet files in the given directory.
+
+    With workers > 1 the observations are split in that many $skip/$top ranges which
+    are downloaded concurrently, each into its own partition files.
+
+    By default every response page is written to its own file. With write_mode
+    'row_groups' pages are appended as row groups of row_group_size rows to a single
+    file (per range), with a fixed schema derived from the metadata; max_file_rows
+    caps the number of rows per file.
+
+    The observations are stored in the Observations directory, or in a directory keyed
+    on the request for filtered downloads (see get_observations_dir).
+
+    Progress is recorded in a manifest in the observations directory. With resume, an
+    interrupted download of the same observations continues after the last completely
+    written file; otherwise the Observations directory is downloaded anew. snapshot,
+    the catalogue timestamps of the dataset (see get_snapshot), is stored in the
+    manifest so refresh_dataset can detect changes later.
     """
+    return run_steps(
+        download_dataset_steps(
+            id=id,
+            download_dir=download_dir,
+            catalog=catalog,
+            query=query,
+            select=select,
+            base_url=base_url,
+            workers=workers,
+            write_mode=write_mode,
+            row_group_size=row_group_size,
+            compression=compression,
+            max_file_rows=max_file_rows,
+            resume=resume,
+            snapshot=snapshot,
+            **filters,
+        )
+    )
 
+
+def download_dataset_steps(
+    id: str,
+    download_dir: str | Path | None = None,
+    catalog: str = DEFAULT_CATALOG,
+    query: str | None = None,
+    select: list[str] | None = None,
+    base_url: str = BASE_URL,
+    workers: int | None = None,
+    write_mode: WriteMode = "pages",
+    row_group_size: int | None = None,
+    compression: str = "snappy",
+    max_file_rows: int | None = None,
+    resume: bool = True,
+    snapshot: dict[str, str | None] | None = None,
+    **filters: Any,
+) -> Steps[CbsMetadata]:
+    """Steps of download_dataset, shared with the asyncio API (see steps.py)."""
     download_path = Path(download_dir or id)
-    download_path.mkdir(parents=True, exist_ok=True)
-    meta = get_metadata(id=id, catalog=catalog, base_url=base_url)
+    yield call(download_path.mkdir, parents=True, exist_ok=True)
+    meta = yield call(get_metadata, id=id, catalog=catalog, base_url=base_url)
+    yield call(save_metadata, meta, download_path)
+
+    path = build_observations_url(
+        id=id,
+        catalog=catalog,
+        query=query,
+        select=select,
+        base_url=base_url,
+        **filters,
+    )
+    spec = get_request_spec(query=query, select=select, filters=filters)
+    observations_dir = download_path / get_observations_dir(spec)
+    write_options = get_write_options(
+        meta,
+        select=select,
+        query=query,
+        write_mode=write_mode,
+        row_group_size=row_group_size,
+        compression=compression,
+        max_file_rows=max_file_rows,
+    )
+
+    manifest = yield call(open_manifest, observations_dir, path, resume=resume)
+    if manifest.update is not None:
+        yield call(
+            update_observations,
+            manifest,
+            observations_dir,
+            get_empty_dataframe(meta),
+            **write_options,
+        )
+        logger.info(f"The data is in '{download_path}'")
+        return meta
+    if not manifest.streams:
+        manifest.spec = spec
+        manifest.snapshot = snapshot
+        manifest.periods = get_period_status(meta)
+
+    if use_ranges(manifest, workers):
+        yield call(
+            download_observation_ranges,
+            url=path,
+            output_path=observations_dir,
+            empty_selection=get_empty_dataframe(meta),
+            workers=workers or len(manifest.ranges),
+            manifest=manifest,
+            **write_options,
+        )
+    else:
+        yield call(
+            download_data_stream,
+            url=path,
+            output_path=str(observations_dir),
+            empty_selection=get_empty_dataframe(meta),
+            manifest=manifest,
+            **write_options,
+        )
+    yield call(manifest.mark_complete)
+
+    logger.info(f"The data is in '{download_path}'")
+    return meta
+
+
+def update_observations(
+    manifest: DownloadManifest,
+    output_path: str | Path,
+    empty_selection: pd.DataFrame,
+    **write_options: Any,
+) -> None:
+    """
+    Apply the pending update of manifest to the observations in output_path.
 
-    def save_metadata(key: str, value: Any):
-        path_n = (
-            download_path
-            / f"{key}.{'parquet' if isinstance(value, (list, pd.DataFrame)) else 'json'}"
+    The observations of the changed periods are downloaded as a new stream, after which
+    the old rows of those periods are removed from the other partition files. Every
+    step can be repeated, so an interrupted update is completed by calling this again.
+    The Arrow IPC copy of the observations is removed, it is written again when read.
+    """
+    run_steps(
+        update_observations_steps(
+            manifest, output_path, empty_selection, **write_options
         )
-        if isinstance(value, (list, pd.DataFrame)):
+    )
+
+
+def update_observations_steps(
+    manifest: DownloadManifest,
+    output_path: str | Path,
+    empty_selection: pd.DataFrame,
+    **write_options: Any,
+) -> Steps[None]:
+    """Steps of update_observations, shared with the asyncio API (see steps.py)."""
+    update = manifest.update
+    yield call((Path(output_path) / ARROW_FILE).unlink, missing_ok=True)
+    yield call(
+        download_data_stream,
+        url=update["url"],
+        output_path=output_path,
+        empty_selection=empty_selection,
+        prefix=update["prefix"],
+        manifest=manifest,
+        **write_options,
+    )
+    yield call(
+        finish_update,
+        manifest,
+        output_path,
+        write_options.get("compression", "snappy"),
+    )
+
+
+def finish_update(
+    manifest: DownloadManifest, output_path: str | Path, compression: str = "snappy"
+) -> None:
+    """Complete the pending update of manifest once its periods are downloaded."""
+    update = manifest.update
+    remove_periods(
+        output_path,
+        dimension=update["dimension"],
+        periods=update["periods"],
+        keep=manifest.streams[update["prefix"]]["files"],
+        compression=compression,
+    )
+    manifest.snapshot = update["snapshot"]
+    manifest.periods = update["period_status"]
+    manifest.update = None
+    manifest.mark_complete()
+
+
+def remove_periods(
+    output_path: str | Path,
+    dimension: str,
+    periods: list[str],
+    keep: list[str],
+    compression: str = "snappy",
+) -> None:
+    """Remove the rows of periods from the partition files in output_path, except those in keep."""
+    value_set = pa.array(periods, pa.string())
+    for file_path in sorted(Path(output_path).glob("*.parquet")):
+        if file_path.name in keep:
+            continue
+        table = pq.read_table(file_path)
+        column = table.column(dimension).cast(pa.string())
+        mask = pc.invert(pc.is_in(column, value_set=value_set))
+        if pc.all(mask).as_py() is not False:
+            continue
+        logger.debug(f"Removing changed periods from {file_path}.")
+        tmp_path = file_path.with_name(f".{file_path.name}.tmp")
+        pq.write_table(table.filter(mask), tmp_path, compression=compression)
+        os.replace(tmp_path, file_path)
+
+
+def use_ranges(manifest: DownloadManifest, workers: int | None) -> bool:
+    """Return True if the download of manifest is split in ranges, resumed downloads keep their layout."""
+    if manifest.ranges is not None or manifest.streams:
+        return manifest.ranges is not None
+    return workers is not None and workers > 1
+
+
+def get_write_options(
+    meta: CbsMetadata,
+    select: list[str] | None = None,
+    query: str | None = None,
+    write_mode: WriteMode = "pages",
+    row_group_size: int | None = None,
+    compression: str = "snappy",
+    max_file_rows: int | None = None,
+) -> dict[str, Any]:
+    """Return the create_writer options for downloading the observations of meta."""
+    write_options = {
+        "write_mode": write_mode,
+        "schema": get_observations_schema(meta, select or get_select_fields(query)),
+        "row_group_size": row_group_size,
+        "compression": compression,
+    }
+    if write_mode == "row_groups":
+        write_options["max_file_rows"] = max_file_rows
+    return write_options
+
+
+def save_metadata(meta: CbsMetadata, download_path: Path) -> None:
+    """Save each metadata part as Parquet (lists) or JSON (dicts) in download_path."""
+    for key, value in meta.meta_dict.items():
+        is_table = isinstance(value, (list, pd.DataFrame))
+        path_n = download_path / f"{key}.{'parquet' if is_table else 'json'}"
+        if is_table:
             pd.DataFrame(value).to_parquet(path_n, engine="pyarrow", index=False)
         else:
             with open(path_n, "w", encoding="utf-8") as f:
                 json.dump(value, f, ensure_ascii=False, indent=4)
 
-    for key, value in meta.meta_dict.items():
-        save_metadata(key, value)
 
+def build_observations_url(
+    id: str,
+    catalog: str = DEFAULT_CATALOG,
+    query: str | None = None,
+    select: list[str] | None = None,
+    base_url: str = BASE_URL,
+    **filters: Any,
+) -> str:
+    """Build the Observations URL of a dataset from a raw query or filters and select."""
     observations_path = f"{base_url}/{catalog}/{id}/Observations"
     if query:
-        path = f"{observations_path}?{query}"
-    else:
-        filter_str = construct_filter(**filters)
-        odata_query = build_odata_query(filter_str=filter_str, select_fields=select)
-        path = f"{observations_path}{odata_query}"
+        return f"{observations_path}?{query}"
+    filter_str = construct_filter(**filters)
+    odata_query = build_odata_query(filter_str=filter_str, select_fields=select)
+    return f"{observations_path}{odata_query}"
+
+
+def get_empty_dataframe(meta: CbsMetadata) -> pd.DataFrame:
+    """Create an empty DataFrame with the required structure for empty selections."""
+    return get_observations_schema(meta).empty_table().to_pandas()
+
+
+def get_observation_ranges(url: str, workers: int) -> list[str]:
+    """
+    Split the observations selected by url into at most workers $skip/$top ranges.
+
+    The number of observations is requested with $count, the ranges are ordered by Id
+    so they don't overlap.
+    """
+    count = fetch_json(get_count_url(url))["@odata.count"]
+    return split_observation_ranges(url, count, workers)
+
+
+def get_count_url(url: str) -> str:
+    """Return the URL requesting only the number of observations selected by url."""
+    if "$skip=" in url or "$top=" in url:
+        raise ValueError("Range downloads can't be combined with $skip or $top.")
+    return add_query_options(url, top=0, count="true")
+
+
+def split_observation_ranges(url: str, count: int, workers: int) -> list[str]:
+    """Split count observations selected by url into at most workers $skip/$top URLs."""
+    if count == 0:
+        return [url]
+    size = math.ceil(count / workers)
+    options = {} if "$orderby=" in url else {"orderby": "Id"}
+    return [
+        add_query_options(url, **options, skip=start, top=size)
+        for start in range(0, count, size)
+    ]
 
-    observations_dir = download_path / "Observations"
 
-    download_data_stream(
-        url=path,
-        output_path=str(observations_dir),
-        empty_selection=get_empty_dataframe(meta),
+def download_observation_ranges(
+    url: str,
+    output_path: str | Path,
+    empty_selection: pd.DataFrame,
+    workers: int,
+    manifest: DownloadManifest | None = None,
+    **write_options: Any,
+) -> None:
+    """
+    Download the observations of url as concurrent ranges into output_path.
+
+    Range k is written to partition_{k:04d}_{n:06d}.parquet files, so the partitions
+    sort in the order of the observations. write_options are passed to create_writer.
+    The ranges are stored in manifest, so a resumed download uses the same ranges.
+    """
+    run_steps(
+        download_observation_ranges_steps(
+            url, output_path, empty_selection, workers, manifest, **write_options
+        )
     )
 
-    logger.info(f"The data is in '{download_path}'")
-    return meta
 
+def download_observation_ranges_steps(
+    url: str,
+    output_path: str | Path,
+    empty_selection: pd.DataFrame,
+    workers: int,
+    manifest: DownloadManifest | None = None,
+    **write_options: Any,
+) -> Steps[None]:
+    """Steps of download_observation_ranges, shared with the asyncio API (see steps.py)."""
+    if manifest is not None and manifest.ranges is not None:
+        ranges = manifest.ranges
+    else:
+        ranges = yield call(get_observation_ranges, url, workers)
+        if manifest is not None:
+            manifest.ranges = ranges
+            yield call(manifest.save)
+    logger.info(f"Downloading {url} in {len(ranges)} ranges.")
+    yield call(
+        download_data_streams,
+        [
+            {"url": range_url, "prefix": f"partition_{k:04d}"}
+            for k, range_url in enumerate(ranges)
+        ],
+        output_path=output_path,
+        empty_selection=empty_selection,
+        workers=workers,
+        manifest=manifest,
+        **write_options,
+    )
 
-def get_empty_dataframe(meta: CbsMetadata) -> pd.DataFrame:
-    """Create an empty DataFrame with the required structure for empty selections."""
-    columns = ["Id", "Measure", "ValueAttribute", "Value"] + meta.dimension_identifiers
-    empty_df = pd.DataFrame(columns=columns)
-    return empty_df
+
+def download_data_streams(
+    streams: list[dict[str, str]],
+    output_path: str | Path,
+    empty_selection: pd.DataFrame,
+    workers: int,
+    manifest: DownloadManifest | None = None,
+    **write_options: Any,
+) -> None:
+    """Download streams (url and prefix of each) with download_data_stream in workers threads."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                download_data_stream,
+                **stream,
+                output_path=output_path,
+                empty_selection=empty_selection,
+                manifest=manifest,
+                **write_options,
+            )
+            for stream in streams
+        ]
+        for future in futures:
+            future.result()
 
 
 def download_data_stream(
     url: str,
     output_path: str | Path,
     empty_selection: pd.DataFrame,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    prefix: str = "partition",
+    manifest: DownloadManifest | None = None,
+    **write_options: Any,
 ) -> None:
-    """Download data from an url to output_path folder."""
-    output_path = Path(output_path)
-
-    def fetch_and_process_data(url: str, partition: int) -> str | None:
-        """Fetch data from URL, process it, and write to the output directory."""
-        data = fetch_json(url)
-        values = data.get("value", empty_selection.to_dict(orient="records"))
-        df = pd.DataFrame(values)
-        file_path = output_path / f"partition_{partition}.parquet"
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_parquet(str(file_path), engine="pyarrow", index=False)
-        return data.get("@odata.nextLink")
-
-    logger.info(f"Retrieving {url}")
-    partition = 0
-    next_link = fetch_and_process_data(url, partition)
-
-    while next_link:
-        partition += 1
-        logger.info(f"Retrieving {next_link}")
-        next_link = fetch_and_process_data(next_link, partition)
+    """
+    Download data from an url to output_path folder.
+
+    Pages are fetched and parsed into Arrow tables while a writer thread writes the
+    previous ones. At most queue_size parsed pages wait to be written, after which
+    fetching blocks. write_options are passed to create_writer.
+
+    With a manifest, every completely written file is recorded in it and a stream that
+    was interrupted before continues at the first page not written yet. The writer is
+    only closed when the stream ended, after an error it is aborted, so no file is
+    recorded as the end of the stream.
+    """
+    stream = open_stream(url, output_path, prefix, manifest, **write_options)
+    if stream is None:
+        return
+    writer, url = stream
+    pages: queue.Queue[tuple[pa.Table, str | None] | None] = queue.Queue(
+        maxsize=max(1, queue_size)
+    )
+    errors: list[BaseException] = []
+    ended = threading.Event()
+
+    def write_pages() -> None:
+        while (page := pages.get()) is not None:
+            if errors:
+                continue
+            try:
+                writer.write(*page)
+            except BaseException as e:
+                errors.append(e)
+        try:
+            if ended.is_set() and not errors:
+                writer.close()
+            else:
+                writer.abort()
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=write_pages, name="cbsodata4-writer", daemon=True)
+    thread.start()
+    try:
+        next_link = url
+        while next_link and not errors:
+            logger.info(f"Retrieving {next_link}")
+            table, next_link = parse_observations_page(
+                fetch_bytes(next_link), empty_selection, write_options.get("schema")
+            )
+            pages.put((table, next_link))
+        if not next_link:
+            ended.set()
+    finally:
+        pages.put(None)
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+def open_stream(
+    url: str,
+    output_path: str | Path,
+    prefix: str = "partition",
+    manifest: DownloadManifest | None = None,
+    **write_options: Any,
+) -> tuple[PageWriter | RowGroupWriter, str] | None:
+    """
+    Return the writer of stream prefix and the link of its first page to download.
+
+    With a manifest, the stream continues where it was interrupted and None is
+    returned if it is done already.
+    """
+    start, on_commit = 0, None
+    if manifest is not None:
+        progress = prepare_stream(manifest, output_path, prefix, url)
+        if progress is None:
+            return None
+        start, url = progress
+        on_commit = partial(manifest.record, prefix)
+    writer = create_writer(
+        output_path, prefix=prefix, start=start, on_commit=on_commit, **write_options
+    )
+    return writer, url
+
+
+def parse_observations_page(
+    body: bytes, empty_selection: pd.DataFrame, schema: pa.Schema | None = None
+) -> tuple[pa.Table, str | None]:
+    """
+    Parse the body of an Observations response page directly into an Arrow table.
+
+    The Arrow JSON reader builds the columns without materialising the observations
+    as Python objects, with the types of schema if given instead of inferring them.
+    Returns the observations and the link to the next page.
+    """
+    page = pj.read_json(
+        pa.BufferReader(pa.py_buffer(body)),
+        read_options=pj.ReadOptions(block_size=len(body) + 1),
+        parse_options=pj.ParseOptions(
+            newlines_in_values=True,
+            explicit_schema=None if schema is None else get_parse_schema(schema),
+        ),
+    )
+
+    next_link = None
+    if "@odata.nextLink" in page.column_names:
+        next_link = page.column("@odata.nextLink")[0].as_py()
+
+    values = None
+    if "value" in page.column_names:
+        values = page.column("value").combine_chunks()
+    if values is None or len(values.flatten()) == 0:
+        return pa.Table.from_pandas(empty_selection, preserve_index=False), next_link
+    return pa.Table.from_struct_array(values.flatten()), next_link
@@ -1,20 +1,371 @@
+import asyncio
+import atexit
+import importlib.util
 import logging
-from functools import cache
-from typing import Any
+import threading
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Self
 
 import httpx
 
+from .config import (
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    DEFAULT_TIMEOUT,
+)
+from .response_cache import CacheEntry, LRUResponseCache, ResponseCache
+
 logger = logging.getLogger(__name__)
 
 
-@cache
+def http2_available() -> bool:
+    """Return True if the optional h2 package needed for HTTP/2 is installed."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class CbsClient:
+    """
+    Pooled, keep-alive HTTP client shared by all requests to the CBS APIs.
+
+    The underlying httpx.Client is created on first use. Using an instance as a
+    context manager makes it the active client for the duration of the block and
+    closes it afterwards.
+    """
+
+    def __init__(
+        self,
+        timeout: float | httpx.Timeout = DEFAULT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        http2: bool | None = None,
+    ):
+        if http2 is None:
+            http2 = http2_available()
+        elif http2 and not http2_available():
+            raise ImportError(
+                "HTTP/2 support requires the 'h2' package, install it with 'pip install httpx[http2]'."
+            )
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.http2 = http2
+        self._client: httpx.Client | None = None
+        self._lock = threading.Lock()
+        self._previous: CbsClient | None = None
+
+    @property
+    def client(self) -> httpx.Client:
+        """Return the underlying httpx.Client, creating it if needed."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        timeout=self.timeout,
+                        limits=self.limits,
+                        http2=self.http2,
+                        follow_redirects=True,
+                    )
+        return self._client
+
+    def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a GET request over the pooled connection."""
+        return self.client.get(url, **kwargs)
+
+    def close(self) -> None:
+        """Close all pooled connections. The client is recreated on next use."""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def __enter__(self) -> Self:
+        self._previous = set_client(self)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        set_client(self._previous)
+        self._previous = None
+        self.close()
+
+
+_client: CbsClient | None = None
+
+
+def get_client() -> CbsClient:
+    """Return the active client, creating a default one if none is set."""
+    global _client
+    if _client is None:
+        _client = CbsClient()
+    return _client
+
+
+def set_client(client: CbsClient | None) -> CbsClient | None:
+    """Make client the active client and return the previously active one."""
+    global _client
+    previous, _client = _client, client
+    return previous
+
+
+def configure_client(**kwargs: Any) -> CbsClient:
+    """
+    Replace the active client by a new one created with the given CbsClient arguments
+    (timeout, max_connections, max_keepalive_connections, http2).
+    """
+    client = CbsClient(**kwargs)
+    previous = set_client(client)
+    if previous is not None:
+        previous.close()
+    return client
+
+
+def close_client() -> None:
+    """Close the active client and release its connections."""
+    previous = set_client(None)
+    if previous is not None:
+        previous.close()
+
+
+atexit.register(close_client)
+
+
+class AsyncCbsClient:
+    """
+    Pooled HTTP client for the asyncio API, wrapping an httpx.AsyncClient.
+
+    Use an instance as an async context manager, ``async with AsyncCbsClient() as
+    client``, which makes it the active async client of the current task (and the
+    tasks started from it) for the duration of the block and closes it afterwards.
+    Otherwise, close it with aclose before its event loop is closed.
+
+    The underlying httpx.AsyncClient is bound to the event loop it is first used in,
+    so an open client can't be shared with another loop.
+    """
+
+    def __init__(
+        self,
+        timeout: float | httpx.Timeout = DEFAULT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        http2: bool | None = None,
+    ):
+        if http2 is None:
+            http2 = http2_available()
+        elif http2 and not http2_available():
+            raise ImportError(
+                "HTTP/2 support requires the 'h2' package, install it with 'pip install httpx[http2]'."
+            )
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.http2 = http2
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._previous: AsyncCbsClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Return the httpx.AsyncClient of the running event loop, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            if not self._loop.is_closed():
+                raise RuntimeError(
+                    "AsyncCbsClient is in use by another event loop, "
+                    "use one client per loop with 'async with AsyncCbsClient()'."
+                )
+            logger.warning(
+                "Discarding an AsyncCbsClient whose event loop was closed before "
+                "calling aclose, its connections were not closed."
+            )
+            self._client = None
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                follow_redirects=True,
+            )
+            self._loop = loop
+        return self._client
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a GET request over the pooled connection."""
+        return await self.client.get(url, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close all pooled connections. The client is recreated on next use."""
+        if self._client is not None:
+            client, self._client, self._loop = self._client, None, None
+            await client.aclose()
+
+    async def __aenter__(self) -> Self:
+        self._previous = set_async_client(self)
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        set_async_client(self._previous)
+        self._previous = None
+        await self.aclose()
+
+
+_async_client: ContextVar[AsyncCbsClient | None] = ContextVar(
+    "cbsodata4_async_client", default=None
+)
+
+
+def get_async_client() -> AsyncCbsClient | None:
+    """Return the active async client, None if no client is active."""
+    return _async_client.get()
+
+
+def set_async_client(client: AsyncCbsClient | None) -> AsyncCbsClient | None:
+    """Make client the active async client and return the previously active one."""
+    previous = _async_client.get()
+    _async_client.set(client)
+    return previous
+
+
+@asynccontextmanager
+async def use_async_client() -> AsyncIterator[AsyncCbsClient]:
+    """
+    Use the active async client, or a new one for the duration of the block.
+
+    A client created here is closed at the end of the block, so connections are
+    pooled within the block without outliving it.
+    """
+    client = get_async_client()
+    if client is not None:
+        yield client
+        return
+    async with AsyncCbsClient() as client:
+        yield client
+
+
+_cache: ResponseCache | None = LRUResponseCache()
+
+
+def get_cache() -> ResponseCache | None:
+    """Return the response cache used by fetch_json, None if caching is disabled."""
+    return _cache
+
+
+def set_cache(cache: ResponseCache | None) -> ResponseCache | None:
+    """Use cache for fetch_json responses (None disables caching), return the previous one."""
+    global _cache
+    previous, _cache = _cache, cache
+    return previous
+
+
+def _conditional_headers(entry: CacheEntry | None) -> dict[str, str]:
+    """Return the headers revalidating a stale cache entry."""
+    headers = {}
+    if entry is not None:
+        if entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified is not None:
+            headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+
+def _handle_response(
+    path: str,
+    response: httpx.Response,
+    cache: ResponseCache | None,
+    entry: CacheEntry | None,
+) -> dict[str, Any]:
+    """Return the JSON of response, reusing entry on a 304 and storing it in cache otherwise."""
+    if entry is not None and response.status_code == 304:
+        logger.info(f"{path} not modified, using cached response.")
+        cache.refresh(path)
+        return entry.value
+    response.raise_for_status()
+    data = response.json()
+    if cache is not None:
+        cache.set(
+            path,
+            data,
+            response.content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+    return data
+
+
 def fetch_json(path: str) -> dict[str, Any]:
-    """Retrieve JSON data from a URL."""
+    """
+    Retrieve JSON data from a URL, served from the response cache when possible.
+
+    Expired cache entries with an ETag or Last-Modified validator are revalidated
+    with a conditional request, a 304 response reuses the cached body.
+    """
+    cache = _cache
+    entry = cache.get(path) if cache is not None else None
+    if entry is not None and entry.is_fresh():
+        return entry.value
+
+    logger.info(f"Retrieving {path}")
+    try:
+        response = get_client().get(path, headers=_conditional_headers(entry))
+        return _handle_response(path, response, cache, entry)
+    except httpx.HTTPError as e:
+        logger.error(f"HTTP error while fetching {path}: {e}")
+        raise
+
+
+async def async_fetch_json(path: str) -> dict[str, Any]:
+    """Asynchronous version of fetch_json, using the active async client."""
+    cache = _cache
+    entry = cache.get(path) if cache is not None else None
+    if entry is not None and entry.is_fresh():
+        return entry.value
+
+    logger.info(f"Retrieving {path}")
+    try:
+        async with use_async_client() as client:
+            response = await client.get(path, headers=_conditional_headers(entry))
+        return _handle_response(path, response, cache, entry)
+    except httpx.HTTPError as e:
+        logger.error(f"HTTP error while fetching {path}: {e}")
+        raise
+
+
+def fetch_bytes(path: str) -> bytearray:
+    """
+    Retrieve the raw body of a URL without parsing it.
+
+    The response is streamed into a single buffer, bypassing the response cache.
+    """
+    logger.info(f"Retrieving {path}")
+    try:
+        with get_client().client.stream("GET", path) as response:
+            response.raise_for_status()
+            body = bytearray()
+            for chunk in response.iter_bytes():
+                body += chunk
+            return body
+    except httpx.HTTPError as e:
+        logger.error(f"HTTP error while fetching {path}: {e}")
+        raise
+
+
+async def async_fetch_bytes(path: str) -> bytearray:
+    """Asynchronous version of fetch_bytes, using the active async client."""
     logger.info(f"Retrieving {path}")
     try:
-        response = httpx.get(path)
-        response.raise_for_status()
-        return response.json()
+        async with (
+            use_async_client() as client,
+            client.client.stream("GET", path) as response,
+        ):
+            response.raise_for_status()
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+            return body
     except httpx.HTTPError as e:
         logger.error(f"HTTP error while fetching {path}: {e}")
         raise
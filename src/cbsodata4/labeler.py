@@ -1,5 +1,6 @@
 import logging
 
+import numpy as np
 import pandas as pd
 
 from .metadata import CbsMetadata
@@ -8,7 +9,12 @@ logger = logging.getLogger(__name__)
 
 
 def add_label_columns(data: pd.DataFrame) -> pd.DataFrame:
-    """Add descriptive label columns to the data based on metadata mappings."""
+    """
+    Add descriptive label columns to the data based on metadata mappings.
+
+    Label columns are Categoricals: the labels are looked up for the codes of a column
+    (its categories if it is categorical), not for every row.
+    """
     meta: CbsMetadata = data.attrs.get("meta")
     if meta is None:
         raise ValueError("add_label_columns requires metadata.")
@@ -18,7 +24,7 @@ def add_label_columns(data: pd.DataFrame) -> pd.DataFrame:
 
     for col, mapping in meta.get_label_mappings().items():
         if col in data.columns:
-            new_columns[f"{col}Label"] = data[col].map(mapping)
+            new_columns[f"{col}Label"] = map_categories(data[col], mapping)
         elif col != "Measure":
             raise ValueError(
                 f"Data does not contain column '{col}' required for labeling."
@@ -37,3 +43,22 @@ def add_label_columns(data: pd.DataFrame) -> pd.DataFrame:
     result.attrs = data.attrs.copy()
 
     return result
+
+
+def map_categories(column: pd.Series, mapping: dict[str, str]) -> pd.Categorical:
+    """
+    Map the codes in column to a Categorical of their labels in mapping.
+
+    Codes without a label become missing. Codes sharing a label share its category,
+    otherwise the label column has the integer codes of the code column.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes, categories = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        codes, categories = pd.factorize(column)
+    labels = pd.Index(categories).map(mapping)
+    if labels.is_unique and not labels.hasnans:
+        return pd.Categorical.from_codes(codes, categories=labels)
+    label_codes, label_categories = pd.factorize(labels)
+    label_codes = np.append(label_codes, -1)
+    return pd.Categorical.from_codes(label_codes[codes], categories=label_categories)
@@ -0,0 +1,166 @@
+import copy
+import logging
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from .config import BASE_URL, DEFAULT_BATCH_SIZE, DEFAULT_CATALOG
+from .metadata import CbsMetadata
+from .observations import (
+    OutputFormat,
+    check_output,
+    convert_table,
+    encode_code_columns,
+    ensure_observations,
+    get_read_columns,
+    get_read_filter,
+)
+from .schema import decode_dictionaries
+
+logger = logging.getLogger(__name__)
+
+
+class LazyObservations:
+    """
+    Observations on disk that are only read when iterated over or materialised.
+
+    Selecting columns and filtering rows return a new handle and are pushed down into
+    the Parquet scan, so nothing is read until iter_batches, count, to_arrow or
+    to_pandas is called. iter_batches keeps at most a few batches in memory, which
+    allows processing tables that don't fit in memory.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        meta: CbsMetadata,
+        columns: list[str] | None = None,
+        filter: pc.Expression | None = None,
+        categorical: bool = True,
+    ):
+        self.path = Path(path)
+        self.meta = meta
+        self.categorical = categorical
+        if not self.path.exists():
+            raise FileNotFoundError(f"Observations directory not found at {self.path}.")
+        self.dataset = ds.dataset(str(self.path), format="parquet")
+        self.columns = columns if columns is not None else list(self.schema.names)
+        self.filter = filter
+
+    def __repr__(self) -> str:
+        return f"LazyObservations(path={str(self.path)!r}, columns={self.columns!r})"
+
+    @property
+    def schema(self) -> pa.Schema:
+        """Schema of the stored observations."""
+        return self.dataset.schema
+
+    def _replace(self, **changes: Any) -> "LazyObservations":
+        handle = copy.copy(self)
+        handle.__dict__.update(changes)
+        return handle
+
+    def select(self, columns: list[str]) -> "LazyObservations":
+        """Return a handle reading only columns."""
+        missing = [name for name in columns if name not in self.schema.names]
+        if missing:
+            raise ValueError(f"Columns {missing} are not in the observations.")
+        return self._replace(columns=get_read_columns(self.schema, columns))
+
+    def where(
+        self, expression: pc.Expression | None = None, **filters: Any
+    ) -> "LazyObservations":
+        """
+        Return a handle reading only the rows matching expression and filters.
+
+        filters map a column to a code or list of codes, as in get_observations;
+        expression is any pyarrow dataset expression. Both are combined with the
+        filters of this handle.
+        """
+        combined = self.filter
+        for condition in (expression, get_read_filter(self.schema, filters)):
+            if condition is not None:
+                combined = condition if combined is None else combined & condition
+        return self._replace(filter=combined)
+
+    def count(self) -> int:
+        """Return the number of matching rows without reading the columns."""
+        return self.dataset.count_rows(filter=self.filter)
+
+    def _prepare(self, table: pa.Table) -> pa.Table:
+        if self.categorical:
+            return encode_code_columns(table, self.meta)
+        return decode_dictionaries(table)
+
+    def iter_batches(
+        self, batch_size: int = DEFAULT_BATCH_SIZE, output: OutputFormat = "pandas"
+    ) -> Iterator[Any]:
+        """
+        Iterate over the matching observations in chunks of at most batch_size rows.
+
+        Every chunk is converted like get_observations does, to the format output.
+        """
+        check_output(output)
+        scanner = self.dataset.scanner(
+            columns=self.columns, filter=self.filter, batch_size=batch_size
+        )
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                table = pa.Table.from_batches([batch])
+                yield convert_table(self._prepare(table), self.meta, output)
+
+    def to_arrow(self) -> pa.Table:
+        """Read all matching observations into a pyarrow Table."""
+        table = self.dataset.to_table(columns=self.columns, filter=self.filter)
+        return convert_table(self._prepare(table), self.meta, "arrow")
+
+    def to_pandas(self) -> Any:
+        """Read all matching observations into a pandas DataFrame."""
+        table = self.dataset.to_table(columns=self.columns, filter=self.filter)
+        return convert_table(self._prepare(table), self.meta, "pandas")
+
+
+def open_observations(
+    id: str,
+    catalog: str = DEFAULT_CATALOG,
+    download_dir: str | Path | None = None,
+    query: str | None = None,
+    select: list[str] | None = None,
+    include_id: bool = True,
+    base_url: str = BASE_URL,
+    overwrite: bool = False,
+    workers: int | None = None,
+    categorical: bool = True,
+    refresh: bool = False,
+    **filters: dict[str, Any],
+) -> LazyObservations:
+    """
+    Open the observations of a dataset without reading them into memory.
+
+    The observations are downloaded or reused like in get_observations, but instead of
+    a DataFrame a LazyObservations handle over the files on disk is returned.
+    """
+    meta, download_path, observations_dir = ensure_observations(
+        id=id,
+        catalog=catalog,
+        download_dir=download_dir,
+        query=query,
+        select=select,
+        base_url=base_url,
+        overwrite=overwrite,
+        workers=workers,
+        refresh=refresh,
+        **filters,
+    )
+
+    handle = LazyObservations(
+        download_path / observations_dir, meta, categorical=categorical
+    )
+    handle = handle._replace(
+        columns=get_read_columns(handle.schema, select, include_id)
+    )
+    return handle.where(**filters)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+from .manifest import DownloadManifest
+
+logger = logging.getLogger(__name__)
+
+OBSERVATIONS_DIR = "Observations"
+# Uncompressed Arrow IPC copy of the observations for memory mapped reading, the
+# leading underscore keeps it out of the Parquet dataset.
+ARROW_FILE = "_observations.arrow"
+
+
+def get_request_spec(
+    query: str | None = None,
+    select: list[str] | None = None,
+    filters: dict[str, str | list[str]] | None = None,
+) -> dict[str, Any]:
+    """Return the normalised description of an observations request, independent of order."""
+    return {
+        "query": query.strip() if query else None,
+        "select": sorted(set(select)) if select else None,
+        "filters": {
+            column: sorted({values} if isinstance(values, str) else set(values))
+            for column, values in sorted((filters or {}).items())
+        },
+    }
+
+
+def get_observations_dir(spec: dict[str, Any]) -> str:
+    """
+    Return the name of the directory storing the observations of spec.
+
+    The complete table is stored in Observations, other requests in
+    Observations_{hash} with a hash of the normalised request.
+    """
+    if spec["query"] is None and spec["select"] is None and not spec["filters"]:
+        return OBSERVATIONS_DIR
+    key = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+    return f"{OBSERVATIONS_DIR}_{hashlib.sha256(key.encode()).hexdigest()[:12]}"
+
+
+def covers(stored: dict[str, Any], requested: dict[str, Any]) -> bool:
+    """
+    Return True if the observations of request stored include those of requested.
+
+    Raw queries are only matched exactly. Otherwise stored must contain all requested
+    columns and every stored filter must be at least as wide as the requested one;
+    requested filters on other columns are applied when reading.
+    """
+    if stored["query"] is not None or requested["query"] is not None:
+        return stored == requested
+
+    stored_columns = None if stored["select"] is None else set(stored["select"])
+    if stored_columns is not None and (
+        requested["select"] is None or not stored_columns >= set(requested["select"])
+    ):
+        return False
+
+    for column, values in stored["filters"].items():
+        if column not in requested["filters"]:
+            return False
+        requested_values = set(requested["filters"][column])
+        if not set(values) >= requested_values:
+            return False
+        if requested_values != set(values) and not (
+            stored_columns is None or column in stored_columns
+        ):
+            return False
+
+    return all(
+        column in stored["filters"]
+        or stored_columns is None
+        or column in stored_columns
+        for column in requested["filters"]
+    )
+
+
+def find_observations_dir(
+    download_path: Path, spec: dict[str, Any], exact: bool = False
+) -> str | None:
+    """
+    Return the directory in download_path to answer spec from, None if there is none.
+
+    The directory of spec itself is used when complete. Unless exact, any other
+    complete download whose request covers spec is used too.
+    """
+    name = get_observations_dir(spec)
+    manifest = DownloadManifest.load(download_path / name)
+    if manifest is None and (download_path / name).exists():
+        logger.warning(
+            f"{download_path / name} has no download manifest, it can't be verified to be complete."
+        )
+        return name
+    if manifest is not None and manifest.complete:
+        return name
+    if exact:
+        return None
+
+    for path in sorted(download_path.glob(f"{OBSERVATIONS_DIR}*")):
+        manifest = DownloadManifest.load(path)
+        if (
+            manifest is not None
+            and manifest.complete
+            and manifest.spec is not None
+            and covers(manifest.spec, spec)
+        ):
+            logger.info(f"Answering the request from the download in {path}.")
+            return path.name
+    return None
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from .metadata import CbsMetadata
+
+logger = logging.getLogger(__name__)
+
+# The leading underscore makes Arrow dataset discovery skip the file when reading
+# the observations directory.
+MANIFEST_FILE = "_manifest.json"
+
+
+class DownloadManifest:
+    """
+    Progress of an observations download, stored as _manifest.json in the observations directory.
+
+    For every stream of pages (the whole download, or each range of a range download)
+    the manifest records the files that have been completely written and the link to
+    the page following them, so an interrupted download can resume there. The
+    manifest is replaced atomically on every update; complete is only set once all
+    streams are done.
+
+    It also records the normalised request the observations were downloaded for
+    (spec, see get_request_spec) and, for refreshing the download, the catalogue
+    timestamps (snapshot),
+    the status of every period of the time dimension (periods) and the pending
+    update of changed periods, if any.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        url: str,
+        ranges: list[str] | None = None,
+        streams: dict[str, dict[str, Any]] | None = None,
+        complete: bool = False,
+        snapshot: dict[str, str | None] | None = None,
+        periods: dict[str, str | None] | None = None,
+        update: dict[str, Any] | None = None,
+        spec: dict[str, Any] | None = None,
+    ):
+        self.path = Path(path)
+        self.url = url
+        self.ranges = ranges
+        self.streams = streams or {}
+        self.complete = complete
+        self.snapshot = snapshot
+        self.periods = periods
+        self.update = update
+        self.spec = spec
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, observations_path: str | Path) -> "DownloadManifest | None":
+        """Load the manifest of observations_path, None if there is none."""
+        path = Path(observations_path) / MANIFEST_FILE
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        return cls(
+            path,
+            url=data["url"],
+            ranges=data.get("ranges"),
+            streams=data.get("streams"),
+            complete=data.get("complete", False),
+            snapshot=data.get("snapshot"),
+            periods=data.get("periods"),
+            update=data.get("update"),
+            spec=data.get("spec"),
+        )
+
+    def save(self) -> None:
+        """Atomically replace the manifest file."""
+        with self._lock:
+            data = {
+                "url": self.url,
+                "ranges": self.ranges,
+                "streams": self.streams,
+                "complete": self.complete,
+                "snapshot": self.snapshot,
+                "periods": self.periods,
+                "update": self.update,
+                "spec": self.spec,
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def get_stream(self, name: str, url: str) -> dict[str, Any]:
+        """Return the progress of stream name, starting at url if it is new."""
+        with self._lock:
+            return self.streams.setdefault(
+                name, {"url": url, "next_link": url, "files": [], "done": False}
+            )
+
+    def record(self, name: str, file_path: Path, next_link: str | None) -> None:
+        """Record that file_path of stream name is complete and the stream continues at next_link."""
+        with self._lock:
+            stream = self.streams[name]
+            stream["files"].append(Path(file_path).name)
+            stream["next_link"] = next_link
+            stream["done"] = next_link is None
+        self.save()
+
+    def mark_complete(self) -> None:
+        """Mark the download as complete, after which its files can be trusted."""
+        self.complete = True
+        self.save()
+
+
+def open_manifest(
+    observations_path: str | Path, url: str, resume: bool = False
+) -> DownloadManifest:
+    """
+    Return the manifest for downloading url into observations_path.
+
+    With resume, the manifest of an interrupted download of the same url is reused.
+    Otherwise observations_path is emptied and a new manifest is started.
+    """
+    observations_path = Path(observations_path)
+    manifest = DownloadManifest.load(observations_path) if resume else None
+    if manifest is not None and not manifest.complete and manifest.url == url:
+        logger.info(f"Resuming interrupted download of {url}.")
+        return manifest
+
+    if observations_path.exists():
+        shutil.rmtree(observations_path)
+    manifest = DownloadManifest(observations_path / MANIFEST_FILE, url)
+    manifest.save()
+    return manifest
+
+
+def prepare_stream(
+    manifest: DownloadManifest, output_path: str | Path, prefix: str, url: str
+) -> tuple[int, str] | None:
+    """
+    Prepare resuming stream prefix of manifest.
+
+    Removes partition files of the stream that were not recorded as complete and
+    returns the number of complete files and the link to continue at, or None if the
+    stream is already done.
+    """
+    stream = manifest.get_stream(prefix, url)
+    if stream["done"]:
+        return None
+
+    pattern = re.compile(rf"^{re.escape(prefix)}_\d+\.parquet$")
+    for file_path in Path(output_path).glob(f"{prefix}_*.parquet"):
+        if pattern.match(file_path.name) and file_path.name not in stream["files"]:
+            logger.debug(f"Removing incomplete partition {file_path}.")
+            file_path.unlink()
+    return len(stream["files"]), stream["next_link"] or url
+
+
+def get_snapshot(dataset: pd.Series | dict[str, Any]) -> dict[str, str | None]:
+    """Return the Modified and ObservationsModified timestamps of a get_datasets row."""
+    snapshot = {}
+    for key in ["Modified", "ObservationsModified"]:
+        value = dataset.get(key)
+        snapshot[key] = None if pd.isna(value) else pd.Timestamp(value).isoformat()
+    return snapshot
+
+
+def get_period_status(meta: CbsMetadata) -> dict[str, str | None]:
+    """Return the Status of every code of the time dimension, empty unless there is exactly one."""
+    time_dimensions = meta.time_dimension_identifiers
+    if len(time_dimensions) != 1:
+        return {}
+    return dict(meta.get_code_mapping(time_dimensions[0], "Status"))
@@ -1,20 +1,50 @@
+import json
 import logging
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import pandas as pd
+import pyarrow as pa
 
-from .config import BASE_URL, DEFAULT_CATALOG
+from .config import BASE_URL, DEFAULT_CATALOG, DEFAULT_MAX_WORKERS
 from .httpx_client import fetch_json
 
 logger = logging.getLogger(__name__)
 
+# Key of the metadata in the schema metadata of Arrow tables returned by cbsodata4.
+META_KEY = b"cbsodata4.meta"
+
 
 class CbsMetadata:
-    """Class to handle CBS metadata and provide convenient access methods."""
+    """
+    Class to handle CBS metadata and provide convenient access methods.
+
+    Lookups are built from meta_dict once, on first use, and rebuilt only when
+    meta_dict is replaced. The returned lists and dicts are shared between calls and
+    must not be modified.
+    """
+
+    __slots__ = ("_index", "_meta_dict")
 
     def __init__(self, meta_dict: dict[str, Any]):
         self.meta_dict = meta_dict
 
+    @property
+    def meta_dict(self) -> dict[str, Any]:
+        """Return the metadata as fetched from the API."""
+        return self._meta_dict
+
+    @meta_dict.setter
+    def meta_dict(self, meta_dict: dict[str, Any]) -> None:
+        self._meta_dict = meta_dict
+        self._index: dict[Any, Any] = {}
+
+    def _cached(self, key: Any, build: Callable[[], Any]) -> Any:
+        if key not in self._index:
+            self._index[key] = build()
+        return self._index[key]
+
     @property
     def identifier(self) -> str:
         """Return the identifier of the dataset."""
@@ -28,16 +58,22 @@ class CbsMetadata:
     @property
     def dimension_identifiers(self) -> list[str]:
         """Return a list of dimension identifiers in the dataset."""
-        return [dim["Identifier"] for dim in self.meta_dict.get("Dimensions", [])]
+        return self._cached(
+            "dimensions",
+            lambda: [dim["Identifier"] for dim in self.meta_dict.get("Dimensions", [])],
+        )
 
     @property
     def time_dimension_identifiers(self) -> list[str]:
         """Return a list of time dimension identifiers in the dataset."""
-        return [
-            dim["Identifier"]
-            for dim in self.meta_dict.get("Dimensions", [])
-            if dim.get("Kind") == "TimeDimension"
-        ]
+        return self._cached(
+            "time_dimensions",
+            lambda: [
+                dim["Identifier"]
+                for dim in self.meta_dict.get("Dimensions", [])
+                if dim.get("Kind") == "TimeDimension"
+            ],
+        )
 
     def get_codes(self) -> list[str]:
         """Return a list of code fields in the metadata."""
@@ -50,21 +86,75 @@ class CbsMetadata:
     @property
     def measurecode_mapping(self) -> dict[str, str]:
         """Returns a dictionary mapping measure identifiers to titles"""
-        measure_codes = self.meta_dict.get("MeasureCodes", [])
-        return {m["Identifier"]: m["Title"] for m in measure_codes}
+        return self.get_code_mapping("Measure")
+
+    @property
+    def measure_units(self) -> dict[str, str]:
+        """Returns a dictionary mapping measure identifiers to units"""
+        return self.get_code_mapping("Measure", "Unit")
 
     def get_dimension_mapping(self, dim_col: str) -> dict[str, str]:
         """Returns a dictionary mapping dimension identifiers to titles"""
-        codes_field = f"{dim_col}Codes"
-        codes = self.meta_dict.get(codes_field, [])
-        return {code["Identifier"]: code["Title"] for code in codes}
+        return self.get_code_mapping(dim_col)
+
+    def get_code_mapping(self, col: str, field: str = "Title") -> dict[str, Any]:
+        """Returns a dictionary mapping the codes of a dimension or 'Measure' to field"""
+        return self._cached(
+            ("codes", col, field),
+            lambda: {
+                code["Identifier"]: code.get(field)
+                for code in self.meta_dict.get(f"{col}Codes", [])
+            },
+        )
+
+    def get_code_identifiers(self, col: str) -> list[str]:
+        """Returns the code identifiers of a dimension or 'Measure', in metadata order"""
+        return self._cached(
+            ("identifiers", col), lambda: list(self.get_code_mapping(col, "Identifier"))
+        )
+
+    def get_code_groups(self, col: str) -> dict[str, str | None]:
+        """Returns a dictionary mapping the codes of a dimension or 'Measure' to their group"""
+        field = "MeasureGroupId" if col == "Measure" else "DimensionGroupId"
+        return self.get_code_mapping(col, field)
+
+    def get_group_parents(self, col: str) -> dict[str, str | None]:
+        """Returns a dictionary mapping the groups of a dimension or 'Measure' to their parent"""
+        return self._cached(
+            ("parents", col),
+            lambda: {
+                group["Id"]: group.get("ParentId")
+                for group in self.meta_dict.get(f"{col}Groups", [])
+            },
+        )
+
+    def get_group_children(self, col: str) -> dict[str | None, list[str]]:
+        """
+        Returns a dictionary mapping the groups of a dimension or 'Measure' to their children.
+
+        Children are the child groups followed by the codes in the group, top level
+        groups and codes without a group are the children of None.
+        """
+
+        def build() -> dict[str | None, list[str]]:
+            children: dict[str | None, list[str]] = {}
+            for group, parent in self.get_group_parents(col).items():
+                children.setdefault(parent, []).append(group)
+            for code, group in self.get_code_groups(col).items():
+                children.setdefault(group, []).append(code)
+            return children
+
+        return self._cached(("children", col), build)
 
     def get_label_mappings(self) -> dict[str, dict[str, str]]:
         """Returns a dictionary of label mappings for all dimensions and measures"""
-        mappings = {"Measure": self.measurecode_mapping}
-        for dim in self.dimension_identifiers:
-            mappings[dim] = self.get_dimension_mapping(dim)
-        return mappings
+        return self._cached(
+            "labels",
+            lambda: {
+                col: self.get_code_mapping(col)
+                for col in ["Measure"] + self.dimension_identifiers
+            },
+        )
 
     def get_label_columns(self) -> list[str]:
         """Returns a list of label column names"""
@@ -79,35 +169,67 @@ class CbsMetadata:
         )
 
 
+def attach_metadata(table: pa.Table, meta: CbsMetadata) -> pa.Table:
+    """Return table with meta stored as JSON in its schema metadata."""
+    metadata = dict(table.schema.metadata or {})
+    metadata[META_KEY] = json.dumps(meta.meta_dict, ensure_ascii=False).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def get_table_metadata(table: pa.Table) -> CbsMetadata | None:
+    """Return the metadata stored in the schema metadata of table, if any."""
+    value = (table.schema.metadata or {}).get(META_KEY)
+    return None if value is None else CbsMetadata(json.loads(value))
+
+
+def get_metadata_parts(meta_data: list[dict[str, Any]]) -> list[str]:
+    """Return the names of the sub-resources making up the metadata of a dataset."""
+    codes = [
+        field["name"]
+        for field in meta_data
+        if field["name"].endswith("Codes") or field["name"].endswith("Groups")
+    ]
+    return ["Dimensions"] + codes + ["Properties"]
+
+
 def get_metadata(
-    id: pd.DataFrame | str,
+    id: pd.DataFrame | pa.Table | str,
     catalog: str = DEFAULT_CATALOG,
     base_url: str = BASE_URL,
+    max_workers: int = DEFAULT_MAX_WORKERS,
 ) -> CbsMetadata:
-    """Retrieve the metadata of a publication for the given dataset identifier."""
+    """
+    Retrieve the metadata of a publication for the given dataset identifier.
+
+    The Dimensions, code lists and Properties are fetched concurrently using at most
+    max_workers threads.
+    """
 
     if isinstance(id, pd.DataFrame):
         if "meta" in id.attrs:
             return id.attrs["meta"]
         raise ValueError("DataFrame does not have metadata attached")
 
+    if isinstance(id, pa.Table):
+        meta = get_table_metadata(id)
+        if meta is not None:
+            return meta
+        raise ValueError("Table does not have metadata attached")
+
     path = f"{base_url}/{catalog}/{id}"
     logger.info(f"Fetching metadata for dataset {id}.")
     meta_data = fetch_json(path)["value"]
 
-    codes = [
-        field["name"]
-        for field in meta_data
-        if field["name"].endswith("Codes") or field["name"].endswith("Groups")
-    ]
-    names_list = ["Dimensions"] + codes
+    names = get_metadata_parts(meta_data)
+
+    def fetch_part(name: str) -> Any:
+        if name == "Properties":
+            return fetch_json(f"{path}/Properties")
+        return fetch_json(f"{path}/{name}")["value"]
 
-    meta_dict = {}
-    for name in names_list:
-        meta_dict[name] = fetch_json(f"{path}/{name}")["value"]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names)))) as pool:
+        meta_dict = dict(zip(names, pool.map(fetch_part, names)))
 
-    properties_path = f"{path}/Properties"
-    meta_dict["Properties"] = fetch_json(properties_path)
     metadata = CbsMetadata(meta_dict)
 
     return metadata
@@ -1,17 +1,32 @@
 import logging
+import os
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal, get_args
 
-import pandas as pd
-import pyarrow.parquet as pq
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 
 from .config import BASE_URL, DEFAULT_CATALOG
 from .datasets import get_datasets
 from .downloader import download_dataset
-from .metadata import get_metadata
+from .local_store import (
+    ARROW_FILE,
+    OBSERVATIONS_DIR,
+    find_observations_dir,
+    get_observations_dir,
+    get_request_spec,
+)
+from .manifest import DownloadManifest, get_snapshot
+from .metadata import CbsMetadata, attach_metadata, get_metadata
+from .refresh import refresh_dataset
+from .schema import decode_dictionaries, encode_categories
+from .steps import Steps, call, run_steps
 
 logger = logging.getLogger(__name__)
 
+OutputFormat = Literal["pandas", "arrow", "polars"]
+
 
 def get_observations(
     id: str,
@@ -22,49 +37,342 @@ def get_observations(
     include_id: bool = True,
     base_url: str = BASE_URL,
     overwrite: bool = False,
+    workers: int | None = None,
+    categorical: bool = True,
+    refresh: bool = False,
+    output: OutputFormat = "pandas",
+    memory_map: bool = False,
     **filters: dict[str, Any],
-) -> pd.DataFrame:
+) -> Any:
     """
     Retrieve observations from a dataset in long format.
 
     Fetches data from the specified dataset, applies optional filters and column selection,
-    and returns it as a pandas DataFrame.
+    and returns it as a pandas DataFrame. With workers > 1 the download is split in
+    concurrently downloaded ranges.
+
+    With output 'arrow' the pyarrow Table is returned without converting it to pandas,
+    with the metadata in its schema metadata (see get_metadata). Output 'polars'
+    returns a polars DataFrame, which requires the optional polars dependency.
+
+    Measure and the dimension columns are returned as Categoricals ordered like the
+    codes in the metadata, unless categorical is False.
+
+    Downloads are stored per request (see get_observations_dir) in download_dir.
+    A request is answered from disk when its own download, or a complete download
+    of a wider request (more columns, fewer or wider filters), is available; data
+    on disk is only used when its download manifest marks it complete and an
+    interrupted download is resumed first. With refresh, data on disk is first
+    brought up to date with the catalogue, downloading only what changed (see
+    refresh_dataset).
+
+    With memory_map, the observations are read from an uncompressed Arrow IPC copy of
+    the download that is memory mapped, so processes reading the same table share its
+    buffers through the page cache (see read_observations).
     """
 
-    toc = get_datasets(catalog=catalog, base_url=base_url)
+    check_output(output)
+    meta, download_path, observations_dir = ensure_observations(
+        id=id,
+        catalog=catalog,
+        download_dir=download_dir,
+        query=query,
+        select=select,
+        base_url=base_url,
+        overwrite=overwrite,
+        workers=workers,
+        refresh=refresh,
+        **filters,
+    )
+
+    return read_observations(
+        download_path,
+        meta,
+        include_id=include_id,
+        categorical=categorical,
+        select=select,
+        filters=filters,
+        observations_dir=observations_dir,
+        output=output,
+        memory_map=memory_map,
+    )
+
+
+def ensure_observations(
+    id: str,
+    catalog: str = DEFAULT_CATALOG,
+    download_dir: str | Path | None = None,
+    query: str | None = None,
+    select: list[str] | None = None,
+    base_url: str = BASE_URL,
+    overwrite: bool = False,
+    workers: int | None = None,
+    refresh: bool = False,
+    **filters: Any,
+) -> tuple[CbsMetadata, Path, str]:
+    """
+    Make sure the observations of a request are on disk, as described in get_observations.
+
+    Returns the metadata, the download path and the name of the observations
+    directory in it to read the request from.
+    """
+    return run_steps(
+        ensure_observations_steps(
+            id=id,
+            catalog=catalog,
+            download_dir=download_dir,
+            query=query,
+            select=select,
+            base_url=base_url,
+            overwrite=overwrite,
+            workers=workers,
+            refresh=refresh,
+            **filters,
+        )
+    )
+
+
+def ensure_observations_steps(
+    id: str,
+    catalog: str = DEFAULT_CATALOG,
+    download_dir: str | Path | None = None,
+    query: str | None = None,
+    select: list[str] | None = None,
+    base_url: str = BASE_URL,
+    overwrite: bool = False,
+    workers: int | None = None,
+    refresh: bool = False,
+    **filters: Any,
+) -> Steps[tuple[CbsMetadata, Path, str]]:
+    """Steps of ensure_observations, shared with the asyncio API (see steps.py)."""
+    toc = yield call(get_datasets, catalog=catalog, base_url=base_url)
     if id not in toc["Identifier"].values:
         raise ValueError(f"Table '{id}' cannot be found in catalog '{catalog}'.")
+    dataset = toc[toc["Identifier"] == id].iloc[0]
 
     download_path = Path(download_dir or id)
-    if overwrite or not download_path.exists():
-        meta = download_dataset(
+    spec = get_request_spec(query=query, select=select, filters=filters)
+    observations_dir = get_observations_dir(spec)
+    resume = not overwrite and (
+        yield call(needs_resume, download_path / observations_dir)
+    )
+    stored_dir = None
+    if not overwrite and not resume:
+        stored_dir = yield call(
+            find_observations_dir, download_path, spec, exact=refresh
+        )
+
+    if stored_dir is None:
+        meta = yield call(
+            download_dataset,
             id=id,
             download_dir=download_path,
             catalog=catalog,
             query=query,
             select=select,
             base_url=base_url,
+            workers=workers,
+            resume=resume,
+            snapshot=get_snapshot(dataset),
+            **filters,
+        )
+    elif refresh:
+        meta = yield call(
+            refresh_dataset,
+            id=id,
+            dataset=dataset,
+            download_dir=download_path,
+            catalog=catalog,
+            query=query,
+            select=select,
+            base_url=base_url,
+            workers=workers,
             **filters,
         )
     else:
         logger.info(
-            f"Not redownloading files, instead reading from disk at location {download_path}."
+            f"Not redownloading files, instead reading from disk at location {download_path / stored_dir}."
         )
-        meta = get_metadata(id=id, catalog=catalog, base_url=base_url)
+        meta = yield call(get_metadata, id=id, catalog=catalog, base_url=base_url)
+
+    return meta, download_path, stored_dir or observations_dir
+
+
+def needs_resume(observations_path: Path) -> bool:
+    """Return True if observations_path holds an incomplete download."""
+    manifest = DownloadManifest.load(observations_path)
+    if manifest is None:
+        return False
+    if not manifest.complete:
+        logger.info(f"The download in {observations_path} is incomplete.")
+    return not manifest.complete
+
+
+def read_observations(
+    download_path: Path,
+    meta: CbsMetadata,
+    include_id: bool = True,
+    categorical: bool = True,
+    select: list[str] | None = None,
+    filters: dict[str, str | list[str]] | None = None,
+    observations_dir: str = OBSERVATIONS_DIR,
+    output: OutputFormat = "pandas",
+    memory_map: bool = False,
+) -> Any:
+    """
+    Read downloaded observations from download_path/observations_dir and attach the metadata.
+
+    Only the columns in select and the rows matching filters (column to code or list
+    of codes, as in get_observations) are read: both are pushed down into the Parquet
+    scan, so unneeded columns aren't decoded and row groups are skipped where the
+    statistics allow it.
 
-    observations_path = download_path / "Observations"
+    With memory_map, the observations are read from the uncompressed Arrow IPC file
+    ARROW_FILE in the directory instead, which is written from the Parquet files
+    first if it doesn't exist yet. The file is memory mapped, so selecting columns
+    doesn't copy any data and only filtering copies the matching rows.
+
+    With categorical, Measure and dimension columns become Categoricals backed by the
+    Arrow dictionaries, with categories in metadata order. Otherwise they are strings.
+    The observations are returned in the format output (see convert_table).
+    """
+    observations_path = download_path / observations_dir
 
     if not observations_path.exists():
         raise FileNotFoundError(
             f"Observations directory not found at {observations_path}."
         )
 
-    logger.info(f"Reading parquet files at {observations_path}.")
-    obs = pq.read_table(str(observations_path)).to_pandas()
+    if memory_map:
+        table = read_arrow_store(observations_path, meta)
+        expression = get_read_filter(table.schema, filters)
+        if expression is not None:
+            table = table.filter(expression)
+        table = table.select(get_read_columns(table.schema, select, include_id))
+    else:
+        logger.info(f"Reading parquet files at {observations_path}.")
+        dataset = ds.dataset(str(observations_path), format="parquet")
+        table = dataset.to_table(
+            columns=get_read_columns(dataset.schema, select, include_id),
+            filter=get_read_filter(dataset.schema, filters),
+        )
+    if categorical:
+        table = encode_code_columns(table, meta)
+    else:
+        table = decode_dictionaries(table)
+    return convert_table(table, meta, output)
+
+
+def read_arrow_store(observations_path: Path, meta: CbsMetadata) -> pa.Table:
+    """Memory map the Arrow IPC copy of the observations in observations_path, writing it if needed."""
+    arrow_path = observations_path / ARROW_FILE
+    if not arrow_path.exists():
+        write_arrow_store(observations_path, meta)
+    logger.info(f"Memory mapping {arrow_path}.")
+    with pa.memory_map(str(arrow_path)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def write_arrow_store(observations_path: Path, meta: CbsMetadata) -> Path:
+    """
+    Write the Parquet files in observations_path to one uncompressed Arrow IPC file.
+
+    The code columns are encoded with the metadata order dictionaries of
+    encode_code_columns, so reading them categorical doesn't remap them. The file is
+    replaced atomically, concurrent readers see either no file or a complete one.
+    """
+    arrow_path = observations_path / ARROW_FILE
+    logger.info(f"Writing the observations in {observations_path} to {arrow_path}.")
+    table = ds.dataset(str(observations_path), format="parquet").to_table()
+    table = encode_code_columns(table, meta)
+    tmp_path = arrow_path.with_name(f".{arrow_path.name}.{os.getpid()}.tmp")
+    with (
+        pa.OSFile(str(tmp_path), "wb") as sink,
+        pa.ipc.new_file(sink, table.schema) as writer,
+    ):
+        writer.write_table(table)
+    os.replace(tmp_path, arrow_path)
+    return arrow_path
+
+
+def check_output(output: str) -> None:
+    """Raise a ValueError if output is not a supported output format."""
+    if output not in get_args(OutputFormat):
+        raise ValueError(
+            f"Unknown output '{output}', use one of {get_args(OutputFormat)}."
+        )
+
+
+def convert_table(
+    table: pa.Table, meta: CbsMetadata, output: OutputFormat = "pandas"
+) -> Any:
+    """
+    Convert table to a pandas DataFrame, pyarrow Table or polars DataFrame with meta attached.
+
+    pandas DataFrames carry meta in attrs['meta'], Arrow tables in their schema metadata.
+    polars DataFrames can't carry it.
+    """
+    check_output(output)
+    if output == "pandas":
+        obs = table.to_pandas()
+        obs.attrs["meta"] = meta
+        return obs
+    table = attach_metadata(table, meta)
+    if output == "arrow":
+        return table
+    return to_polars(table)
+
+
+def to_polars(table: pa.Table) -> Any:
+    """Convert table to a polars DataFrame, polars is an optional dependency."""
+    try:
+        import polars as pl
+    except ImportError as e:
+        raise ImportError(
+            "output='polars' requires polars, install it with 'pip install cbsodata4[polars]'."
+        ) from e
+    return pl.from_arrow(table)
+
 
-    if not include_id and "Id" in obs.columns:
-        obs = obs.drop(columns=["Id"])
+def get_read_columns(
+    schema: pa.Schema, select: list[str] | None = None, include_id: bool = True
+) -> list[str]:
+    """Return the columns of schema to read, restricted to select if given."""
+    return [
+        name
+        for name in schema.names
+        if (select is None or name in select) and (include_id or name != "Id")
+    ]
+
+
+def get_read_filter(
+    schema: pa.Schema, filters: dict[str, str | list[str]] | None = None
+) -> pc.Expression | None:
+    """
+    Return the dataset filter expression selecting the codes in filters.
+
+    Filters on columns that were not downloaded are skipped, they were already applied
+    by the API when downloading.
+    """
+    expression = None
+    for column, values in (filters or {}).items():
+        if column not in schema.names:
+            logger.debug(f"Column '{column}' is not stored, not filtering on it.")
+            continue
+        values = [values] if isinstance(values, str) else list(values)
+        condition = pc.field(column).isin(values)
+        expression = condition if expression is None else expression & condition
+    return expression
 
-    obs.attrs["meta"] = meta
 
-    return obs
+def encode_code_columns(table: pa.Table, meta: CbsMetadata) -> pa.Table:
+    """Dictionary encode Measure and the dimension columns of table in metadata order."""
+    for col in ["Measure"] + list(meta.dimension_identifiers):
+        if col in table.column_names:
+            column = encode_categories(
+                table.column(col), list(meta.get_code_identifiers(col))
+            )
+            table = table.set_column(
+                table.column_names.index(col), pa.field(col, column.type), column
+            )
+    return table
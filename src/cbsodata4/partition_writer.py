@@ -0,0 +1,236 @@
+import logging
+from collections.abc import Callable
+from pathlib import Path
+from typing import Literal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .schema import conform_table, extend_schema
+
+logger = logging.getLogger(__name__)
+
+WriteMode = Literal["pages", "row_groups"]
+
+# Called with the path of a file once it is completely written and the link of the
+# page following the data in it, None if the stream ended.
+CommitCallback = Callable[[Path, str | None], None]
+
+
+def get_file_name(prefix: str, number: int) -> str:
+    """
+    Return the name of file number of a stream, {prefix}_{number}.parquet.
+
+    The number is zero padded, so the files sort by name in the order they were
+    written, which is the order in which pyarrow datasets read them.
+    """
+    return f"{prefix}_{number:06d}.parquet"
+
+
+class PageWriter:
+    """
+    Write every page of observations to its own Parquet file, see get_file_name.
+
+    When a schema is given all pages are cast to it, extended with the columns of the
+    first page that are not described by it, so all files share one schema. Page
+    numbers start at start, and on_commit is called after every written page.
+    """
+
+    def __init__(
+        self,
+        output_path: str | Path,
+        prefix: str = "partition",
+        schema: pa.Schema | None = None,
+        row_group_size: int | None = None,
+        compression: str = "snappy",
+        start: int = 0,
+        on_commit: CommitCallback | None = None,
+    ):
+        self.output_path = Path(output_path)
+        self.prefix = prefix
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.pages = start
+        self.on_commit = on_commit
+        self._schema_fixed = False
+
+    def write(self, table: pa.Table, next_link: str | None = None) -> Path:
+        """Write table as the next page file."""
+        file_path = self.output_path / get_file_name(self.prefix, self.pages)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.schema is not None:
+            if not self._schema_fixed:
+                self.schema = extend_schema(self.schema, table)
+                self._schema_fixed = True
+            table = conform_table(table, self.schema)
+        pq.write_table(
+            table,
+            str(file_path),
+            row_group_size=self.row_group_size,
+            compression=self.compression,
+        )
+        self.pages += 1
+        if self.on_commit is not None:
+            self.on_commit(file_path, next_link)
+        return file_path
+
+    def close(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        pass
+
+
+class RowGroupWriter:
+    """
+    Append pages of observations as row groups to files named by get_file_name.
+
+    All pages are cast to schema, extended with columns of the first page that are
+    not described by it. Pages are buffered until row_group_size rows are available,
+    by default every page becomes one row group. When max_file_rows is set, the file
+    is closed at the first page boundary where it holds at least that many rows, so
+    every file contains whole pages. File numbers start at start, and on_commit is
+    called for every closed file.
+    """
+
+    def __init__(
+        self,
+        output_path: str | Path,
+        schema: pa.Schema,
+        prefix: str = "partition",
+        row_group_size: int | None = None,
+        compression: str = "snappy",
+        max_file_rows: int | None = None,
+        start: int = 0,
+        on_commit: CommitCallback | None = None,
+    ):
+        self.output_path = Path(output_path)
+        self.schema = schema
+        self.prefix = prefix
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.max_file_rows = max_file_rows
+        self.start = start
+        self.on_commit = on_commit
+        self.files: list[Path] = []
+        self._writer: pq.ParquetWriter | None = None
+        self._file_rows = 0
+        self._buffer: list[pa.Table] = []
+        self._buffered = 0
+        self._schema_fixed = False
+
+    def write(self, table: pa.Table, next_link: str | None = None) -> None:
+        """Buffer table and write all complete row groups."""
+        if not self._schema_fixed:
+            self.schema = extend_schema(self.schema, table)
+            self._schema_fixed = True
+        table = conform_table(table, self.schema)
+        if table.num_rows == 0:
+            return
+        self._buffer.append(table)
+        self._buffered += table.num_rows
+        if self.row_group_size is None or self._buffered >= self.row_group_size:
+            self._flush(final=False)
+        if (
+            self.max_file_rows is not None
+            and self._file_rows + self._buffered >= self.max_file_rows
+        ):
+            self._flush(final=True)
+            self._close_file(next_link)
+
+    def close(self) -> None:
+        """Write the remaining buffered rows and close the current file."""
+        self._flush(final=True)
+        if self._writer is None and not self.files:
+            self._open_file()
+        self._close_file(None)
+
+    def abort(self) -> None:
+        """
+        Close the current file without committing it, after the stream failed.
+
+        Buffered rows are dropped; the partial file isn't passed to on_commit, so a
+        resumed download removes it and fetches its pages again.
+        """
+        self._buffer = []
+        self._buffered = 0
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _close_file(self, next_link: str | None) -> None:
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        if self.on_commit is not None:
+            self.on_commit(self.files[-1], next_link)
+
+    def _flush(self, final: bool) -> None:
+        if not self._buffer:
+            return
+        data = pa.concat_tables(self._buffer)
+        size = self.row_group_size or data.num_rows
+        offset = 0
+        while data.num_rows - offset >= size or (final and offset < data.num_rows):
+            self._write_row_group(data.slice(offset, size))
+            offset += size
+        rest = data.slice(offset)
+        self._buffer = [rest] if rest.num_rows else []
+        self._buffered = rest.num_rows
+
+    def _write_row_group(self, table: pa.Table) -> None:
+        if self._writer is None:
+            self._open_file()
+        self._writer.write_table(table, row_group_size=table.num_rows)
+        self._file_rows += table.num_rows
+
+    def _open_file(self) -> None:
+        number = self.start + len(self.files)
+        file_path = self.output_path / get_file_name(self.prefix, number)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        logger.debug(f"Writing row groups to {file_path}.")
+        self._writer = pq.ParquetWriter(
+            str(file_path), self.schema, compression=self.compression
+        )
+        self._file_rows = 0
+        self.files.append(file_path)
+
+
+def create_writer(
+    output_path: str | Path,
+    prefix: str = "partition",
+    write_mode: WriteMode = "pages",
+    schema: pa.Schema | None = None,
+    row_group_size: int | None = None,
+    compression: str = "snappy",
+    max_file_rows: int | None = None,
+    start: int = 0,
+    on_commit: CommitCallback | None = None,
+) -> PageWriter | RowGroupWriter:
+    """Create the writer for write_mode 'pages' (a file per page) or 'row_groups'."""
+    if write_mode == "pages":
+        return PageWriter(
+            output_path,
+            prefix=prefix,
+            schema=schema,
+            row_group_size=row_group_size,
+            compression=compression,
+            start=start,
+            on_commit=on_commit,
+        )
+    if write_mode == "row_groups":
+        if schema is None:
+            raise ValueError("write_mode 'row_groups' requires a schema.")
+        return RowGroupWriter(
+            output_path,
+            schema=schema,
+            prefix=prefix,
+            row_group_size=row_group_size,
+            compression=compression,
+            max_file_rows=max_file_rows,
+            start=start,
+            on_commit=on_commit,
+        )
+    raise ValueError(f"Unknown write_mode '{write_mode}'.")
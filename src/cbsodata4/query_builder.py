@@ -47,6 +47,24 @@ def build_odata_query(
     return ""
 
 
+def get_select_fields(query: str | None) -> list[str] | None:
+    """Return the fields of the $select option of a raw query string, if any."""
+    if not query:
+        return None
+    for part in query.split("&"):
+        if part.startswith("$select="):
+            return [field.strip() for field in part[len("$select=") :].split(",")]
+    return None
+
+
+def add_query_options(url: str, **options: str | int) -> str:
+    """Append OData system query options (e.g. skip=10 becomes $skip=10) to a URL."""
+    if not options:
+        return url
+    params = "&".join(f"${key}={value}" for key, value in options.items())
+    return f"{url}{'&' if '?' in url else '?'}{params}"
+
+
 def construct_filter(**column_filters: str | list[str]) -> str | None:
     """Construct the OData filter string based on column filters."""
     filter_clauses = []
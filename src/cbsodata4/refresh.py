@@ -0,0 +1,266 @@
+import logging
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from .config import BASE_URL, DEFAULT_CATALOG
+from .downloader import (
+    build_observations_url,
+    download_dataset,
+    get_empty_dataframe,
+    get_write_options,
+    save_metadata,
+    update_observations,
+)
+from .httpx_client import get_cache
+from .local_store import get_observations_dir, get_request_spec
+from .manifest import DownloadManifest, get_period_status, get_snapshot
+from .metadata import CbsMetadata, get_metadata
+from .steps import Steps, call, run_steps
+
+logger = logging.getLogger(__name__)
+
+# Status of a period whose figures are no longer revised.
+FINAL_STATUS = "Definitief"
+
+
+def refresh_dataset(
+    id: str,
+    dataset: pd.Series | dict[str, Any],
+    download_dir: str | Path | None = None,
+    catalog: str = DEFAULT_CATALOG,
+    query: str | None = None,
+    select: list[str] | None = None,
+    base_url: str = BASE_URL,
+    workers: int | None = None,
+    **filters: Any,
+) -> CbsMetadata:
+    """
+    Bring a complete download of a dataset up to date with the catalogue.
+
+    dataset is the row of the dataset in get_datasets, its Modified and
+    ObservationsModified timestamps are compared with those stored at download time:
+
+    - unchanged: nothing is downloaded.
+    - only Modified changed: only the metadata is downloaded again.
+    - ObservationsModified changed and the table is append-only along its time
+      dimension (no period was removed): only the observations of new periods and of
+      periods whose Status changed or is not final are downloaded again.
+    - otherwise the observations are downloaded again completely.
+    """
+    return run_steps(
+        refresh_dataset_steps(
+            id=id,
+            dataset=dataset,
+            download_dir=download_dir,
+            catalog=catalog,
+            query=query,
+            select=select,
+            base_url=base_url,
+            workers=workers,
+            **filters,
+        )
+    )
+
+
+def refresh_dataset_steps(
+    id: str,
+    dataset: pd.Series | dict[str, Any],
+    download_dir: str | Path | None = None,
+    catalog: str = DEFAULT_CATALOG,
+    query: str | None = None,
+    select: list[str] | None = None,
+    base_url: str = BASE_URL,
+    workers: int | None = None,
+    **filters: Any,
+) -> Steps[CbsMetadata]:
+    """Steps of refresh_dataset, shared with the asyncio API (see steps.py)."""
+    download_path = Path(download_dir or id)
+    spec = get_request_spec(query=query, select=select, filters=filters)
+    observations_path = download_path / get_observations_dir(spec)
+    manifest = yield call(DownloadManifest.load, observations_path)
+    snapshot = get_snapshot(dataset)
+    download_options = dict(
+        id=id,
+        download_dir=download_path,
+        catalog=catalog,
+        query=query,
+        select=select,
+        base_url=base_url,
+        workers=workers,
+        snapshot=snapshot,
+        **filters,
+    )
+
+    if needs_download(manifest):
+        logger.info(f"Cannot tell whether {download_path} is up to date, downloading.")
+        yield call(invalidate_dataset, id, catalog=catalog, base_url=base_url)
+        return (yield call(download_dataset, resume=False, **download_options))
+
+    if is_unchanged(manifest, snapshot):
+        logger.info(f"Dataset {id} is unchanged, reading from disk.")
+        return (yield call(get_metadata, id=id, catalog=catalog, base_url=base_url))
+
+    yield call(invalidate_dataset, id, catalog=catalog, base_url=base_url)
+    meta = yield call(get_metadata, id=id, catalog=catalog, base_url=base_url)
+
+    if not is_modified(manifest.snapshot, snapshot, "ObservationsModified"):
+        logger.info(f"Only the metadata of dataset {id} changed, updating it.")
+        yield call(update_metadata, manifest, meta, download_path, snapshot)
+        return meta
+
+    update = plan_update(
+        manifest,
+        meta,
+        snapshot,
+        id=id,
+        catalog=catalog,
+        query=query,
+        select=select,
+        base_url=base_url,
+        **filters,
+    )
+    if update is None:
+        logger.info(f"The observations of dataset {id} changed, downloading them.")
+        return (yield call(download_dataset, resume=False, **download_options))
+
+    logger.info(
+        f"Downloading {len(update['periods'])} changed periods of dataset {id}."
+    )
+    yield call(start_update, manifest, meta, download_path, update)
+    yield call(
+        update_observations,
+        manifest,
+        observations_path,
+        get_empty_dataframe(meta),
+        **get_write_options(meta, select=select),
+    )
+    return meta
+
+
+def needs_download(manifest: DownloadManifest | None) -> bool:
+    """Return True if a stored download can't be compared with the catalogue."""
+    return manifest is None or not manifest.complete or manifest.snapshot is None
+
+
+def is_unchanged(manifest: DownloadManifest, snapshot: dict[str, str | None]) -> bool:
+    """Return True if neither the metadata nor the observations changed since manifest."""
+    return not (
+        is_modified(manifest.snapshot, snapshot, "Modified")
+        or is_modified(manifest.snapshot, snapshot, "ObservationsModified")
+    )
+
+
+def update_metadata(
+    manifest: DownloadManifest,
+    meta: CbsMetadata,
+    download_path: Path,
+    snapshot: dict[str, str | None],
+) -> None:
+    """Store changed metadata of a download whose observations didn't change."""
+    save_metadata(meta, download_path)
+    manifest.snapshot = snapshot
+    manifest.periods = get_period_status(meta)
+    manifest.save()
+
+
+def plan_update(
+    manifest: DownloadManifest,
+    meta: CbsMetadata,
+    snapshot: dict[str, str | None],
+    id: str,
+    catalog: str = DEFAULT_CATALOG,
+    query: str | None = None,
+    select: list[str] | None = None,
+    base_url: str = BASE_URL,
+    **filters: Any,
+) -> dict[str, Any] | None:
+    """
+    Return the update downloading only the changed periods of meta, for manifest.update.
+
+    Returns None if the observations must be downloaded again completely, because the
+    table isn't append-only or the request can't be restricted to the changed periods.
+    """
+    url = build_observations_url(
+        id=id, catalog=catalog, query=query, select=select, base_url=base_url, **filters
+    )
+    periods = get_changed_periods(manifest.periods or {}, meta)
+    dimension = next(iter(meta.time_dimension_identifiers), None)
+    if (
+        not periods
+        or query
+        or url != manifest.url
+        or dimension in filters
+        or (select and dimension not in select)
+    ):
+        return None
+
+    update_count = sum(name.startswith("update_") for name in manifest.streams)
+    return {
+        "url": build_observations_url(
+            id=id,
+            catalog=catalog,
+            select=select,
+            base_url=base_url,
+            **filters,
+            **{dimension: periods},
+        ),
+        "prefix": f"update_{update_count:04d}",
+        "dimension": dimension,
+        "periods": periods,
+        "snapshot": snapshot,
+        "period_status": get_period_status(meta),
+    }
+
+
+def start_update(
+    manifest: DownloadManifest,
+    meta: CbsMetadata,
+    download_path: Path,
+    update: dict[str, Any],
+) -> None:
+    """Store the metadata and record update as pending in manifest."""
+    save_metadata(meta, download_path)
+    manifest.update = update
+    manifest.complete = False
+    manifest.save()
+
+
+def invalidate_dataset(
+    id: str, catalog: str = DEFAULT_CATALOG, base_url: str = BASE_URL
+) -> None:
+    """Drop the cached responses of dataset id, if responses are cached at all."""
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate(f"{base_url}/{catalog}/{id}")
+
+
+def is_modified(
+    stored: dict[str, str | None], current: dict[str, str | None], key: str
+) -> bool:
+    """Return True if timestamp key differs between two snapshots, or is unknown."""
+    if stored.get(key) is None or current.get(key) is None:
+        return True
+    return pd.Timestamp(stored[key]) != pd.Timestamp(current[key])
+
+
+def get_changed_periods(
+    stored: dict[str, str | None], meta: CbsMetadata
+) -> list[str] | None:
+    """
+    Return the periods of meta that must be downloaded again after stored.
+
+    These are the new periods and the periods whose Status changed or is not final.
+    Returns None if the table is not append-only, i.e. a stored period was removed.
+    """
+    current = get_period_status(meta)
+    if not current or not stored.keys() <= current.keys():
+        return None
+    return [
+        code
+        for code, status in current.items()
+        if code not in stored
+        or status != stored[code]
+        or (status is not None and status != FINAL_STATUS)
+    ]
@@ -0,0 +1,387 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .config import DEFAULT_CACHE_MAX_BYTES, DEFAULT_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# Ordered (regex, ttl) rules; the first pattern found in a URL decides its ttl in seconds.
+# A ttl of None means responses are never cached, math.inf means they never expire.
+DEFAULT_TTLS: tuple[tuple[str, float | None], ...] = (
+    (r"/Observations", None),
+    (r"/Datasets(\?|$)", 60 * 60.0),
+    (r"/api/search", 60 * 60.0),
+)
+
+
+@dataclass
+class CacheStats:
+    """Counters describing the effectiveness of a response cache."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    revalidations: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+
+@dataclass
+class CacheEntry:
+    """A cached response body together with its size, expiry time and validators."""
+
+    value: Any
+    nbytes: int
+    expires_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def has_validators(self) -> bool:
+        """Return True if the entry can be revalidated with a conditional request."""
+        return self.etag is not None or self.last_modified is not None
+
+    def is_fresh(self, now: float | None = None) -> bool:
+        """Return True if the entry has not expired yet."""
+        return (time.time() if now is None else now) < self.expires_at
+
+
+class ResponseCache(ABC):
+    """
+    Base class for response caches used by fetch_json.
+
+    Subclasses implement get, set, refresh, invalidate and stats; the ttl rules that decide
+    which URLs are cached and for how long are shared.
+    """
+
+    def __init__(
+        self,
+        ttls: Sequence[tuple[str, float | None]] = DEFAULT_TTLS,
+        default_ttl: float | None = DEFAULT_CACHE_TTL,
+    ):
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.default_ttl = default_ttl
+
+    def ttl_for(self, url: str) -> float | None:
+        """Return the time to live for responses of url, None if it must not be cached."""
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    @abstractmethod
+    def get(self, url: str) -> CacheEntry | None:
+        """
+        Return the cache entry for url, or None.
+
+        Expired entries are only returned when they carry validators, so the caller
+        can revalidate them with a conditional request.
+        """
+
+    @abstractmethod
+    def set(
+        self,
+        url: str,
+        value: Any,
+        content: bytes,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        """Store the parsed response value of url along with its raw body and validators."""
+
+    @abstractmethod
+    def refresh(self, url: str) -> CacheEntry | None:
+        """Renew the expiry time of the entry for url after a successful revalidation."""
+
+    @abstractmethod
+    def invalidate(self, prefix: str | None = None) -> int:
+        """Remove all entries whose URL starts with prefix (all if None), return the count."""
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self.invalidate()
+
+    @property
+    @abstractmethod
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the hit, miss and size counters of the cache."""
+
+
+class LRUResponseCache(ResponseCache):
+    """In-memory response cache bounded by the total size in bytes of the cached bodies."""
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        ttls: Sequence[tuple[str, float | None]] = DEFAULT_TTLS,
+        default_ttl: float | None = DEFAULT_CACHE_TTL,
+    ):
+        super().__init__(ttls=ttls, default_ttl=default_ttl)
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._size = 0
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            if not entry.is_fresh():
+                self._stats.misses += 1
+                if not entry.has_validators:
+                    self._remove(url)
+                    return None
+            else:
+                self._stats.hits += 1
+            self._entries.move_to_end(url)
+            return entry
+
+    def set(
+        self,
+        url: str,
+        value: Any,
+        content: bytes,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        ttl = self.ttl_for(url)
+        nbytes = len(content)
+        if ttl is None or nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if url in self._entries:
+                self._remove(url)
+            self._entries[url] = CacheEntry(
+                value, nbytes, time.time() + ttl, etag, last_modified
+            )
+            self._size += nbytes
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                logger.debug(f"Evicting {oldest} from response cache.")
+                self._remove(oldest)
+                self._stats.evictions += 1
+
+    def refresh(self, url: str) -> CacheEntry | None:
+        ttl = self.ttl_for(url)
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or ttl is None:
+                return None
+            entry.expires_at = time.time() + ttl
+            self._stats.revalidations += 1
+            return entry
+
+    def invalidate(self, prefix: str | None = None) -> int:
+        with self._lock:
+            urls = [
+                url for url in self._entries if prefix is None or url.startswith(prefix)
+            ]
+            for url in urls:
+                self._remove(url)
+            return len(urls)
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                revalidations=self._stats.revalidations,
+                entries=len(self._entries),
+                size_bytes=self._size,
+            )
+
+    def _remove(self, url: str) -> None:
+        entry = self._entries.pop(url)
+        self._size -= entry.nbytes
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    Persistent response cache stored in an SQLite database in directory.
+
+    Bodies are stored with their ETag and Last-Modified validators, so expired
+    entries can be revalidated with a conditional request. The database uses
+    write-ahead logging, which makes it safe to share one directory between
+    several processes on the same host. When max_bytes is set, the least
+    recently used entries are evicted once the stored bodies exceed it.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_bytes: int | None = None,
+        ttls: Sequence[tuple[str, float | None]] = DEFAULT_TTLS,
+        default_ttl: float | None = DEFAULT_CACHE_TTL,
+    ):
+        super().__init__(ttls=ttls, default_ttl=default_ttl)
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / "responses.sqlite"
+        self.max_bytes = max_bytes
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    nbytes INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT
+                )
+                """
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the calling thread, sqlite3 connections can't be shared."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            setattr(self._stats, stat, getattr(self._stats, stat) + 1)
+
+    def _read(self, conn: sqlite3.Connection, url: str) -> CacheEntry | None:
+        """Return the stored entry for url without counting the lookup, or None."""
+        row = conn.execute(
+            "SELECT body, nbytes, expires_at, etag, last_modified FROM responses WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        body, nbytes, expires_at, etag, last_modified = row
+        return CacheEntry(json.loads(body), nbytes, expires_at, etag, last_modified)
+
+    def get(self, url: str) -> CacheEntry | None:
+        conn = self._connection()
+        entry = self._read(conn, url)
+        if entry is None:
+            self._count("misses")
+            return None
+        if entry.is_fresh():
+            self._count("hits")
+        else:
+            self._count("misses")
+            if not entry.has_validators:
+                conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                return None
+        conn.execute(
+            "UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url)
+        )
+        return entry
+
+    def set(
+        self,
+        url: str,
+        value: Any,
+        content: bytes,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        ttl = self.ttl_for(url)
+        nbytes = len(content)
+        if ttl is None or (self.max_bytes is not None and nbytes > self.max_bytes):
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, bytes(content), nbytes, now + ttl, now, etag, last_modified),
+        )
+        if self.max_bytes is not None:
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (size,) = conn.execute(
+                "SELECT COALESCE(SUM(nbytes), 0) FROM responses"
+            ).fetchone()
+            rows = conn.execute(
+                "SELECT url, nbytes FROM responses ORDER BY accessed_at"
+            ).fetchall()
+            for url, nbytes in rows:
+                if size <= self.max_bytes:
+                    break
+                logger.debug(f"Evicting {url} from response cache.")
+                conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                size -= nbytes
+                self._count("evictions")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def refresh(self, url: str) -> CacheEntry | None:
+        ttl = self.ttl_for(url)
+        if ttl is None:
+            return None
+        now = time.time()
+        conn = self._connection()
+        cursor = conn.execute(
+            "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE url = ?",
+            (now + ttl, now, url),
+        )
+        if cursor.rowcount == 0:
+            return None
+        self._count("revalidations")
+        return self._read(conn, url)
+
+    def invalidate(self, prefix: str | None = None) -> int:
+        conn = self._connection()
+        if prefix is None:
+            cursor = conn.execute("DELETE FROM responses")
+        else:
+            cursor = conn.execute(
+                "DELETE FROM responses WHERE substr(url, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+        return cursor.rowcount
+
+    @property
+    def stats(self) -> CacheStats:
+        entries, size = (
+            self._connection()
+            .execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM responses")
+            .fetchone()
+        )
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                revalidations=self._stats.revalidations,
+                entries=entries,
+                size_bytes=size,
+            )
+
+    def close(self) -> None:
+        """Close the connection of the calling thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
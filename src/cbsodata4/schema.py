@@ -0,0 +1,110 @@
+import logging
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .metadata import CbsMetadata
+
+logger = logging.getLogger(__name__)
+
+CODE_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+
+def get_observations_schema(
+    meta: CbsMetadata, select: list[str] | None = None
+) -> pa.Schema:
+    """
+    Return the Arrow schema of the observations of a dataset, restricted to select if given.
+
+    Id is int64 and Value float64, Measure, ValueAttribute and the dimension columns
+    are dictionary encoded strings.
+    """
+    fields = [
+        pa.field("Id", pa.int64()),
+        pa.field("Measure", CODE_TYPE),
+        pa.field("ValueAttribute", CODE_TYPE),
+        pa.field("Value", pa.float64()),
+    ] + [pa.field(dim, CODE_TYPE) for dim in meta.dimension_identifiers]
+    if select:
+        fields = [field for field in fields if field.name in select]
+    return pa.schema(fields)
+
+
+def get_parse_schema(schema: pa.Schema) -> pa.Schema:
+    """Return the explicit schema for parsing an Observations response page into schema."""
+    fields = [
+        pa.field(field.name, decoded_type(field.type), nullable=field.nullable)
+        for field in schema
+    ]
+    return pa.schema([pa.field("value", pa.list_(pa.struct(fields)))])
+
+
+def decoded_type(type_: pa.DataType) -> pa.DataType:
+    """Return the value type of a dictionary type, other types are returned as is."""
+    return type_.value_type if pa.types.is_dictionary(type_) else type_
+
+
+def decode_dictionaries(table: pa.Table) -> pa.Table:
+    """Cast the dictionary encoded columns of table to plain columns."""
+    schema = pa.schema(
+        [field.with_type(decoded_type(field.type)) for field in table.schema],
+        metadata=table.schema.metadata,
+    )
+    return table.cast(schema)
+
+
+def encode_categories(
+    column: pa.ChunkedArray, categories: list[str]
+) -> pa.ChunkedArray:
+    """
+    Dictionary encode column with categories as dictionary, in that order.
+
+    Values that are not in categories are appended to the dictionary in sorted order.
+    Only the dictionaries of already encoded chunks are remapped, the rows are not
+    decoded, and chunks that already have the dictionary are kept as they are.
+    """
+    chunks = [
+        chunk if pa.types.is_dictionary(chunk.type) else chunk.dictionary_encode()
+        for chunk in column.chunks
+    ]
+    known = set(categories)
+    extra = set()
+    for chunk in chunks:
+        extra.update(v for v in chunk.dictionary.to_pylist() if v not in known)
+    dictionary = pa.array(categories + sorted(extra - {None}), pa.string())
+
+    encoded = []
+    for chunk in chunks:
+        if chunk.type == CODE_TYPE and chunk.dictionary.equals(dictionary):
+            encoded.append(chunk)
+            continue
+        mapping = pc.index_in(chunk.dictionary, value_set=dictionary).cast(pa.int32())
+        indices = mapping.take(chunk.indices)
+        encoded.append(pa.DictionaryArray.from_arrays(indices, dictionary))
+    return pa.chunked_array(encoded, type=CODE_TYPE)
+
+
+def extend_schema(schema: pa.Schema, table: pa.Table) -> pa.Schema:
+    """Return schema with the columns of table that it doesn't describe yet appended."""
+    for field in table.schema:
+        if schema.get_field_index(field.name) == -1:
+            logger.debug(f"Column '{field.name}' is not described by the metadata.")
+            schema = schema.append(field)
+    return schema
+
+
+def conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Cast table to schema: columns are reordered and cast, missing columns are added
+    as nulls and columns not in schema are dropped.
+    """
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            columns.append(table.column(field.name).cast(field.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, field.type))
+    dropped = set(table.column_names) - set(schema.names)
+    if dropped:
+        logger.warning(f"Dropping columns not in the observations schema: {dropped}")
+    return pa.Table.from_arrays(columns, schema=schema)
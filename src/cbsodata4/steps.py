@@ -0,0 +1,76 @@
+"""
+Orchestration shared by the synchronous and the asyncio API.
+
+Functions deciding what to download are written as generators ("steps") that yield a
+Call for every request or disk operation and are sent back its result. run_steps
+performs the calls directly; run_steps_async awaits the asyncio counterpart of a call
+or runs it in a worker thread. The decisions are thus written once and only the I/O
+differs between the two APIs.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Generator, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+AsyncCalls = Mapping[Callable[..., Any], Callable[..., Awaitable[Any]]]
+
+
+@dataclass(frozen=True)
+class Call:
+    """A call of func with args and kwargs, yielded by steps to have it performed."""
+
+    func: Callable[..., Any]
+    args: tuple[Any, ...] = ()
+    kwargs: dict[str, Any] = field(default_factory=dict)
+
+    def __call__(self) -> Any:
+        return self.func(*self.args, **self.kwargs)
+
+
+type Steps[T] = Generator[Call, Any, T]
+
+
+def call(func: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Call:
+    """Return the Call of func with args and kwargs."""
+    return Call(func, args, kwargs)
+
+
+def run_steps[T](steps: Steps[T]) -> T:
+    """Run steps, performing every call in the current thread, and return its result."""
+    send: Callable[[Any], Call] = steps.send
+    value: Any = None
+    while True:
+        try:
+            step = send(value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            value, send = step(), steps.send
+        except Exception as e:
+            value, send = e, steps.throw
+
+
+async def run_steps_async[T](steps: Steps[T], async_calls: AsyncCalls) -> T:
+    """
+    Run steps in the event loop and return its result.
+
+    Calls of a function in async_calls are replaced by awaiting its asyncio
+    counterpart, all other calls run in a worker thread.
+    """
+    send: Callable[[Any], Call] = steps.send
+    value: Any = None
+    while True:
+        try:
+            step = send(value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            async_func = async_calls.get(step.func)
+            if async_func is None:
+                value = await asyncio.to_thread(step)
+            else:
+                value = await async_func(*step.args, **step.kwargs)
+            send = steps.send
+        except Exception as e:
+            value, send = e, steps.throw
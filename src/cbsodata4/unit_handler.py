@@ -12,10 +12,7 @@ def add_unit_column(data: pd.DataFrame) -> pd.DataFrame:
     if "Measure" not in data.columns:
         raise ValueError("Data does not contain 'Measure' column.")
 
-    measure_map = {
-        m["Identifier"]: m["Unit"] for m in meta.meta_dict.get("MeasureCodes", [])
-    }
-    result = data.assign(Unit=data["Measure"].map(measure_map))
+    result = data.assign(Unit=data["Measure"].map(meta.measure_units))
 
     if "Value" in result.columns:
         cols = list(result.columns)
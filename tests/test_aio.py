@@ -0,0 +1,185 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import httpx
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cbsodata4 import aio
+from cbsodata4.httpx_client import (
+    AsyncCbsClient,
+    async_fetch_json,
+    get_async_client,
+    use_async_client,
+)
+from cbsodata4.manifest import open_manifest
+from cbsodata4.metadata import CbsMetadata, attach_metadata
+
+RESPONSES = {
+    "/Datasets": {"value": [{"Identifier": "test_id", "Catalog": "CBS"}]},
+    "/test_id": {"value": [{"name": "Dimensions"}, {"name": "MeasureCodes"}]},
+    "/Dimensions": {"value": [{"Identifier": "Dim1", "Kind": "Dimension"}]},
+    "/MeasureCodes": {
+        "value": [
+            {"Identifier": "M1", "Title": "Measure 1"},
+            {"Identifier": "M2", "Title": "Measure 2"},
+        ]
+    },
+    "/Properties": {"Identifier": "test_id", "Title": "Test Dataset"},
+    "/Observations": {
+        "value": [
+            {"Id": 1, "Measure": "M1", "Dim1": "D1", "Value": 100.0},
+            {"Id": 2, "Measure": "M2", "Dim1": "D1", "Value": 200.0},
+        ],
+        "@odata.nextLink": "https://test.url/CBS/test_id/Observations?page=2",
+    },
+    "/Observations?page=2": {
+        "value": [
+            {"Id": 3, "Measure": "M1", "Dim1": "D2", "Value": 300.0},
+            {"Id": 4, "Measure": "M2", "Dim1": "D2", "Value": 400.0},
+        ]
+    },
+}
+
+
+async def mock_fetch_json(url):
+    await asyncio.sleep(0)
+    for suffix, response in RESPONSES.items():
+        if url.endswith(suffix):
+            return response
+    return {"value": []}
+
+
+@patch("cbsodata4.aio.async_fetch_json", side_effect=mock_fetch_json)
+def test_aio_get_metadata(mock_fetch):
+    """Test retrieving metadata with concurrent async requests."""
+    meta = asyncio.run(aio.get_metadata("test_id", base_url="https://test.url"))
+
+    assert list(meta.meta_dict) == ["Dimensions", "MeasureCodes", "Properties"]
+    assert meta.dimension_identifiers == ["Dim1"]
+    assert mock_fetch.call_count == 4
+
+
+def test_aio_get_metadata_from_table():
+    """Test that metadata attached to an Arrow table is returned without requests."""
+    meta = CbsMetadata({"Dimensions": []})
+    table = attach_metadata(pa.table({"Value": [1.0]}), meta)
+
+    assert asyncio.run(aio.get_metadata(table)).meta_dict == meta.meta_dict
+    with pytest.raises(ValueError, match="Table does not have metadata"):
+        asyncio.run(aio.get_metadata(pa.table({"Value": [1.0]})))
+
+
+async def mock_fetch_bytes(url):
+    return json.dumps(await mock_fetch_json(url)).encode()
+
+
+@patch("cbsodata4.aio.async_fetch_bytes", side_effect=mock_fetch_bytes)
+@patch("cbsodata4.aio.async_fetch_json", side_effect=mock_fetch_json)
+def test_aio_get_wide_data(mock_fetch, mock_fetch_bytes, tmp_path):
+    """Test the complete async flow from download to wide format."""
+    result = asyncio.run(
+        aio.get_wide_data(
+            "test_id", download_dir=tmp_path / "test_id", base_url="https://test.url"
+        )
+    )
+
+    assert (tmp_path / "test_id" / "Observations" / "partition_000001.parquet").exists()
+    assert list(result.columns) == ["Dim1", "Measure 1", "Measure 2"]
+    assert result["Measure 2"].tolist() == [200.0, 400.0]
+    assert result.attrs["meta"].title == "Test Dataset"
+
+
+def test_aio_download_data_stream_row_groups_failure(tmp_path):
+    """Test that a failed async row group stream is aborted and resumes fully."""
+    pages = {
+        f"page{i}": {
+            "value": [{"Id": i, "Value": 1.0}],
+            **({"@odata.nextLink": f"page{i + 1}"} if i < 3 else {}),
+        }
+        for i in range(4)
+    }
+    failures = {"page2"}
+
+    async def respond(url):
+        if url in failures:
+            failures.discard(url)
+            raise OSError("server error")
+        return json.dumps(pages[url]).encode()
+
+    options = {
+        "url": "page0",
+        "output_path": tmp_path,
+        "empty_selection": None,
+        "write_mode": "row_groups",
+        "schema": pa.schema([("Id", pa.int64()), ("Value", pa.float64())]),
+    }
+    with patch("cbsodata4.aio.async_fetch_bytes", side_effect=respond):
+        manifest = open_manifest(tmp_path, "page0")
+        with pytest.raises(OSError, match="server error"):
+            asyncio.run(aio.download_data_stream(manifest=manifest, **options))
+        assert pq.read_table(tmp_path)["Id"].to_pylist() == [0, 1]
+
+        manifest = open_manifest(tmp_path, "page0", resume=True)
+        assert not manifest.streams.get("partition", {}).get("done")
+
+        asyncio.run(aio.download_data_stream(manifest=manifest, **options))
+
+    assert pq.read_table(tmp_path)["Id"].to_pylist() == [0, 1, 2, 3]
+    assert manifest.streams["partition"]["done"]
+
+
+@patch("cbsodata4.httpx_client.httpx.AsyncClient.get")
+def test_async_fetch_json(mock_get):
+    """Test that async_fetch_json uses the pooled async client."""
+    request = httpx.Request("GET", "https://test.url/async")
+    mock_get.return_value = httpx.Response(200, json={"data": 1}, request=request)
+
+    async def fetch_twice():
+        async with AsyncCbsClient(http2=False) as client:
+            assert get_async_client() is client
+            first = await async_fetch_json("https://test.url/async")
+            second = await async_fetch_json("https://test.url/async")
+        return first, second
+
+    assert asyncio.run(fetch_twice()) == ({"data": 1}, {"data": 1})
+    assert mock_get.call_count == 1
+
+
+def test_use_async_client():
+    """Test that a client is created and closed for a block without an active client."""
+
+    async def use_clients():
+        async with use_async_client() as client:
+            async with use_async_client() as nested:
+                assert nested is client
+            assert get_async_client() is client
+            http_client = client.client
+        assert get_async_client() is None
+        return http_client
+
+    first = asyncio.run(use_clients())
+    second = asyncio.run(use_clients())
+
+    assert first.is_closed
+    assert second.is_closed
+    assert first is not second
+
+
+def test_async_client_refuses_other_open_loop():
+    """Test that a client can't be shared with a loop that is still open."""
+    client = AsyncCbsClient(http2=False)
+
+    async def use_client():
+        return client.client
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(use_client())
+        with pytest.raises(RuntimeError, match="another event loop"):
+            asyncio.run(use_client())
+        loop.run_until_complete(client.aclose())
+    finally:
+        loop.close()
@@ -1,9 +1,24 @@
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 
-from cbsodata4.data_processor import get_wide_data
+from cbsodata4.data_processor import (
+    CHUNK_COLUMN,
+    get_wide_data,
+    iter_wide_data,
+    pivot_observations,
+    pivot_observations_arrow,
+    scatter_pivot,
+    split_chunks,
+    write_wide_data,
+)
+from cbsodata4.lazy import LazyObservations
+from cbsodata4.metadata import CbsMetadata, attach_metadata
+from cbsodata4.observations import convert_table, encode_code_columns
 
 
 @patch("cbsodata4.data_processor.get_observations")
@@ -102,3 +117,177 @@ def test_get_wide_data_error_no_dimensions(mock_get_observations):
 
     with pytest.raises(ValueError, match="No dimensions found"):
         get_wide_data("test_id")
+
+
+def test_pivot_observations_arrow_matches_pandas():
+    """Test that the Arrow pivot gives the same result as the pandas pivot."""
+    meta = CbsMetadata(
+        {
+            "Dimensions": [{"Identifier": "Dim1"}, {"Identifier": "Period"}],
+            "MeasureCodes": [
+                {"Identifier": "M2", "Title": "Measure 2"},
+                {"Identifier": "M1", "Title": "Measure 1"},
+            ],
+            "Dim1Codes": [{"Identifier": "B"}, {"Identifier": "A"}],
+        }
+    )
+    table = encode_code_columns(
+        pa.table(
+            {
+                "Measure": ["M1", "M2", "M1", "M2", "M1", "M1", "M2", "M2"],
+                "Dim1": ["A", "A", "B", "B", "A", "B", "B", "A"],
+                "Period": [
+                    "2020",
+                    "2020",
+                    "2020",
+                    "2021",
+                    "2020",
+                    "2022",
+                    "2022",
+                    "2021",
+                ],
+                "Value": [1.0, 2.0, 3.0, 4.0, 9.0, None, None, None],
+            }
+        ),
+        meta,
+    )
+
+    wide = pivot_observations_arrow(attach_metadata(table, meta))
+    expected = pivot_observations(convert_table(table, meta))
+
+    assert wide.column_names == ["Dim1", "Period", "Measure 2", "Measure 1"]
+    pd.testing.assert_frame_equal(
+        wide.to_pandas(), expected.rename_axis(columns=None), check_categorical=False
+    )
+
+    with pytest.raises(ValueError, match="Metadata is missing"):
+        pivot_observations_arrow(table)
+
+
+@pytest.mark.parametrize("categorical", [True, False])
+def test_scatter_pivot_matches_pivot_table(categorical):
+    """Test that the scatter pivot gives the same result as pivot_table."""
+    rng = np.random.default_rng(0)
+    size = 200
+    obs = pd.DataFrame(
+        {
+            "Dim1": pd.Categorical(
+                rng.choice(list("bazq"), size), categories=list("zbaq")
+            ),
+            "Dim2": pd.Categorical(
+                rng.choice(list("xyw"), size), categories=list("ywx")
+            ),
+            "Measure": pd.Categorical(rng.choice(["M1", "M2", "M3"], size)),
+            "Value": np.where(rng.random(size) < 0.3, np.nan, rng.random(size)),
+        }
+    ).drop_duplicates(["Dim1", "Dim2", "Measure"])
+    if not categorical:
+        obs = obs.astype({"Dim1": str, "Dim2": str, "Measure": str})
+
+    for index in (["Dim1", "Dim2"], ["Dim2", "Dim1"]):
+        expected = obs.pivot_table(
+            index=index,
+            columns="Measure",
+            values="Value",
+            aggfunc="first",
+            observed=True,
+        ).reset_index()
+        pd.testing.assert_frame_equal(
+            scatter_pivot(obs, index, "Measure", "Value"), expected
+        )
+
+    assert scatter_pivot(pd.concat([obs, obs]), index, "Measure", "Value") is None
+
+
+@pytest.fixture
+def wide_meta():
+    return CbsMetadata(
+        {
+            "Dimensions": [
+                {"Identifier": "Dim1"},
+                {"Identifier": "Perioden", "Kind": "TimeDimension"},
+            ],
+            "MeasureCodes": [
+                {"Identifier": "M1", "Title": "Measure 1"},
+                {"Identifier": "M2", "Title": "Measure 2"},
+                {"Identifier": "M3", "Title": "Measure 3"},
+            ],
+            "PeriodenCodes": [{"Identifier": "2021JJ00"}, {"Identifier": "2020JJ00"}],
+        }
+    )
+
+
+@pytest.fixture
+def wide_observations(tmp_path, wide_meta):
+    path = tmp_path / "Observations"
+    path.mkdir()
+    table = pa.table(
+        {
+            "Measure": ["M1", "M2", "M1", "M2", "M1"],
+            "Dim1": ["A", "A", "B", "A", "A"],
+            "Perioden": ["2020JJ00", "2020JJ00", "2020JJ00", "2021JJ00", "2019JJ00"],
+            "Value": [1.0, 2.0, 3.0, 4.0, 5.0],
+        }
+    )
+    pq.write_table(table, path / "partition_0.parquet")
+    return LazyObservations(path, wide_meta)
+
+
+@patch("cbsodata4.data_processor.open_observations")
+def test_iter_wide_data(mock_open_observations, wide_observations):
+    """Test that the chunks of the wide data together hold the whole pivot."""
+    mock_open_observations.return_value = wide_observations
+
+    chunks = list(iter_wide_data("test_id"))
+
+    assert [list(chunk["Perioden"].unique()) for chunk in chunks] == [
+        ["2021JJ00"],
+        ["2020JJ00"],
+        ["2019JJ00"],
+    ]
+    expected = pivot_observations(wide_observations.to_pandas())
+    result = pd.concat(chunks)
+    assert len(result) == len(expected)
+    for name in ["Measure 1", "Measure 2"]:
+        assert result.set_index(["Dim1", "Perioden"])[name].fillna(0).to_dict() == (
+            expected.set_index(["Dim1", "Perioden"])[name].fillna(0).to_dict()
+        )
+
+    chunks = list(iter_wide_data("test_id", output="arrow", chunk_size=2))
+    assert [chunk.num_rows for chunk in chunks] == [3, 1]
+
+
+def test_split_chunks(wide_observations, tmp_path):
+    """Test splitting observations in a directory per chunk of codes in one pass."""
+    codes = ["2021JJ00", "2020JJ00"]
+    split_chunks(wide_observations, "Perioden", codes, 1, tmp_path / "chunks")
+
+    chunks = [pq.read_table(tmp_path / "chunks" / str(k)) for k in range(2)]
+    assert [set(chunk.column("Perioden").to_pylist()) for chunk in chunks] == [
+        {"2021JJ00"},
+        {"2020JJ00"},
+    ]
+    assert [chunk.num_rows for chunk in chunks] == [1, 3]
+    assert CHUNK_COLUMN not in chunks[0].column_names
+    assert not (tmp_path / "chunks" / "2").exists()
+
+
+@patch("cbsodata4.data_processor.open_observations")
+def test_write_wide_data(mock_open_observations, wide_observations, tmp_path):
+    """Test writing the wide data chunk by chunk to one Parquet file."""
+    mock_open_observations.return_value = wide_observations
+
+    path = write_wide_data("test_id", tmp_path / "wide.parquet")
+
+    result = pq.ParquetFile(path)
+    assert result.metadata.num_row_groups == 3
+    table = result.read()
+    assert table.column_names == [
+        "Dim1",
+        "Perioden",
+        "Measure 1",
+        "Measure 2",
+        "Measure 3",
+    ]
+    assert table.num_rows == 4
+    assert table.column("Measure 3").null_count == 4
@@ -27,8 +27,6 @@ def test_get_datasets_with_date_conversion(mock_fetch_json):
         ]
     }
 
-    get_datasets.cache_clear()
-
     result = get_datasets(convert_dates=True)
 
     assert len(result) == 2
@@ -57,8 +55,6 @@ def test_get_datasets_without_date_conversion(mock_fetch_json):
         ]
     }
 
-    get_datasets.cache_clear()
-
     result = get_datasets(convert_dates=False)
 
     assert len(result) == 1
@@ -76,8 +72,6 @@ def test_get_datasets_catalog_filter(mock_fetch_json):
         ]
     }
 
-    get_datasets.cache_clear()
-
     result = get_datasets(catalog="CBS", convert_dates=False)
 
     assert len(result) == 1
@@ -89,16 +83,16 @@ def test_get_datasets_catalog_filter(mock_fetch_json):
 
 
 @patch("cbsodata4.datasets.fetch_json")
-def test_get_datasets_caching(mock_fetch_json):
-    """Test that get_datasets caches results."""
-    get_datasets.cache_clear()
-
-    mock_fetch_json.return_value = {
-        "value": [{"Identifier": "table1", "Catalog": "CBS"}]
-    }
+def test_get_datasets_not_memoized(mock_fetch_json):
+    """Test that get_datasets sees a changed catalogue, caching is left to fetch_json."""
+    mock_fetch_json.side_effect = [
+        {"value": [{"Identifier": "table1", "Catalog": "CBS"}]},
+        {"value": [{"Identifier": "table2", "Catalog": "CBS"}]},
+    ]
 
     result1 = get_datasets(convert_dates=False)
     result2 = get_datasets(convert_dates=False)
 
-    assert mock_fetch_json.call_count == 1
-    pd.testing.assert_frame_equal(result1, result2)
+    assert mock_fetch_json.call_count == 2
+    assert result1["Identifier"].tolist() == ["table1"]
+    assert result2["Identifier"].tolist() == ["table2"]
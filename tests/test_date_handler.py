@@ -4,8 +4,11 @@ from unittest.mock import MagicMock, patch
 import pandas as pd
 import pytest
 
+from cbsodata4.config import PERIOD_CACHE_SIZE
 from cbsodata4.date_handler import (
     add_date_column,
+    get_period_table,
+    parse_periods,
     period_to_date,
     period_to_freq,
     period_to_numeric,
@@ -106,3 +109,102 @@ def test_add_date_column_no_time_dimensions():
         df = add_date_column(data)
         mock_logger.assert_called_with("Time dimension column not found in data.")
         pd.testing.assert_frame_equal(df, data)
+
+
+def test_parse_periods_matches_scalar_functions():
+    periods = [
+        "2023JJ00",
+        "2023X000",
+        "2024KW04",
+        "2024MM02",
+        "2024W153",
+        "20240229",
+        "2023W101",
+    ]
+    parsed = parse_periods(periods)
+
+    assert parsed["date"].dtype == "datetime64[ns]"
+    for period in periods:
+        assert parsed.loc[period, "date"] == period_to_date(period)
+        assert parsed.loc[period, "numeric"] == pytest.approx(period_to_numeric(period))
+        assert parsed.loc[period, "freq"] == period_to_freq(period)
+
+
+@pytest.mark.parametrize("period", ["2023ZZ99", "2023KW05", "20230229", "2023MM1"])
+def test_parse_periods_invalid(period):
+    with pytest.raises(ValueError, match="Invalid periods"):
+        parse_periods([period])
+
+
+def test_add_date_column_categorical():
+    periods = pd.Categorical(["2023MM05", None, "2023KW02", "2023MM05"])
+    data = pd.DataFrame({"Period": periods})
+    meta = MagicMock()
+    meta.time_dimension_identifiers = ["Period"]
+    data.attrs["meta"] = meta
+
+    df = add_date_column(data)
+    assert df["Period_date"].tolist()[::2] == [
+        pd.Timestamp(2023, 5, 1),
+        pd.Timestamp(2023, 4, 1),
+    ]
+    assert df["Period_date"].isna().tolist() == [False, True, False, False]
+    assert df["Period_freq"].tolist()[::2] == ["M", "Q"]
+    assert df.attrs["meta"] is meta
+
+
+def test_add_date_column_period():
+    data = pd.DataFrame({"Period": ["2023KW01", "2023KW03", None]})
+    meta = MagicMock()
+    meta.time_dimension_identifiers = ["Period"]
+    data.attrs["meta"] = meta
+
+    df = add_date_column(data, date_type="period")
+    assert list(df.columns) == ["Period", "Period_period", "Period_freq"]
+    assert isinstance(df["Period_period"].dtype, pd.PeriodDtype)
+    assert df["Period_period"].iloc[1] == pd.Period("2023Q3")
+    assert df["Period_period"].isna().tolist() == [False, False, True]
+
+
+def test_add_date_column_period_mixed_frequencies():
+    data = pd.DataFrame({"Period": ["2023MM02", "2023JJ00", "2023X000"]})
+    meta = MagicMock()
+    meta.time_dimension_identifiers = ["Period"]
+    data.attrs["meta"] = meta
+
+    df = add_date_column(data, date_type="period")
+    assert df["Period_period"].iloc[0] == pd.Period("2023-02", freq="M")
+    assert df["Period_period"].iloc[1] == pd.Period("2023", freq="Y")
+    assert pd.isna(df["Period_period"].iloc[2])
+
+
+def test_add_date_column_reuses_period_table():
+    periods = pd.Categorical(["2023MM05", "2023MM06"])
+    meta = MagicMock()
+    meta.time_dimension_identifiers = ["Period"]
+    get_period_table.cache_clear()
+
+    for _ in range(3):
+        data = pd.DataFrame({"Period": periods})
+        data.attrs["meta"] = meta
+        add_date_column(data)
+        add_date_column(data, date_type="numeric")
+
+    info = get_period_table.cache_info()
+    assert info.misses == 1
+    assert info.hits == 5
+    assert info.maxsize is not None
+
+
+def test_single_periods_keep_period_tables():
+    get_period_table.cache_clear()
+    get_period_table(("2023MM05", "2023MM06"))
+
+    for year in range(1800, 1800 + PERIOD_CACHE_SIZE + 1):
+        period_to_date(f"{year}JJ00")
+        period_to_numeric(f"{year}JJ00")
+
+    info = get_period_table.cache_info()
+    assert info.currsize == 1
+    get_period_table(("2023MM05", "2023MM06"))
+    assert get_period_table.cache_info().hits == 1
@@ -1,22 +1,38 @@
+import json
 from pathlib import Path
 from unittest.mock import MagicMock, mock_open, patch
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
 
 from cbsodata4.downloader import (
     download_data_stream,
     download_dataset,
+    download_observation_ranges,
     get_empty_dataframe,
+    parse_observations_page,
+    split_observation_ranges,
 )
+from cbsodata4.manifest import DownloadManifest, open_manifest
+from cbsodata4.metadata import CbsMetadata
+from cbsodata4.schema import get_observations_schema
 
 
+@patch("cbsodata4.downloader.open_manifest")
 @patch("cbsodata4.downloader.get_metadata")
 @patch("cbsodata4.downloader.download_data_stream")
 @patch("cbsodata4.downloader.Path.mkdir")
 @patch("builtins.open", new_callable=mock_open)
 @patch("cbsodata4.downloader.pd.DataFrame.to_parquet")
 def test_download_dataset(
-    mock_to_parquet, mock_file_open, mock_mkdir, mock_download_data, mock_get_metadata
+    mock_to_parquet,
+    mock_file_open,
+    mock_mkdir,
+    mock_download_data,
+    mock_get_metadata,
+    mock_open_manifest,
 ):
     """Test downloading a dataset."""
     mock_meta = MagicMock()
@@ -26,6 +42,7 @@ def test_download_dataset(
         "Properties": {"Identifier": "test_id", "Title": "Test Dataset"},
     }
     mock_get_metadata.return_value = mock_meta
+    mock_open_manifest.return_value = MagicMock(ranges=None, streams={}, update=None)
 
     result = download_dataset("test_id")
 
@@ -35,22 +52,30 @@ def test_download_dataset(
     assert mock_file_open.call_count >= 1
 
     mock_download_data.assert_called_once()
+    mock_open_manifest.return_value.mark_complete.assert_called_once()
 
     assert result is mock_meta
 
 
+@patch("cbsodata4.downloader.open_manifest")
 @patch("cbsodata4.downloader.get_metadata")
 @patch("cbsodata4.downloader.download_data_stream")
 @patch("cbsodata4.downloader.Path.mkdir")
 @patch("builtins.open", new_callable=mock_open)
 @patch("cbsodata4.downloader.pd.DataFrame.to_parquet")
 def test_download_dataset_with_filters(
-    mock_to_parquet, mock_file_open, mock_mkdir, mock_download_data, mock_get_metadata
+    mock_to_parquet,
+    mock_file_open,
+    mock_mkdir,
+    mock_download_data,
+    mock_get_metadata,
+    mock_open_manifest,
 ):
     """Test downloading a dataset with filters."""
     mock_meta = MagicMock()
     mock_meta.meta_dict = {"Dimensions": [], "Properties": {}}
     mock_get_metadata.return_value = mock_meta
+    mock_open_manifest.return_value = MagicMock(ranges=None, streams={}, update=None)
 
     result = download_dataset("test_id", Dim1="Value1", Dim2=["Value2", "Value3"])
 
@@ -64,14 +89,19 @@ def test_download_dataset_with_filters(
     assert "$select=Field1,Field2" in call_url
 
 
-@patch("cbsodata4.downloader.fetch_json")
-@patch("cbsodata4.downloader.pd.DataFrame.to_parquet")
+def page_body(values, next_link=None):
+    """Return the body of an Observations response page."""
+    return json.dumps({"value": values, "@odata.nextLink": next_link}).encode()
+
+
+@patch("cbsodata4.downloader.fetch_bytes")
+@patch("cbsodata4.partition_writer.pq.write_table")
 @patch("cbsodata4.downloader.Path.mkdir")
-def test_download_data_stream(mock_mkdir, mock_to_parquet, mock_fetch_json):
+def test_download_data_stream(mock_mkdir, mock_write_table, mock_fetch_bytes):
     """Test downloading data stream."""
-    mock_fetch_json.side_effect = [
-        {"value": [{"Id": 1, "Value": 100}], "@odata.nextLink": "https://next.page"},
-        {"value": [{"Id": 2, "Value": 200}], "@odata.nextLink": None},
+    mock_fetch_bytes.side_effect = [
+        page_body([{"Id": 1, "Value": 100}], "https://next.page"),
+        page_body([{"Id": 2, "Value": 200}]),
     ]
 
     download_data_stream(
@@ -80,11 +110,164 @@ def test_download_data_stream(mock_mkdir, mock_to_parquet, mock_fetch_json):
         empty_selection=pd.DataFrame(),
     )
 
-    assert mock_fetch_json.call_count == 2
+    assert mock_fetch_bytes.call_count == 2
+
+    assert mock_write_table.call_count == 2
+    assert "partition_000000" in mock_write_table.call_args_list[0][0][1]
+    assert "partition_000001" in mock_write_table.call_args_list[1][0][1]
+    assert mock_write_table.call_args_list[1][0][0].to_pylist() == [
+        {"Id": 2, "Value": 200}
+    ]
+
+
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_download_data_stream_pipeline(mock_fetch_bytes, tmp_path):
+    """Test that all pages are written while the next pages are fetched."""
+    pages = [
+        page_body([{"Id": i, "Value": i * 100.0}], f"page{i + 1}") for i in range(9)
+    ] + [page_body([{"Id": 9, "Value": 900.0}])]
+    mock_fetch_bytes.side_effect = pages
+
+    download_data_stream(
+        url="page0", output_path=tmp_path, empty_selection=pd.DataFrame(), queue_size=2
+    )
+
+    result = pd.concat(
+        pd.read_parquet(tmp_path / f"partition_{i:06d}.parquet") for i in range(10)
+    )
+    assert result["Id"].tolist() == list(range(10))
+
+
+@patch("cbsodata4.partition_writer.PageWriter.write", side_effect=OSError("disk full"))
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_download_data_stream_writer_error(mock_fetch_bytes, mock_write, tmp_path):
+    """Test that errors in the writer thread stop the download and are raised."""
+    mock_fetch_bytes.side_effect = lambda url: page_body([{"Id": 1}], url + "+")
+
+    with pytest.raises(OSError, match="disk full"):
+        download_data_stream(
+            url="page", output_path=tmp_path, empty_selection=pd.DataFrame()
+        )
+
+
+def test_parse_observations_page():
+    """Test parsing a response page into an Arrow table and next link."""
+    body = page_body(
+        [
+            {"Id": 1, "Measure": "M1", "Value": 1.5, "Dim1": "A"},
+            {"Id": 2, "Measure": "M2", "Value": None, "Dim1": "B"},
+        ],
+        "https://next.page",
+    )
+
+    table, next_link = parse_observations_page(body, pd.DataFrame())
+
+    assert next_link == "https://next.page"
+    assert table.column_names == ["Id", "Measure", "Value", "Dim1"]
+    assert table.column("Value").to_pylist() == [1.5, None]
+
+    empty = pd.DataFrame(columns=["Id", "Measure"])
+    table, next_link = parse_observations_page(page_body([]), empty)
+    assert next_link is None
+    assert table.num_rows == 0
+    assert table.column_names == ["Id", "Measure"]
+
+
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_download_data_stream_stable_schema(mock_fetch_bytes, tmp_path):
+    """Test that pages with null or integer values are written with one schema."""
+    meta = CbsMetadata({"Dimensions": [{"Identifier": "Dim1"}]})
+    schema = get_observations_schema(meta)
+    mock_fetch_bytes.side_effect = [
+        page_body([{"Id": 1, "Measure": "M1", "Value": 5, "Dim1": "A"}], "page1"),
+        page_body([{"Id": 2, "Measure": "M1", "Value": None, "Dim1": "B"}], "page2"),
+        page_body([]),
+    ]
+
+    download_data_stream(
+        url="page0",
+        output_path=tmp_path,
+        empty_selection=get_empty_dataframe(meta),
+        schema=schema,
+    )
+
+    schemas = [
+        pq.read_schema(tmp_path / f"partition_{i:06d}.parquet") for i in range(3)
+    ]
+    assert all(s.remove_metadata() == schema for s in schemas)
+
+
+def test_split_observation_ranges():
+    """Test splitting observations in ordered $skip/$top ranges."""
+    url = "https://test.url/Observations?$filter=Dim1 eq 'A'"
+    ranges = split_observation_ranges(url, count=10, workers=3)
 
-    assert mock_to_parquet.call_count == 2
-    assert "partition_0" in mock_to_parquet.call_args_list[0][0][0]
-    assert "partition_1" in mock_to_parquet.call_args_list[1][0][0]
+    assert ranges == [
+        f"{url}&$orderby=Id&$skip=0&$top=4",
+        f"{url}&$orderby=Id&$skip=4&$top=4",
+        f"{url}&$orderby=Id&$skip=8&$top=4",
+    ]
+    assert split_observation_ranges(url, count=0, workers=3) == [url]
+
+
+@patch("cbsodata4.downloader.fetch_bytes")
+@patch("cbsodata4.downloader.fetch_json")
+def test_download_observation_ranges(mock_fetch_json, mock_fetch_bytes, tmp_path):
+    """Test downloading ranges concurrently into ordered partition files."""
+
+    def respond(url):
+        skip = int(url.split("$skip=")[1].split("&")[0])
+        return page_body([{"Id": skip + i, "Value": 1.0} for i in range(2)])
+
+    mock_fetch_json.return_value = {"@odata.count": 6, "value": []}
+    mock_fetch_bytes.side_effect = respond
+
+    download_observation_ranges(
+        url="https://test.url/Observations",
+        output_path=tmp_path,
+        empty_selection=pd.DataFrame(),
+        workers=3,
+    )
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == [
+        "partition_0000_000000.parquet",
+        "partition_0001_000000.parquet",
+        "partition_0002_000000.parquet",
+    ]
+    assert pd.read_parquet(tmp_path)["Id"].tolist() == list(range(6))
+
+
+@patch("cbsodata4.downloader.fetch_bytes")
+@patch("cbsodata4.downloader.fetch_json")
+def test_download_observation_ranges_many_pages(
+    mock_fetch_json, mock_fetch_bytes, tmp_path
+):
+    """Test that ranges of 10 or more pages are read back in the order of the Ids."""
+
+    def respond(url):
+        if "$skip=" in url:
+            start = int(url.split("$skip=")[1].split("&")[0])
+        else:
+            start = int(url.split("next=")[1])
+        end = (start // 12 + 1) * 12
+        next_link = None
+        if start + 1 < end:
+            next_link = f"https://test.url/page?next={start + 1}"
+        return page_body([{"Id": start, "Value": 1.0}], next_link)
+
+    mock_fetch_json.return_value = {"@odata.count": 24, "value": []}
+    mock_fetch_bytes.side_effect = respond
+
+    download_observation_ranges(
+        url="https://test.url/Observations",
+        output_path=tmp_path,
+        empty_selection=pd.DataFrame(),
+        workers=2,
+    )
+
+    assert len(list(tmp_path.glob("*.parquet"))) == 24
+    assert pd.read_parquet(tmp_path)["Id"].tolist() == list(range(24))
 
 
 def test_get_empty_dataframe():
@@ -97,3 +280,77 @@ def test_get_empty_dataframe():
     expected_columns = ["Id", "Measure", "ValueAttribute", "Value", "Dim1", "Dim2"]
     assert all(col in df.columns for col in expected_columns)
     assert len(df) == 0
+
+
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_download_data_stream_resumes(mock_fetch_bytes, tmp_path):
+    """Test that an interrupted download resumes after the last recorded page."""
+    pages = {
+        "page0": page_body([{"Id": 0, "Value": 1.0}], "page1"),
+        "page1": page_body([{"Id": 1, "Value": 1.0}], "page2"),
+        "page2": page_body([{"Id": 2, "Value": 1.0}]),
+    }
+    mock_fetch_bytes.side_effect = [pages["page0"], OSError("connection lost")]
+    manifest = open_manifest(tmp_path, "page0")
+    (tmp_path / "partition_000001.parquet").write_bytes(b"partial")
+
+    with pytest.raises(OSError, match="connection lost"):
+        download_data_stream(
+            url="page0",
+            output_path=tmp_path,
+            empty_selection=pd.DataFrame(),
+            manifest=manifest,
+        )
+
+    manifest = open_manifest(tmp_path, "page0", resume=True)
+    assert manifest.streams["partition"]["files"] == ["partition_000000.parquet"]
+    mock_fetch_bytes.side_effect = lambda url: pages[url]
+    download_data_stream(
+        url="page0",
+        output_path=tmp_path,
+        empty_selection=pd.DataFrame(),
+        manifest=manifest,
+    )
+
+    assert [c[0][0] for c in mock_fetch_bytes.call_args_list[2:]] == ["page1", "page2"]
+    assert pd.read_parquet(tmp_path)["Id"].tolist() == [0, 1, 2]
+    assert DownloadManifest.load(tmp_path).streams["partition"]["done"]
+
+
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_download_data_stream_row_groups_failure(mock_fetch_bytes, tmp_path):
+    """Test that a failed row group stream isn't recorded as done and resumes fully."""
+    pages = {
+        f"page{i}": page_body(
+            [{"Id": i, "Value": 1.0}], f"page{i + 1}" if i < 3 else None
+        )
+        for i in range(4)
+    }
+    failures = {"page2"}
+
+    def respond(url):
+        if url in failures:
+            failures.discard(url)
+            raise OSError("server error")
+        return pages[url]
+
+    mock_fetch_bytes.side_effect = respond
+    schema = pa.schema([("Id", pa.int64()), ("Value", pa.float64())])
+    options = {
+        "url": "page0",
+        "output_path": tmp_path,
+        "empty_selection": pd.DataFrame(),
+        "write_mode": "row_groups",
+        "schema": schema,
+    }
+
+    manifest = open_manifest(tmp_path, "page0")
+    with pytest.raises(OSError, match="server error"):
+        download_data_stream(manifest=manifest, **options)
+
+    manifest = open_manifest(tmp_path, "page0", resume=True)
+    assert not manifest.streams.get("partition", {}).get("done")
+
+    download_data_stream(manifest=manifest, **options)
+    assert pd.read_parquet(tmp_path)["Id"].tolist() == [0, 1, 2, 3]
+    assert manifest.streams["partition"]["done"]
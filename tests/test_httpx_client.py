@@ -3,10 +3,21 @@ from unittest.mock import MagicMock, patch
 import httpx
 import pytest
 
-from cbsodata4.httpx_client import fetch_json
+from cbsodata4.config import DEFAULT_MAX_CONNECTIONS
+from cbsodata4.httpx_client import (
+    CbsClient,
+    close_client,
+    configure_client,
+    fetch_bytes,
+    fetch_json,
+    get_cache,
+    get_client,
+    set_cache,
+)
+from cbsodata4.response_cache import SQLiteResponseCache
 
 
-@patch("cbsodata4.httpx_client.httpx.get")
+@patch("cbsodata4.httpx_client.httpx.Client.get")
 def test_fetch_json_success(mock_get):
     """Test successful JSON data retrieval."""
     mock_response = MagicMock()
@@ -16,11 +27,11 @@ def test_fetch_json_success(mock_get):
 
     result = fetch_json("https://test.url")
 
-    mock_get.assert_called_once_with("https://test.url")
+    mock_get.assert_called_once_with("https://test.url", headers={})
     assert result == {"data": "test_data"}
 
 
-@patch("cbsodata4.httpx_client.httpx.get")
+@patch("cbsodata4.httpx_client.httpx.Client.get")
 def test_fetch_json_http_error(mock_get):
     """Test handling of HTTP errors."""
     mock_response = MagicMock()
@@ -31,16 +42,16 @@ def test_fetch_json_http_error(mock_get):
     )
     mock_get.return_value = mock_response
 
-    fetch_json.cache_clear()
+    get_cache().clear()
 
     with pytest.raises(httpx.HTTPStatusError):
         fetch_json("https://test.url")
 
 
-@patch("cbsodata4.httpx_client.httpx.get")
+@patch("cbsodata4.httpx_client.httpx.Client.get")
 def test_fetch_json_caching(mock_get):
     """Test that the fetch_json function caches results."""
-    fetch_json.cache_clear()
+    get_cache().clear()
 
     mock_response = MagicMock()
     mock_response.json.return_value = {"data": "test_data"}
@@ -50,5 +61,95 @@ def test_fetch_json_caching(mock_get):
     result1 = fetch_json("https://test.url")
     result2 = fetch_json("https://test.url")
 
-    mock_get.assert_called_once_with("https://test.url")
+    mock_get.assert_called_once_with("https://test.url", headers={})
     assert result1 == result2 == {"data": "test_data"}
+
+
+def test_client_reuses_connection_pool():
+    """Test that the active client keeps one httpx.Client across requests."""
+    client = CbsClient(http2=False)
+    try:
+        assert client.client is client.client
+        assert client.limits.max_connections == DEFAULT_MAX_CONNECTIONS
+    finally:
+        client.close()
+    assert client._client is None
+
+
+def test_client_context_manager_sets_active_client():
+    """Test that a client used as context manager is active only inside the block."""
+    previous = get_client()
+    with CbsClient(http2=False, max_connections=5) as client:
+        assert get_client() is client
+        assert client.limits.max_connections == 5
+        _ = client.client
+    assert get_client() is previous
+    assert client._client is None
+
+
+def test_configure_client_replaces_active_client():
+    """Test that configure_client installs a new client and closes the old one."""
+    old = configure_client(http2=False)
+    _ = old.client
+    new = configure_client(http2=False, timeout=5.0)
+    assert get_client() is new
+    assert new.timeout == 5.0
+    assert old._client is None
+    close_client()
+
+
+@patch("cbsodata4.httpx_client.http2_available", return_value=False)
+def test_client_http2_requires_h2(mock_available):
+    """Test that explicitly requesting HTTP/2 without h2 installed fails early."""
+    with pytest.raises(ImportError, match="h2"):
+        CbsClient(http2=True)
+    assert CbsClient().http2 is False
+
+
+@patch("cbsodata4.httpx_client.httpx.Client.get")
+def test_fetch_json_without_cache(mock_get):
+    """Test that fetch_json always requests when caching is disabled."""
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"data": "test_data"}
+    mock_get.return_value = mock_response
+
+    previous = set_cache(None)
+    try:
+        fetch_json("https://test.url/nocache")
+        fetch_json("https://test.url/nocache")
+    finally:
+        set_cache(previous)
+
+    assert mock_get.call_count == 2
+
+
+@patch("cbsodata4.httpx_client.httpx.Client.get")
+def test_fetch_json_revalidates_with_etag(mock_get, tmp_path):
+    """Test that expired entries are revalidated and a 304 reuses the cached body."""
+    request = httpx.Request("GET", "https://test.url/etag")
+    mock_get.side_effect = [
+        httpx.Response(
+            200, json={"data": 1}, headers={"ETag": '"v1"'}, request=request
+        ),
+        httpx.Response(304, request=request),
+    ]
+
+    previous = set_cache(SQLiteResponseCache(tmp_path, ttls=[], default_ttl=0.0))
+    try:
+        first = fetch_json("https://test.url/etag")
+        second = fetch_json("https://test.url/etag")
+    finally:
+        set_cache(previous)
+
+    assert first == second == {"data": 1}
+    assert mock_get.call_args_list[1][1]["headers"] == {"If-None-Match": '"v1"'}
+
+
+def test_fetch_bytes_streams_body():
+    """Test that fetch_bytes returns the unparsed body of the response."""
+    body = b'{"value": [{"Id": 1}]}'
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+
+    with CbsClient(http2=False) as client:
+        client._client = httpx.Client(transport=transport)
+        assert fetch_bytes("https://test.url/Observations") == body
@@ -1,6 +1,8 @@
+import json
 from unittest.mock import MagicMock, mock_open, patch
 
 import pandas as pd
+import pyarrow as pa
 import pytest
 
 import cbsodata4
@@ -119,7 +121,7 @@ def mock_json_response(url, responses):
         return {"value": []}
 
 
-@patch("httpx.get")
+@patch("httpx.Client.get")
 @patch("cbsodata4.observations.Path.exists")
 @patch("cbsodata4.observations.get_datasets")
 def test_integration_get_observations(
@@ -148,12 +150,23 @@ def test_integration_get_observations(
     with (
         patch("pathlib.Path.mkdir", return_value=None),
         patch("pandas.DataFrame.to_parquet", return_value=None),
+        patch("pyarrow.parquet.write_table", return_value=None),
+        patch(
+            "cbsodata4.downloader.fetch_bytes",
+            side_effect=lambda url: json.dumps(
+                mock_json_response(url, responses)
+            ).encode(),
+        ),
         patch("builtins.open", mock_open()),
         patch("json.dump", return_value=None),
-        patch("pyarrow.parquet.read_table") as mock_read_table,
+        patch("cbsodata4.manifest.shutil.rmtree"),
+        patch("cbsodata4.manifest.DownloadManifest.save"),
+        patch("cbsodata4.observations.ds.dataset") as mock_dataset,
     ):
         mock_table = pd.DataFrame(responses["observations"]["value"])
-        mock_read_table.return_value.to_pandas.return_value = mock_table
+        table = pa.Table.from_pandas(mock_table)
+        mock_dataset.return_value.schema = table.schema
+        mock_dataset.return_value.to_table.return_value = table
 
         result = cbsodata4.get_observations(
             id="test_id", download_dir=setup_temp_dir, overwrite=True
@@ -183,7 +196,7 @@ def test_integration_get_observations(
         assert meta.time_dimension_identifiers == ["Period"]
 
 
-@patch("httpx.get")
+@patch("httpx.Client.get")
 @patch("cbsodata4.observations.Path.exists")
 @patch("cbsodata4.observations.get_datasets")
 def test_integration_get_wide_data(
@@ -212,12 +225,23 @@ def test_integration_get_wide_data(
     with (
         patch("pathlib.Path.mkdir", return_value=None),
         patch("pandas.DataFrame.to_parquet", return_value=None),
+        patch("pyarrow.parquet.write_table", return_value=None),
+        patch(
+            "cbsodata4.downloader.fetch_bytes",
+            side_effect=lambda url: json.dumps(
+                mock_json_response(url, responses)
+            ).encode(),
+        ),
         patch("builtins.open", mock_open()),
         patch("json.dump", return_value=None),
-        patch("pyarrow.parquet.read_table") as mock_read_table,
+        patch("cbsodata4.manifest.shutil.rmtree"),
+        patch("cbsodata4.manifest.DownloadManifest.save"),
+        patch("cbsodata4.observations.ds.dataset") as mock_dataset,
     ):
         mock_table = pd.DataFrame(responses["observations"]["value"])
-        mock_read_table.return_value.to_pandas.return_value = mock_table
+        table = pa.Table.from_pandas(mock_table)
+        mock_dataset.return_value.schema = table.schema
+        mock_dataset.return_value.to_table.return_value = table
 
         result = cbsodata4.get_wide_data(
             id="test_id", download_dir=setup_temp_dir, overwrite=True
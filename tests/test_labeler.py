@@ -77,3 +77,24 @@ def test_add_label_columns_column_ordering():
     df = add_label_columns(data)
     cols = list(df.columns)
     assert cols == ["Measure", "MeasureLabel", "Dim1", "Dim1Label", "Other"]
+
+
+def test_add_label_columns_categorical():
+    data = pd.DataFrame(
+        {
+            "Measure": pd.Categorical(["M2", "M1", "M2"], categories=["M1", "M2"]),
+            "Dim1": pd.Categorical(["D1", None, "D3"], categories=["D3", "D2", "D1"]),
+        }
+    )
+    mock_meta = MagicMock()
+    mock_meta.get_label_mappings.return_value = {
+        "Measure": {"M1": "Measure 1", "M2": "Measure 2"},
+        "Dim1": {"D1": "Same", "D2": "Other", "D3": "Same"},
+    }
+    data.attrs["meta"] = mock_meta
+
+    df = add_label_columns(data)
+    assert list(df["MeasureLabel"].cat.categories) == ["Measure 1", "Measure 2"]
+    assert (df["MeasureLabel"].cat.codes == df["Measure"].cat.codes).all()
+    assert list(df["Dim1Label"].cat.categories) == ["Same", "Other"]
+    assert df["Dim1Label"].tolist() == ["Same", np.nan, "Same"]
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from cbsodata4.lazy import LazyObservations, open_observations
+from cbsodata4.metadata import CbsMetadata
+
+
+@pytest.fixture
+def meta():
+    return CbsMetadata(
+        {
+            "Dimensions": [{"Identifier": "Regio", "Kind": "GeoDimension"}],
+            "MeasureCodes": [{"Identifier": "M1"}, {"Identifier": "M2"}],
+            "RegioCodes": [{"Identifier": "R2"}, {"Identifier": "R1"}],
+        }
+    )
+
+
+@pytest.fixture
+def observations_path(tmp_path):
+    path = tmp_path / "Observations"
+    path.mkdir()
+    for i in range(2):
+        table = pa.table(
+            {
+                "Id": [2 * i, 2 * i + 1],
+                "Measure": ["M1", "M2"],
+                "Regio": ["R1", "R2"],
+                "Value": [1.0 + i, 2.0 + i],
+            }
+        )
+        pq.write_table(table, path / f"data_{i}.parquet")
+    return path
+
+
+def test_lazy_observations(observations_path, meta):
+    """Test selecting, filtering, counting and materialising lazily."""
+    obs = LazyObservations(observations_path, meta)
+    assert obs.count() == 4
+
+    filtered = obs.where(Measure="M1").select(["Regio", "Value"])
+    assert obs.count() == 4
+    assert filtered.count() == 2
+
+    df = filtered.to_pandas()
+    assert list(df.columns) == ["Regio", "Value"]
+    assert list(df["Value"]) == [1.0, 2.0]
+    assert list(df["Regio"].cat.categories) == ["R2", "R1"]
+    assert df.attrs["meta"] is meta
+
+    table = filtered.where(pc.field("Value") > 1.5).to_arrow()
+    assert table.num_rows == 1
+
+
+def test_lazy_observations_iter_batches(observations_path, meta):
+    """Test that iterating yields bounded chunks covering all rows."""
+    obs = LazyObservations(observations_path, meta, categorical=False)
+    batches = list(obs.iter_batches(batch_size=1))
+
+    assert all(len(batch) == 1 for batch in batches)
+    result = pd.concat(batches)
+    assert sorted(result["Id"]) == [0, 1, 2, 3]
+    assert result["Measure"].dtype != "category"
+
+    tables = list(obs.iter_batches(output="arrow"))
+    assert sum(table.num_rows for table in tables) == 4
+
+
+def test_lazy_observations_errors(tmp_path, observations_path, meta):
+    """Test errors for missing directories and columns."""
+    with pytest.raises(FileNotFoundError):
+        LazyObservations(tmp_path / "missing", meta)
+    with pytest.raises(ValueError):
+        LazyObservations(observations_path, meta).select(["Missing"])
+
+
+@patch("cbsodata4.lazy.ensure_observations")
+def test_open_observations(mock_ensure, observations_path, meta):
+    """Test that open_observations applies select, include_id and filters lazily."""
+    mock_ensure.return_value = (meta, observations_path.parent, "Observations")
+
+    obs = open_observations("test_id", include_id=False, Regio="R2")
+
+    assert "Id" not in obs.columns
+    assert obs.count() == 2
+    assert set(obs.to_pandas()["Measure"]) == {"M2"}
@@ -0,0 +1,61 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cbsodata4.local_store import (
+    OBSERVATIONS_DIR,
+    covers,
+    find_observations_dir,
+    get_observations_dir,
+    get_request_spec,
+)
+from cbsodata4.manifest import open_manifest
+
+
+def test_get_observations_dir():
+    """Test that equivalent requests share a directory and different ones don't."""
+    assert get_observations_dir(get_request_spec()) == OBSERVATIONS_DIR
+
+    spec = get_request_spec(select=["Value", "Dim1"], filters={"Dim1": ["B", "A"]})
+    same = get_request_spec(select=["Dim1", "Value"], filters={"Dim1": ["A", "B"]})
+    other = get_request_spec(select=["Dim1", "Value"], filters={"Dim1": "A"})
+
+    assert get_observations_dir(spec) == get_observations_dir(same)
+    assert get_observations_dir(spec) != get_observations_dir(other)
+    assert get_observations_dir(spec).startswith(f"{OBSERVATIONS_DIR}_")
+
+
+def test_covers():
+    """Test which stored requests can answer a narrower request."""
+    full = get_request_spec()
+    selected = get_request_spec(select=["Dim1", "Value"])
+    filtered = get_request_spec(filters={"Dim1": ["A", "B"]})
+
+    assert covers(full, get_request_spec(select=["Value"], filters={"Dim1": "A"}))
+    assert covers(filtered, get_request_spec(filters={"Dim1": "A", "Dim2": "C"}))
+    assert not covers(filtered, full)
+    assert not covers(filtered, get_request_spec(filters={"Dim1": ["A", "C"]}))
+    assert covers(selected, get_request_spec(select=["Value"], filters={"Dim1": "A"}))
+    assert not covers(selected, full)
+    assert not covers(
+        selected, get_request_spec(select=["Value"], filters={"Dim2": "C"})
+    )
+    assert not covers(full, get_request_spec(query="$filter=Dim1 eq 'A'"))
+
+
+def test_find_observations_dir(tmp_path):
+    """Test that complete downloads of the request or a wider one are found."""
+    spec = get_request_spec(filters={"Dim1": "A"})
+    assert find_observations_dir(tmp_path, spec) is None
+
+    wide = get_request_spec(filters={"Dim1": ["A", "B"]})
+    manifest = open_manifest(tmp_path / get_observations_dir(wide), "url")
+    manifest.spec = wide
+    pq.write_table(pa.table({"Dim1": ["A"]}), manifest.path.parent / "p_0.parquet")
+    assert find_observations_dir(tmp_path, spec) is None
+
+    manifest.mark_complete()
+    assert find_observations_dir(tmp_path, spec) == get_observations_dir(wide)
+    assert find_observations_dir(tmp_path, spec, exact=True) is None
+    assert find_observations_dir(tmp_path, wide, exact=True) == get_observations_dir(
+        wide
+    )
@@ -0,0 +1,70 @@
+from cbsodata4.manifest import (
+    MANIFEST_FILE,
+    DownloadManifest,
+    open_manifest,
+    prepare_stream,
+)
+
+
+def test_manifest_roundtrip(tmp_path):
+    """Test that recorded progress is saved and loaded again."""
+    manifest = open_manifest(tmp_path, "url")
+    manifest.get_stream("partition", "url")
+    manifest.record("partition", tmp_path / "partition_0.parquet", "next")
+
+    loaded = DownloadManifest.load(tmp_path)
+    assert loaded.url == "url"
+    assert loaded.streams["partition"] == {
+        "url": "url",
+        "next_link": "next",
+        "files": ["partition_0.parquet"],
+        "done": False,
+    }
+    assert not loaded.complete
+
+    loaded.record("partition", tmp_path / "partition_1.parquet", None)
+    loaded.mark_complete()
+    assert DownloadManifest.load(tmp_path).complete
+    assert [p.name for p in tmp_path.iterdir()] == [MANIFEST_FILE]
+
+
+def test_load_missing_manifest(tmp_path):
+    """Test that a directory without manifest has no manifest."""
+    assert DownloadManifest.load(tmp_path) is None
+
+
+def test_open_manifest_resume(tmp_path):
+    """Test that only an incomplete download of the same url is resumed."""
+    open_manifest(tmp_path, "url")
+    (tmp_path / "partition_0.parquet").write_bytes(b"data")
+
+    manifest = open_manifest(tmp_path, "url", resume=True)
+    assert (tmp_path / "partition_0.parquet").exists()
+
+    manifest.mark_complete()
+    open_manifest(tmp_path, "url", resume=True)
+    assert not (tmp_path / "partition_0.parquet").exists()
+    assert not DownloadManifest.load(tmp_path).complete
+
+    (tmp_path / "partition_0.parquet").write_bytes(b"data")
+    open_manifest(tmp_path, "other", resume=True)
+    assert not (tmp_path / "partition_0.parquet").exists()
+    assert DownloadManifest.load(tmp_path).url == "other"
+
+
+def test_prepare_stream(tmp_path):
+    """Test that unrecorded files are removed and the stream continues at next_link."""
+    manifest = open_manifest(tmp_path, "url")
+    manifest.get_stream("partition_0000", "url0")
+    manifest.record("partition_0000", tmp_path / "partition_0000_0.parquet", "next")
+    for name in ["partition_0000_0", "partition_0000_1", "partition_0001_0"]:
+        (tmp_path / f"{name}.parquet").write_bytes(b"data")
+
+    assert prepare_stream(manifest, tmp_path, "partition_0000", "url0") == (1, "next")
+    assert sorted(p.name for p in tmp_path.glob("*.parquet")) == [
+        "partition_0000_0.parquet",
+        "partition_0001_0.parquet",
+    ]
+
+    manifest.record("partition_0000", tmp_path / "partition_0000_1.parquet", None)
+    assert prepare_stream(manifest, tmp_path, "partition_0000", "url0") is None
@@ -1,8 +1,10 @@
 from unittest.mock import patch
 
 import pandas as pd
+import pyarrow as pa
+import pytest
 
-from cbsodata4.metadata import CbsMetadata, get_metadata
+from cbsodata4.metadata import CbsMetadata, attach_metadata, get_metadata
 
 
 def test_cbs_metadata_properties():
@@ -77,12 +79,13 @@ def test_cbs_metadata_representation():
 @patch("cbsodata4.metadata.fetch_json")
 def test_get_metadata_from_id(mock_fetch_json):
     """Test retrieving metadata for a dataset ID."""
-    mock_fetch_json.side_effect = [
-        {"value": [{"name": "Dimensions"}, {"name": "MeasureCodes"}]},
-        {"value": [{"Identifier": "Dim1"}]},
-        {"value": [{"Identifier": "M1", "Title": "Measure 1"}]},
-        {"Identifier": "test_id", "Title": "Test Dataset"},
-    ]
+    responses = {
+        "test_id": {"value": [{"name": "Dimensions"}, {"name": "MeasureCodes"}]},
+        "Dimensions": {"value": [{"Identifier": "Dim1"}]},
+        "MeasureCodes": {"value": [{"Identifier": "M1", "Title": "Measure 1"}]},
+        "Properties": {"Identifier": "test_id", "Title": "Test Dataset"},
+    }
+    mock_fetch_json.side_effect = lambda url: responses[url.rsplit("/", 1)[-1]]
 
     meta = get_metadata("test_id")
 
@@ -99,6 +102,23 @@ def test_get_metadata_from_id(mock_fetch_json):
     assert mock_fetch_json.call_count == 4
 
 
+@patch("cbsodata4.metadata.fetch_json")
+def test_get_metadata_concurrent_keeps_order(mock_fetch_json):
+    """Test that concurrent fetching yields the same metadata as sequential fetching."""
+    codes = [f"Dim{i}Codes" for i in range(8)]
+    mock_fetch_json.side_effect = lambda url: (
+        {"value": [{"name": "Dimensions"}] + [{"name": c} for c in codes]}
+        if url.endswith("/test_id")
+        else {"value": [url.rsplit("/", 1)[-1]]}
+    )
+
+    concurrent = get_metadata("test_id", max_workers=4)
+    sequential = get_metadata("test_id", max_workers=1)
+
+    assert list(concurrent.meta_dict) == ["Dimensions"] + codes + ["Properties"]
+    assert concurrent.meta_dict == sequential.meta_dict
+
+
 def test_get_metadata_from_dataframe():
     """Test retrieving metadata from a DataFrame with metadata attribute."""
     df = pd.DataFrame({"test": [1, 2, 3]})
@@ -107,3 +127,45 @@ def test_get_metadata_from_dataframe():
 
     result = get_metadata(df)
     assert result is meta
+
+
+def test_get_metadata_from_table():
+    """Test retrieving metadata stored in the schema metadata of an Arrow table."""
+    meta = CbsMetadata({"Properties": {"Identifier": "test_id"}})
+    table = attach_metadata(pa.table({"test": [1, 2, 3]}), meta)
+
+    assert get_metadata(table).meta_dict == meta.meta_dict
+    with pytest.raises(ValueError, match="Table does not have metadata"):
+        get_metadata(pa.table({"test": [1]}))
+
+
+def test_cbs_metadata_indexes():
+    """Test the cached code and hierarchy lookups of the CbsMetadata class."""
+    meta = CbsMetadata(
+        {
+            "MeasureCodes": [
+                {"Identifier": "M1", "Title": "Measure 1", "Unit": "euro"},
+                {"Identifier": "M2", "Title": "Measure 2", "MeasureGroupId": "G2"},
+            ],
+            "MeasureGroups": [
+                {"Id": "G1", "Title": "Group 1", "ParentId": None},
+                {"Id": "G2", "Title": "Group 2", "ParentId": "G1"},
+            ],
+        }
+    )
+
+    assert meta.measure_units == {"M1": "euro", "M2": None}
+    assert meta.get_code_groups("Measure") == {"M1": None, "M2": "G2"}
+    assert meta.get_group_parents("Measure") == {"G1": None, "G2": "G1"}
+    assert meta.get_group_children("Measure") == {
+        None: ["G1", "M1"],
+        "G1": ["G2"],
+        "G2": ["M2"],
+    }
+    assert meta.measurecode_mapping is meta.measurecode_mapping
+
+    meta.meta_dict = {"MeasureCodes": [{"Identifier": "M3", "Title": "Measure 3"}]}
+    assert meta.measurecode_mapping == {"M3": "Measure 3"}
+    assert meta.get_code_identifiers("Measure") == ["M3"]
+    with pytest.raises(AttributeError):
+        meta.other = 1
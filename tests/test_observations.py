@@ -1,19 +1,31 @@
 from unittest.mock import MagicMock, patch
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 
-from cbsodata4.observations import get_observations
+from cbsodata4.local_store import ARROW_FILE, get_request_spec
+from cbsodata4.manifest import MANIFEST_FILE, DownloadManifest, open_manifest
+from cbsodata4.metadata import CbsMetadata, get_metadata
+from cbsodata4.observations import get_observations, read_observations
+
+
+def fake_dataset(table):
+    """Return a stand-in for a pyarrow dataset holding table."""
+    dataset = MagicMock(schema=table.schema)
+    dataset.to_table.side_effect = lambda columns, filter: table.select(columns)
+    return dataset
 
 
 @patch("cbsodata4.observations.get_datasets")
 @patch("cbsodata4.observations.download_dataset")
 @patch("cbsodata4.observations.get_metadata")
-@patch("cbsodata4.observations.pq.read_table")
+@patch("cbsodata4.observations.ds.dataset")
 @patch("cbsodata4.observations.Path.exists")
 def test_get_observations_new_download(
     mock_exists,
-    mock_read_table,
+    mock_dataset,
     mock_get_metadata,
     mock_download_dataset,
     mock_get_datasets,
@@ -30,17 +42,16 @@ def test_get_observations_new_download(
 
     mock_meta = MagicMock()
     mock_download_dataset.return_value = mock_meta
+    mock_get_metadata.return_value = mock_meta
 
-    mock_table = MagicMock()
     mock_df = pd.DataFrame({"Id": [1, 2], "Measure": ["M1", "M2"], "Value": [100, 200]})
-    mock_table.to_pandas.return_value = mock_df
-    mock_read_table.return_value = mock_table
+    mock_dataset.return_value = fake_dataset(pa.Table.from_pandas(mock_df))
 
     result = get_observations(id="83133NED")
 
     mock_download_dataset.assert_called_once()
 
-    mock_read_table.assert_called_once()
+    mock_dataset.assert_called_once()
 
     assert "Id" in result.columns
     assert "Measure" in result.columns
@@ -51,11 +62,11 @@ def test_get_observations_new_download(
 @patch("cbsodata4.observations.get_datasets")
 @patch("cbsodata4.observations.download_dataset")
 @patch("cbsodata4.observations.get_metadata")
-@patch("cbsodata4.observations.pq.read_table")
+@patch("cbsodata4.observations.ds.dataset")
 @patch("cbsodata4.observations.Path.exists")
 def test_get_observations_existing_data(
     mock_exists,
-    mock_read_table,
+    mock_dataset,
     mock_get_metadata,
     mock_download_dataset,
     mock_get_datasets,
@@ -70,10 +81,8 @@ def test_get_observations_existing_data(
     mock_meta = MagicMock()
     mock_get_metadata.return_value = mock_meta
 
-    mock_table = MagicMock()
     mock_df = pd.DataFrame({"Id": [1, 2], "Measure": ["M1", "M2"], "Value": [100, 200]})
-    mock_table.to_pandas.return_value = mock_df
-    mock_read_table.return_value = mock_table
+    mock_dataset.return_value = fake_dataset(pa.Table.from_pandas(mock_df))
 
     result = get_observations(id="83133NED", overwrite=False)
 
@@ -81,7 +90,65 @@ def test_get_observations_existing_data(
 
     mock_get_metadata.assert_called_once()
 
-    mock_read_table.assert_called_once()
+    mock_dataset.assert_called_once()
+
+
+@patch("cbsodata4.observations.get_datasets")
+@patch("cbsodata4.observations.download_dataset")
+@patch("cbsodata4.observations.get_metadata")
+@patch("cbsodata4.observations.read_observations")
+def test_get_observations_resumes_incomplete_download(
+    mock_read_observations,
+    mock_get_metadata,
+    mock_download_dataset,
+    mock_get_datasets,
+    tmp_path,
+):
+    """Test that an incomplete download on disk is resumed instead of read."""
+    mock_get_datasets.return_value = pd.DataFrame(
+        {"Identifier": ["83133NED"], "Title": ["Dataset 1"]}
+    )
+    manifest = open_manifest(tmp_path / "Observations", "url")
+
+    get_observations(id="83133NED", download_dir=tmp_path)
+    mock_download_dataset.assert_called_once()
+    assert mock_download_dataset.call_args[1]["resume"] is True
+
+    manifest.mark_complete()
+    mock_download_dataset.reset_mock()
+    get_observations(id="83133NED", download_dir=tmp_path)
+    mock_download_dataset.assert_not_called()
+    mock_get_metadata.assert_called_once()
+
+
+@patch("cbsodata4.observations.get_datasets")
+@patch("cbsodata4.observations.download_dataset")
+@patch("cbsodata4.observations.get_metadata")
+def test_get_observations_from_superset(
+    mock_get_metadata, mock_download_dataset, mock_get_datasets, tmp_path
+):
+    """Test that a narrower request is read from a complete full download."""
+    mock_get_datasets.return_value = pd.DataFrame(
+        {"Identifier": ["83133NED"], "Title": ["Dataset 1"]}
+    )
+    mock_get_metadata.return_value = CbsMetadata(
+        {"Dimensions": [{"Identifier": "Dim1"}]}
+    )
+    write_observations(tmp_path)
+    DownloadManifest(
+        tmp_path / "Observations" / MANIFEST_FILE,
+        "url",
+        complete=True,
+        spec=get_request_spec(),
+    ).save()
+
+    obs = get_observations(
+        id="83133NED", download_dir=tmp_path, select=["Dim1", "Value"], Dim1="A"
+    )
+
+    mock_download_dataset.assert_not_called()
+    assert list(obs.columns) == ["Dim1", "Value"]
+    assert obs["Value"].tolist() == [2.0]
 
 
 @patch("cbsodata4.observations.get_datasets")
@@ -96,8 +163,11 @@ def test_get_observations_invalid_id(mock_get_datasets):
 
 
 @patch("cbsodata4.observations.get_datasets")
+@patch("cbsodata4.observations.get_metadata")
 @patch("cbsodata4.observations.Path.exists")
-def test_get_observations_missing_observations_dir(mock_exists, mock_get_datasets):
+def test_get_observations_missing_observations_dir(
+    mock_exists, mock_get_metadata, mock_get_datasets
+):
     """Test error when observations directory doesn't exist."""
     mock_get_datasets.return_value = pd.DataFrame(
         {"Identifier": ["83133NED"], "Title": ["Dataset 1"]}
@@ -110,11 +180,16 @@ def test_get_observations_missing_observations_dir(mock_exists, mock_get_dataset
 
 
 @patch("cbsodata4.observations.get_datasets")
+@patch("cbsodata4.observations.get_metadata")
 @patch("cbsodata4.observations.download_dataset")
-@patch("cbsodata4.observations.pq.read_table")
+@patch("cbsodata4.observations.ds.dataset")
 @patch("cbsodata4.observations.Path.exists")
 def test_get_observations_include_id_flag(
-    mock_exists, mock_read_table, mock_download_dataset, mock_get_datasets
+    mock_exists,
+    mock_dataset,
+    mock_download_dataset,
+    mock_get_metadata,
+    mock_get_datasets,
 ):
     """Test controlling the inclusion of the Id column."""
     mock_get_datasets.return_value = pd.DataFrame(
@@ -125,14 +200,132 @@ def test_get_observations_include_id_flag(
 
     mock_meta = MagicMock()
     mock_download_dataset.return_value = mock_meta
+    mock_get_metadata.return_value = mock_meta
 
-    mock_table = MagicMock()
     mock_df = pd.DataFrame({"Id": [1, 2], "Measure": ["M1", "M2"], "Value": [100, 200]})
-    mock_table.to_pandas.return_value = mock_df
-    mock_read_table.return_value = mock_table
+    mock_dataset.return_value = fake_dataset(pa.Table.from_pandas(mock_df))
 
     result = get_observations(id="83133NED", include_id=False)
     assert "Id" not in result.columns
 
     result = get_observations(id="83133NED", include_id=True)
     assert "Id" in result.columns
+
+
+def write_observations(path):
+    """Write a small Observations directory with plain string code columns."""
+    observations_path = path / "Observations"
+    observations_path.mkdir(parents=True)
+    table = pa.table(
+        {
+            "Id": [1, 2, 3],
+            "Measure": ["M2", "M1", "M2"],
+            "Dim1": ["B", "A", "X"],
+            "Value": [1.0, 2.0, 3.0],
+        }
+    )
+    pq.write_table(table, observations_path / "partition_0.parquet")
+
+
+def test_read_observations_categorical(tmp_path):
+    """Test that code columns are Categoricals ordered like the metadata codes."""
+    write_observations(tmp_path)
+    meta = CbsMetadata(
+        {
+            "Dimensions": [{"Identifier": "Dim1"}],
+            "MeasureCodes": [{"Identifier": "M1"}, {"Identifier": "M2"}],
+            "Dim1Codes": [{"Identifier": "B"}, {"Identifier": "A"}],
+        }
+    )
+
+    obs = read_observations(tmp_path, meta)
+
+    assert isinstance(obs["Measure"].dtype, pd.CategoricalDtype)
+    assert list(obs["Measure"].cat.categories) == ["M1", "M2"]
+    assert list(obs["Dim1"].cat.categories) == ["B", "A", "X"]
+    assert obs["Dim1"].tolist() == ["B", "A", "X"]
+    assert obs.attrs["meta"] is meta
+
+    plain = read_observations(tmp_path, meta, categorical=False)
+    assert not isinstance(plain["Dim1"].dtype, pd.CategoricalDtype)
+    assert plain["Dim1"].tolist() == ["B", "A", "X"]
+
+
+def test_read_observations_pushdown(tmp_path):
+    """Test that select and filters restrict the columns and rows read from disk."""
+    write_observations(tmp_path)
+    meta = CbsMetadata({"Dimensions": [{"Identifier": "Dim1"}]})
+
+    obs = read_observations(
+        tmp_path,
+        meta,
+        include_id=False,
+        select=["Id", "Dim1", "Value"],
+        filters={"Dim1": ["A", "X"], "Dim2": "C"},
+    )
+
+    assert list(obs.columns) == ["Dim1", "Value"]
+    assert obs["Value"].tolist() == [2.0, 3.0]
+
+    obs = read_observations(tmp_path, meta, filters={"Measure": "M2"})
+    assert obs["Id"].tolist() == [1, 3]
+
+
+def test_read_observations_arrow_output(tmp_path):
+    """Test returning observations as an Arrow table with the metadata attached."""
+    write_observations(tmp_path)
+    meta = CbsMetadata({"Dimensions": [{"Identifier": "Dim1"}]})
+
+    table = read_observations(tmp_path, meta, output="arrow")
+
+    assert isinstance(table, pa.Table)
+    assert pa.types.is_dictionary(table.schema.field("Dim1").type)
+    assert get_metadata(table).meta_dict == meta.meta_dict
+
+    with (
+        patch.dict("sys.modules", {"polars": None}),
+        pytest.raises(ImportError, match="requires polars"),
+    ):
+        read_observations(tmp_path, meta, output="polars")
+    with pytest.raises(ValueError, match="Unknown output"):
+        read_observations(tmp_path, meta, output="numpy")
+
+
+def test_read_observations_memory_map(tmp_path):
+    """Test reading from a memory mapped Arrow IPC copy of the observations."""
+    write_observations(tmp_path)
+    meta = CbsMetadata(
+        {
+            "Dimensions": [{"Identifier": "Dim1"}],
+            "Dim1Codes": [{"Identifier": "B"}, {"Identifier": "A"}],
+        }
+    )
+    arrow_path = tmp_path / "Observations" / ARROW_FILE
+
+    obs = read_observations(tmp_path, meta, memory_map=True)
+    assert arrow_path.exists()
+    pd.testing.assert_frame_equal(obs, read_observations(tmp_path, meta))
+
+    obs = read_observations(
+        tmp_path,
+        meta,
+        memory_map=True,
+        include_id=False,
+        filters={"Dim1": ["A", "X"]},
+        output="arrow",
+    )
+    assert obs.column_names == ["Measure", "Dim1", "Value"]
+    assert obs.column("Value").to_pylist() == [2.0, 3.0]
+    assert pq.read_table(tmp_path / "Observations").num_rows == 3
+
+    for memory_map in [True, False]:
+        obs = read_observations(
+            tmp_path,
+            meta,
+            memory_map=memory_map,
+            select=["Measure", "Value"],
+            filters={"Dim1": "A"},
+            output="arrow",
+        )
+        assert obs.column_names == ["Measure", "Value"]
+        assert obs.column("Value").to_pylist() == [2.0]
@@ -0,0 +1,75 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cbsodata4.partition_writer import PageWriter, RowGroupWriter, create_writer
+
+SCHEMA = pa.schema([pa.field("Id", pa.int64()), pa.field("Value", pa.float64())])
+
+
+def page(start, n):
+    return pa.table({"Id": list(range(start, start + n)), "Value": [1] * n})
+
+
+def test_page_writer_writes_file_per_page(tmp_path):
+    """Test that every page gets its own file."""
+    writer = PageWriter(tmp_path, prefix="partition_0001")
+    writer.write(page(0, 2))
+    writer.write(page(2, 2))
+    writer.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "partition_0001_000000.parquet",
+        "partition_0001_000001.parquet",
+    ]
+
+
+def test_row_group_writer_single_file(tmp_path):
+    """Test that pages are appended as row groups of row_group_size to one file."""
+    writer = RowGroupWriter(tmp_path, SCHEMA, row_group_size=4)
+    for start in range(0, 10, 3):
+        writer.write(page(start, 3))
+    writer.close()
+
+    assert [p.name for p in tmp_path.iterdir()] == ["partition_000000.parquet"]
+    parquet_file = pq.ParquetFile(tmp_path / "partition_000000.parquet")
+    sizes = [
+        parquet_file.metadata.row_group(i).num_rows
+        for i in range(parquet_file.num_row_groups)
+    ]
+    assert sizes == [4, 4, 4]
+    table = parquet_file.read()
+    assert table.schema == SCHEMA
+    assert table.column("Id").to_pylist() == list(range(12))
+
+
+def test_row_group_writer_caps_file_rows(tmp_path):
+    """Test that a new file is started once max_file_rows is reached."""
+    writer = RowGroupWriter(tmp_path, SCHEMA, max_file_rows=4)
+    for start in range(0, 10, 2):
+        writer.write(page(start, 2))
+    writer.close()
+
+    assert writer.files == [tmp_path / f"partition_{i:06d}.parquet" for i in range(3)]
+    assert pq.read_table(tmp_path).column("Id").to_pylist() == list(range(10))
+
+
+def test_row_group_writer_empty_and_extra_columns(tmp_path):
+    """Test that an empty download still yields a file with the full schema."""
+    writer = RowGroupWriter(tmp_path, SCHEMA)
+    writer.write(
+        pa.table({"Id": pa.array([], pa.int64()), "Extra": pa.array([], pa.string())})
+    )
+    writer.close()
+
+    table = pq.read_table(tmp_path / "partition_000000.parquet")
+    assert table.num_rows == 0
+    assert table.column_names == ["Id", "Value", "Extra"]
+
+
+def test_create_writer_invalid_mode(tmp_path):
+    """Test that row_groups mode requires a schema and unknown modes are rejected."""
+    with pytest.raises(ValueError, match="requires a schema"):
+        create_writer(tmp_path, write_mode="row_groups")
+    with pytest.raises(ValueError, match="Unknown write_mode"):
+        create_writer(tmp_path, write_mode="other")
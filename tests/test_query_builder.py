@@ -1,6 +1,7 @@
 import pytest
 
 from cbsodata4.query_builder import (
+    add_query_options,
     build_contains_filter,
     build_endswith_filter,
     build_eq_filter,
@@ -86,3 +87,13 @@ def test_construct_filter_empty():
 def test_construct_filter_unsupported_type():
     with pytest.raises(NotImplementedError, match="column filter for <class 'int'> is not supported"):
         construct_filter(Name=123)
+
+
+def test_add_query_options():
+    url = "https://x/Observations"
+    assert add_query_options(url, top=0) == "https://x/Observations?$top=0"
+    assert (
+        add_query_options("https://x/Observations?$select=Id", skip=5, top=10)
+        == "https://x/Observations?$select=Id&$skip=5&$top=10"
+    )
+    assert add_query_options("https://x/Observations") == "https://x/Observations"
@@ -0,0 +1,243 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from cbsodata4 import aio
+from cbsodata4.downloader import download_dataset
+from cbsodata4.httpx_client import set_cache
+from cbsodata4.local_store import ARROW_FILE
+from cbsodata4.manifest import DownloadManifest
+from cbsodata4.metadata import CbsMetadata
+from cbsodata4.observations import ensure_observations, write_arrow_store
+from cbsodata4.refresh import get_changed_periods, is_modified, refresh_dataset
+
+
+def make_meta(periods, title="Test"):
+    """Return metadata with a time dimension with periods as (code, status) pairs."""
+    return CbsMetadata(
+        {
+            "Dimensions": [{"Identifier": "Perioden", "Kind": "TimeDimension"}],
+            "MeasureCodes": [{"Identifier": "M1", "Title": "Measure 1"}],
+            "PeriodenCodes": [
+                {"Identifier": code, "Title": code, "Status": status}
+                for code, status in periods
+            ],
+            "Properties": {"Identifier": "test_id", "Title": title},
+        }
+    )
+
+
+def make_fetch_bytes(all_periods, value):
+    """Return a fetch_bytes replacement serving value for the requested periods."""
+
+    def fetch_bytes(url):
+        periods = [p for p in all_periods if f"Perioden eq '{p}'" in url]
+        periods = periods or all_periods
+        rows = [
+            {"Id": i, "Measure": "M1", "Perioden": p, "Value": value}
+            for i, p in enumerate(periods)
+        ]
+        return json.dumps({"value": rows}).encode()
+
+    return fetch_bytes
+
+
+def read_values(path):
+    table = pq.read_table(path / "Observations").to_pandas()
+    return dict(zip(table["Perioden"].astype(str), table["Value"]))
+
+
+SNAPSHOT = {
+    "Modified": "2024-01-01T00:00:00+00:00",
+    "ObservationsModified": "2024-01-01T00:00:00+00:00",
+}
+
+
+@patch("cbsodata4.refresh.get_metadata")
+@patch("cbsodata4.downloader.get_metadata")
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_refresh_dataset(
+    mock_fetch_bytes, mock_get_metadata, mock_refresh_metadata, tmp_path
+):
+    """Test that only new and provisional periods are downloaded again."""
+    meta = make_meta([("2020JJ00", "Definitief"), ("2021JJ00", "Voorlopig")])
+    mock_get_metadata.return_value = meta
+    mock_refresh_metadata.return_value = meta
+    mock_fetch_bytes.side_effect = make_fetch_bytes(["2020JJ00", "2021JJ00"], 1.0)
+    download_dataset("test_id", download_dir=tmp_path, snapshot=SNAPSHOT)
+
+    mock_fetch_bytes.reset_mock()
+    refresh_dataset("test_id", SNAPSHOT, download_dir=tmp_path)
+    mock_fetch_bytes.assert_not_called()
+
+    new_meta = make_meta(
+        [
+            ("2020JJ00", "Definitief"),
+            ("2021JJ00", "Definitief"),
+            ("2022JJ00", "Voorlopig"),
+        ]
+    )
+    mock_refresh_metadata.return_value = new_meta
+    mock_fetch_bytes.side_effect = make_fetch_bytes(
+        ["2020JJ00", "2021JJ00", "2022JJ00"], 2.0
+    )
+    changed = {**SNAPSHOT, "ObservationsModified": "2024-02-01T00:00:00+00:00"}
+    write_arrow_store(tmp_path / "Observations", meta)
+    refresh_dataset("test_id", changed, download_dir=tmp_path)
+
+    assert not (tmp_path / "Observations" / ARROW_FILE).exists()
+    url = mock_fetch_bytes.call_args[0][0]
+    assert "2021JJ00" in url and "2022JJ00" in url and "2020JJ00" not in url
+    assert read_values(tmp_path) == {
+        "2020JJ00": 1.0,
+        "2021JJ00": 2.0,
+        "2022JJ00": 2.0,
+    }
+    manifest = DownloadManifest.load(tmp_path / "Observations")
+    assert manifest.complete
+    assert manifest.update is None
+    assert manifest.snapshot == changed
+    assert manifest.periods["2022JJ00"] == "Voorlopig"
+
+
+@patch("cbsodata4.refresh.get_metadata")
+@patch("cbsodata4.downloader.get_metadata")
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_refresh_dataset_metadata_only(
+    mock_fetch_bytes, mock_get_metadata, mock_refresh_metadata, tmp_path
+):
+    """Test that only the metadata is updated when the observations didn't change."""
+    mock_get_metadata.return_value = make_meta([("2020JJ00", "Definitief")])
+    mock_fetch_bytes.side_effect = make_fetch_bytes(["2020JJ00"], 1.0)
+    download_dataset("test_id", download_dir=tmp_path, snapshot=SNAPSHOT)
+
+    mock_fetch_bytes.reset_mock()
+    mock_refresh_metadata.return_value = make_meta(
+        [("2020JJ00", "Definitief")], title="New title"
+    )
+    changed = {**SNAPSHOT, "Modified": "2024-02-01T00:00:00+00:00"}
+    refresh_dataset("test_id", changed, download_dir=tmp_path)
+
+    mock_fetch_bytes.assert_not_called()
+    with open(tmp_path / "Properties.json", encoding="utf-8") as f:
+        assert json.load(f)["Title"] == "New title"
+    assert DownloadManifest.load(tmp_path / "Observations").snapshot == changed
+
+
+@patch("cbsodata4.datasets.fetch_json")
+@patch("cbsodata4.refresh.get_metadata")
+@patch("cbsodata4.downloader.get_metadata")
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_refresh_twice_with_changed_catalogue(
+    mock_fetch_bytes,
+    mock_get_metadata,
+    mock_refresh_metadata,
+    mock_fetch_json,
+    tmp_path,
+):
+    """Test that a second refresh in the same process sees a changed /Datasets response."""
+    meta = make_meta([("2020JJ00", "Definitief")])
+    mock_get_metadata.return_value = meta
+    mock_refresh_metadata.return_value = meta
+    mock_fetch_bytes.side_effect = make_fetch_bytes(["2020JJ00"], 1.0)
+    dataset = {"Identifier": "test_id", "Catalog": "CBS", **SNAPSHOT}
+    changed = {**dataset, "ObservationsModified": "2024-02-01T00:00:00+00:00"}
+    mock_fetch_json.side_effect = [{"value": [dataset]}, {"value": [changed]}]
+
+    ensure_observations("test_id", download_dir=tmp_path, refresh=True)
+    assert mock_fetch_bytes.call_count == 1
+
+    ensure_observations("test_id", download_dir=tmp_path, refresh=True)
+    assert mock_fetch_json.call_count == 2
+    assert mock_fetch_bytes.call_count == 2
+    manifest = DownloadManifest.load(tmp_path / "Observations")
+    assert pd.Timestamp(manifest.snapshot["ObservationsModified"]) == pd.Timestamp(
+        changed["ObservationsModified"]
+    )
+
+
+@patch("cbsodata4.refresh.get_metadata")
+@patch("cbsodata4.downloader.get_metadata")
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_refresh_dataset_without_cache(
+    mock_fetch_bytes, mock_get_metadata, mock_refresh_metadata, tmp_path
+):
+    """Test that refreshing works when response caching is disabled."""
+    meta = make_meta([("2020JJ00", "Definitief")])
+    mock_get_metadata.return_value = meta
+    mock_refresh_metadata.return_value = meta
+    mock_fetch_bytes.side_effect = make_fetch_bytes(["2020JJ00"], 1.0)
+
+    previous = set_cache(None)
+    try:
+        refresh_dataset("test_id", SNAPSHOT, download_dir=tmp_path)
+        changed = {**SNAPSHOT, "Modified": "2024-02-01T00:00:00+00:00"}
+        refresh_dataset("test_id", changed, download_dir=tmp_path)
+    finally:
+        set_cache(previous)
+
+    assert DownloadManifest.load(tmp_path / "Observations").snapshot == changed
+
+
+@patch("cbsodata4.aio.async_fetch_bytes")
+@patch("cbsodata4.aio.get_metadata")
+@patch("cbsodata4.downloader.get_metadata")
+@patch("cbsodata4.downloader.fetch_bytes")
+def test_aio_refresh_dataset(
+    mock_fetch_bytes,
+    mock_get_metadata,
+    mock_aio_metadata,
+    mock_async_fetch_bytes,
+    tmp_path,
+):
+    """Test that the asyncio refresh downloads changed periods over the async client."""
+    mock_get_metadata.return_value = make_meta(
+        [("2020JJ00", "Definitief"), ("2021JJ00", "Voorlopig")]
+    )
+    mock_fetch_bytes.side_effect = make_fetch_bytes(["2020JJ00", "2021JJ00"], 1.0)
+    download_dataset("test_id", download_dir=tmp_path, snapshot=SNAPSHOT)
+
+    mock_fetch_bytes.reset_mock()
+    mock_aio_metadata.return_value = make_meta(
+        [("2020JJ00", "Definitief"), ("2021JJ00", "Definitief")]
+    )
+    mock_async_fetch_bytes.side_effect = make_fetch_bytes(["2020JJ00", "2021JJ00"], 2.0)
+    changed = {**SNAPSHOT, "ObservationsModified": "2024-02-01T00:00:00+00:00"}
+    asyncio.run(aio.refresh_dataset("test_id", changed, download_dir=tmp_path))
+
+    mock_fetch_bytes.assert_not_called()
+    url = mock_async_fetch_bytes.call_args[0][0]
+    assert "2021JJ00" in url and "2020JJ00" not in url
+    assert read_values(tmp_path) == {"2020JJ00": 1.0, "2021JJ00": 2.0}
+    manifest = DownloadManifest.load(tmp_path / "Observations")
+    assert manifest.complete
+    assert manifest.snapshot == changed
+
+
+def test_get_changed_periods():
+    """Test detecting changed periods and tables that are not append-only."""
+    stored = {"2020JJ00": "Definitief", "2021JJ00": "Voorlopig"}
+
+    meta = make_meta([("2020JJ00", "Definitief"), ("2021JJ00", "Voorlopig")])
+    assert get_changed_periods(stored, meta) == ["2021JJ00"]
+
+    meta = make_meta([("2020JJ00", "Definitief"), ("2022JJ00", "Definitief")])
+    assert get_changed_periods(stored, meta) is None
+
+    meta = make_meta(
+        [("2020JJ00", None), ("2021JJ00", "Voorlopig"), ("2022JJ00", None)]
+    )
+    assert get_changed_periods(stored, meta) == ["2020JJ00", "2021JJ00", "2022JJ00"]
+
+
+def test_is_modified():
+    """Test comparing catalogue timestamps in different notations."""
+    stored = {"Modified": "2024-01-01T00:00:00Z"}
+    current = {"Modified": pd.Timestamp("2024-01-01T01:00:00+01:00").isoformat()}
+
+    assert not is_modified(stored, current, "Modified")
+    assert is_modified(stored, {"Modified": None}, "Modified")
+    assert is_modified(stored, current, "ObservationsModified")
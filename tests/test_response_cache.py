@@ -0,0 +1,139 @@
+import math
+from unittest.mock import patch
+
+import pytest
+
+from cbsodata4.response_cache import (
+    LRUResponseCache,
+    ResponseCache,
+    SQLiteResponseCache,
+)
+
+
+def test_lru_cache_hit_and_miss():
+    """Test that stored responses are returned and counted as hits."""
+    cache = LRUResponseCache()
+
+    assert cache.get("https://test.url/A") is None
+    cache.set("https://test.url/A", {"value": 1}, b"x" * 10)
+    entry = cache.get("https://test.url/A")
+
+    assert entry.value == {"value": 1}
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.entries, stats.size_bytes) == (1, 1, 1, 10)
+
+
+def test_lru_cache_evicts_by_bytes():
+    """Test that least recently used entries are evicted when max_bytes is exceeded."""
+    cache = LRUResponseCache(max_bytes=100)
+    cache.set("https://test.url/A", "a", b"x" * 40)
+    cache.set("https://test.url/B", "b", b"x" * 40)
+    cache.get("https://test.url/A")
+    cache.set("https://test.url/C", "c", b"x" * 40)
+
+    assert cache.get("https://test.url/B") is None
+    assert cache.get("https://test.url/A").value == "a"
+    assert cache.get("https://test.url/C").value == "c"
+    assert cache.stats.evictions == 1
+    assert cache.stats.size_bytes == 80
+
+    cache.set("https://test.url/D", "d", b"x" * 101)
+    assert cache.get("https://test.url/D") is None
+
+
+def test_lru_cache_ttl_rules():
+    """Test that ttl rules skip Observations pages and expire entries."""
+    cache = LRUResponseCache(
+        ttls=[(r"/Observations", None), (r"/Datasets", 10.0)], default_ttl=math.inf
+    )
+    cache.set("https://test.url/T1/Observations?$skip=0", "obs", b"x")
+    cache.set("https://test.url/Datasets", "ds", b"x")
+    cache.set("https://test.url/T1/Dimensions", "dims", b"x")
+
+    assert cache.get("https://test.url/T1/Observations?$skip=0") is None
+    assert cache.stats.entries == 2
+
+    with patch("cbsodata4.response_cache.time.time", return_value=2e10):
+        assert cache.get("https://test.url/Datasets") is None
+        assert cache.get("https://test.url/T1/Dimensions").value == "dims"
+
+
+def test_lru_cache_invalidate():
+    """Test explicit invalidation by URL prefix and clearing."""
+    cache = LRUResponseCache()
+    cache.set("https://test.url/T1/Dimensions", "a", b"x")
+    cache.set("https://test.url/T1/MeasureCodes", "b", b"x")
+    cache.set("https://test.url/T2/Dimensions", "c", b"x")
+
+    assert cache.invalidate("https://test.url/T1") == 2
+    assert cache.get("https://test.url/T2/Dimensions").value == "c"
+
+    cache.clear()
+    assert cache.stats.entries == 0
+    assert cache.stats.size_bytes == 0
+
+
+def test_sqlite_cache_persists_between_instances(tmp_path):
+    """Test that entries written by one cache instance are read by another."""
+    cache = SQLiteResponseCache(tmp_path)
+    cache.set("https://test.url/T1/Dimensions", {"value": [1]}, b'{"value": [1]}')
+
+    other = SQLiteResponseCache(tmp_path)
+    entry = other.get("https://test.url/T1/Dimensions")
+
+    assert entry.value == {"value": [1]}
+    assert entry.is_fresh()
+    assert other.stats.entries == 1
+    assert other.invalidate("https://test.url/T1") == 1
+    assert cache.get("https://test.url/T1/Dimensions") is None
+
+
+def test_sqlite_cache_keeps_expired_entries_with_validators(tmp_path):
+    """Test that expired entries are returned only when they can be revalidated."""
+    cache = SQLiteResponseCache(tmp_path, ttls=[], default_ttl=0.0)
+    cache.set("https://test.url/A", {"a": 1}, b'{"a": 1}', etag='"v1"')
+    cache.set("https://test.url/B", {"b": 1}, b'{"b": 1}')
+
+    entry = cache.get("https://test.url/A")
+    assert not entry.is_fresh()
+    assert entry.etag == '"v1"'
+    assert cache.get("https://test.url/B") is None
+
+    with patch.object(cache, "ttl_for", return_value=60.0):
+        assert cache.refresh("https://test.url/A").is_fresh()
+        assert cache.refresh("https://test.url/C") is None
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.revalidations) == (0, 2, 1)
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    """Test that the on-disk cache stays below max_bytes."""
+    cache = SQLiteResponseCache(tmp_path, max_bytes=20)
+    cache.set("https://test.url/A", "a", b'"' + b"a" * 8 + b'"')
+    cache.set("https://test.url/B", "b", b'"' + b"b" * 8 + b'"')
+    cache.set("https://test.url/C", "c", b'"' + b"c" * 8 + b'"')
+
+    assert cache.get("https://test.url/A") is None
+    assert cache.stats.size_bytes == 20
+    assert cache.stats.evictions == 1
+
+
+def test_response_cache_requires_all_methods():
+    """Test that a cache missing one of the abstract methods can't be created."""
+
+    class IncompleteCache(ResponseCache):
+        def get(self, url):
+            return None
+
+        def set(self, url, value, content, etag=None, last_modified=None):
+            pass
+
+        def invalidate(self, prefix=None):
+            return 0
+
+        @property
+        def stats(self):
+            return None
+
+    with pytest.raises(TypeError, match="refresh"):
+        IncompleteCache()
@@ -0,0 +1,62 @@
+import pyarrow as pa
+
+from cbsodata4.metadata import CbsMetadata
+from cbsodata4.schema import (
+    conform_table,
+    decode_dictionaries,
+    get_observations_schema,
+)
+
+META = CbsMetadata(
+    {
+        "Dimensions": [
+            {"Identifier": "Dim1", "Kind": "Dimension"},
+            {"Identifier": "Perioden", "Kind": "TimeDimension"},
+        ]
+    }
+)
+
+
+def test_get_observations_schema():
+    """Test deriving the observations schema from the metadata."""
+    schema = get_observations_schema(META)
+
+    assert schema.names == [
+        "Id",
+        "Measure",
+        "ValueAttribute",
+        "Value",
+        "Dim1",
+        "Perioden",
+    ]
+    assert schema.field("Id").type == pa.int64()
+    assert schema.field("Value").type == pa.float64()
+    assert schema.field("Dim1").type == pa.dictionary(pa.int32(), pa.string())
+
+    selected = get_observations_schema(META, select=["Measure", "Value"])
+    assert selected.names == ["Measure", "Value"]
+
+
+def test_conform_table():
+    """Test casting a page with missing and extra columns to the schema."""
+    schema = get_observations_schema(META, select=["Id", "Value", "Dim1"])
+    table = pa.table({"Value": [1, 2], "Id": [1, 2], "Other": ["a", "b"]})
+
+    result = conform_table(table, schema)
+
+    assert result.schema == schema
+    assert result.column("Value").to_pylist() == [1.0, 2.0]
+    assert result.column("Dim1").null_count == 2
+
+
+def test_decode_dictionaries():
+    """Test decoding dictionary columns back to strings."""
+    table = conform_table(
+        pa.table({"Id": [1], "Dim1": ["A"]}),
+        get_observations_schema(META, select=["Id", "Dim1"]),
+    )
+
+    decoded = decode_dictionaries(table)
+
+    assert decoded.schema.field("Dim1").type == pa.string()
+    assert decoded.column("Dim1").to_pylist() == ["A"]
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import pytest
+
+from cbsodata4.steps import call, run_steps, run_steps_async
+
+
+def fetch(url):
+    return f"sync {url}"
+
+
+async def async_fetch(url):
+    return f"async {url}"
+
+
+def example_steps(url):
+    body = yield call(fetch, url)
+    thread = yield call(threading.current_thread)
+    try:
+        yield call(int, "x")
+    except ValueError:
+        error = "caught"
+    return body, thread, error
+
+
+def test_run_steps():
+    """Test that run_steps performs the calls and throws their errors into the steps."""
+    body, thread, error = run_steps(example_steps("url"))
+
+    assert body == "sync url"
+    assert thread is threading.current_thread()
+    assert error == "caught"
+
+
+def test_run_steps_async():
+    """Test that run_steps_async awaits the async counterparts and threads other calls."""
+    body, thread, error = asyncio.run(
+        run_steps_async(example_steps("url"), {fetch: async_fetch})
+    )
+
+    assert body == "async url"
+    assert thread is not threading.current_thread()
+    assert error == "caught"
+
+
+def test_run_steps_error():
+    """Test that an error not handled by the steps is raised."""
+
+    def failing_steps():
+        yield call(int, "x")
+
+    with pytest.raises(ValueError):
+        run_steps(failing_steps())
+    with pytest.raises(ValueError):
+        asyncio.run(run_steps_async(failing_steps(), {}))
@@ -1,22 +1,22 @@
-from unittest.mock import MagicMock
-
 import numpy as np
 import pandas as pd
 import pytest
 
+from cbsodata4.metadata import CbsMetadata
 from cbsodata4.unit_handler import add_unit_column
 
 
 def test_add_unit_column_success():
     data = pd.DataFrame({"Measure": ["M1", "M2"], "Value": [100, 200]})
-    mock_meta = MagicMock()
-    mock_meta.meta_dict = {
-        "MeasureCodes": [
-            {"Identifier": "M1", "Unit": "Unit1"},
-            {"Identifier": "M2", "Unit": "Unit2"},
-        ]
-    }
-    data.attrs["meta"] = mock_meta
+    meta = CbsMetadata(
+        {
+            "MeasureCodes": [
+                {"Identifier": "M1", "Unit": "Unit1"},
+                {"Identifier": "M2", "Unit": "Unit2"},
+            ]
+        }
+    )
+    data.attrs["meta"] = meta
 
     df = add_unit_column(data)
     assert "Unit" in df.columns
@@ -34,14 +34,15 @@ def test_add_unit_column_no_meta():
 
 def test_add_unit_column_no_measure_column():
     data = pd.DataFrame({"MeasureCode": ["M1", "M2"], "Value": [100, 200]})
-    mock_meta = MagicMock()
-    mock_meta.meta_dict = {
-        "MeasureCodes": [
-            {"Identifier": "M1", "Unit": "Unit1"},
-            {"Identifier": "M2", "Unit": "Unit2"},
-        ]
-    }
-    data.attrs["meta"] = mock_meta
+    meta = CbsMetadata(
+        {
+            "MeasureCodes": [
+                {"Identifier": "M1", "Unit": "Unit1"},
+                {"Identifier": "M2", "Unit": "Unit2"},
+            ]
+        }
+    )
+    data.attrs["meta"] = meta
 
     with pytest.raises(ValueError, match="Data does not contain 'Measure' column."):
         add_unit_column(data)
@@ -54,14 +55,15 @@ def test_add_unit_column_partial_mapping():
             "Value": [100, 200],
         }
     )
-    mock_meta = MagicMock()
-    mock_meta.meta_dict = {
-        "MeasureCodes": [
-            {"Identifier": "M1", "Unit": "Unit1"},
-            {"Identifier": "M2", "Unit": "Unit2"},
-        ]
-    }
-    data.attrs["meta"] = mock_meta
+    meta = CbsMetadata(
+        {
+            "MeasureCodes": [
+                {"Identifier": "M1", "Unit": "Unit1"},
+                {"Identifier": "M2", "Unit": "Unit2"},
+            ]
+        }
+    )
+    data.attrs["meta"] = meta
 
     df = add_unit_column(data)
     assert "Unit" in df.columns